@@ -0,0 +1,286 @@
+"""
+Carousel Controller - Dwell Time Analytics
+Version: 1.4.0
+
+Per-position, per-day and per-event dwell statistics over every day in the
+data folder. Each Carousel_MMDDYY file is parsed once, in parallel worker
+processes, and cached as a compact .npz under data/.cache keyed by the
+source file's mtime and size, so a report only re-reads new or changed
+days. Aggregates are computed with pandas groupby.
+
+A day's CSV journal is used when present (it is the live copy and parses
+much faster); otherwise its Carousel_MMDDYY.xlsx workbook.
+
+Usage:
+    python analytics.py                            # Report for ./data
+    python analytics.py --data-folder D --by position,event --from 2025-10-01
+    
+    from analytics import load_trials, dwell_stats
+    trials = load_trials("./data")
+    stats = dwell_stats(trials, by=["Position", "Door Event"])
+"""
+
+import argparse
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from pathlib import Path
+
+from data_logger import COLUMNS
+
+
+CACHE_FOLDER = ".cache"
+PERCENTILES = (0.10, 0.25, 0.75, 0.90)
+
+_DAY_FILE_RE = re.compile(r"Carousel_(\d{2})(\d{2})(\d{2})\.(csv|xlsx)$")
+
+# Cached column -> (source column, dtype)
+_CACHE_COLUMNS = {
+    'trial': ('Trial', 'i4'),
+    'position': ('Position', 'i2'),
+    'dwell': ('DwellTime(s)', 'f8'),
+    'event': ('Door Event', 'U8'),
+    'timestamp': ('Timestamp', 'U19'),
+    'entry_ms': ('EntryTime', 'i8'),
+    'exit_ms': ('ExitTime', 'i8'),
+    'entry_wall': ('EntryDateTime', 'U23'),
+    'exit_wall': ('ExitDateTime', 'U23'),
+}
+
+# Group-by keys accepted by the CLI
+_GROUP_KEYS = {'position': 'Position', 'day': 'Day', 'event': 'Door Event'}
+
+
+def find_day_files(data_folder):
+    """
+    Pick one source file per day.
+    
+    Args:
+        data_folder: Folder written by DataLogger
+    
+    Returns:
+        dict: date -> Path (the CSV journal if present, else the workbook)
+    """
+    sources = {}
+    for entry in os.scandir(data_folder):
+        match = _DAY_FILE_RE.match(entry.name)
+        if not match:
+            continue
+        month, day_of_month, year, kind = match.groups()
+        try:
+            day = date(2000 + int(year), int(month), int(day_of_month))
+        except ValueError:
+            continue
+        if kind == 'csv' or day not in sources:
+            sources[day] = Path(entry.path)
+    return sources
+
+
+def parse_day_file(path):
+    """
+    Parse one journal or workbook into typed column arrays.
+    
+    Runs in a worker process; malformed rows are dropped.
+    
+    Args:
+        path (Path): Carousel_MMDDYY.csv or .xlsx
+    
+    Returns:
+        dict: Cached column name -> numpy array
+    """
+    import pandas as pd
+    
+    path = Path(path)
+    df = pd.read_csv(path) if path.suffix == '.csv' else pd.read_excel(path)
+    df = df.reindex(columns=COLUMNS)
+    for column in ('Trial', 'Position', 'DwellTime(s)', 'EntryTime', 'ExitTime'):
+        df[column] = pd.to_numeric(df[column], errors='coerce')
+    df = df.dropna(subset=['Trial', 'Position', 'DwellTime(s)'])
+    df[['EntryTime', 'ExitTime']] = df[['EntryTime', 'ExitTime']].fillna(0)
+    df['Door Event'] = df['Door Event'].fillna('').astype(str).str.strip().str.upper()
+    for column in ('Timestamp', 'EntryDateTime', 'ExitDateTime'):
+        df[column] = df[column].fillna('').astype(str)
+    return {name: df[source].to_numpy().astype(dtype)
+            for name, (source, dtype) in _CACHE_COLUMNS.items()}
+
+
+class DayCache:
+    """
+    Binary cache of parsed day files (one .npz per source file).
+    
+    An entry is valid while the source's mtime and size are unchanged.
+    """
+    
+    def __init__(self, folder):
+        """
+        Args:
+            folder (Path): Cache directory (created on first write)
+        """
+        self.folder = Path(folder)
+    
+    def _path(self, source):
+        return self.folder / f"{source.name}.npz"
+    
+    @staticmethod
+    def _signature(source):
+        stat = source.stat()
+        return [stat.st_mtime_ns, stat.st_size]
+    
+    def load(self, source):
+        """
+        Get cached columns for a source file.
+        
+        Returns:
+            dict or None: Columns, or None if missing or stale
+        """
+        import numpy as np
+        
+        path = self._path(source)
+        if not path.exists():
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if data['signature'].tolist() != self._signature(source):
+                    return None
+                return {name: data[name] for name in _CACHE_COLUMNS}
+        except Exception:
+            return None  # Corrupt entry: re-parse
+    
+    def store(self, source, columns):
+        """Write columns for a source file (temp file + rename)."""
+        import numpy as np
+        
+        self.folder.mkdir(parents=True, exist_ok=True)
+        path = self._path(source)
+        tmp = path.with_suffix('.tmp.npz')
+        np.savez(tmp, signature=np.array(self._signature(source), dtype='i8'), **columns)
+        os.replace(tmp, path)
+
+
+def load_trials(data_folder="./data", start=None, end=None, workers=None, use_cache=True):
+    """
+    Load every day's trials into one DataFrame.
+    
+    Args:
+        data_folder: Folder written by DataLogger
+        start (date): First day to include (None = earliest)
+        end (date): Last day to include (None = latest)
+        workers (int): Parser processes for uncached files (default: CPU count)
+        use_cache (bool): Read/write the .npz cache
+    
+    Returns:
+        pandas.DataFrame: COLUMNS plus 'Day'
+    """
+    import pandas as pd
+    
+    data_folder = Path(data_folder)
+    cache = DayCache(data_folder / CACHE_FOLDER)
+    sources = {day: path for day, path in find_day_files(data_folder).items()
+               if (start is None or day >= start) and (end is None or day <= end)}
+    
+    parsed = {}
+    misses = []
+    for day, path in sources.items():
+        columns = cache.load(path) if use_cache else None
+        if columns is None:
+            misses.append(day)
+        else:
+            parsed[day] = columns
+    
+    if len(misses) > 1:
+        workers = min(workers or os.cpu_count() or 1, len(misses))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(parse_day_file, [sources[day] for day in misses])
+            for day, columns in zip(misses, results):
+                parsed[day] = columns
+    elif misses:
+        parsed[misses[0]] = parse_day_file(sources[misses[0]])
+    if use_cache:
+        for day in misses:
+            try:
+                cache.store(sources[day], parsed[day])
+            except OSError as e:
+                print(f"WARNING: could not cache {sources[day].name}: {e}")
+    
+    frames = []
+    for day in sorted(parsed):
+        columns = parsed[day]
+        frame = pd.DataFrame({source: columns[name]
+                              for name, (source, _) in _CACHE_COLUMNS.items()})
+        frame['Day'] = pd.Timestamp(day)
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame(columns=COLUMNS + ['Day'])
+    return pd.concat(frames, ignore_index=True)
+
+
+def dwell_stats(trials, by=("Position",), percentiles=PERCENTILES):
+    """
+    Dwell time statistics per group.
+    
+    Args:
+        trials (DataFrame): Output of load_trials()
+        by: Grouping columns, e.g. ['Position'], ['Day'], ['Position', 'Door Event']
+        percentiles: Quantiles to include (0-1)
+    
+    Returns:
+        pandas.DataFrame: count, mean, std, min, median, pNN..., max per group
+    """
+    import pandas as pd
+    
+    grouped = trials.groupby(list(by), sort=True)['DwellTime(s)']
+    stats = grouped.agg(['count', 'mean', 'std', 'min', 'median', 'max'])
+    if len(percentiles):
+        quantiles = grouped.quantile(list(percentiles)).unstack()
+        quantiles.columns = [f"p{round(q * 100):02d}" for q in quantiles.columns]
+        stats = pd.concat([stats.drop(columns='max'), quantiles, stats['max']], axis=1)
+    stats['count'] = stats['count'].astype(int)
+    return stats
+
+
+def main(argv=None):
+    """Command-line report."""
+    parser = argparse.ArgumentParser(description="Carousel dwell time report")
+    parser.add_argument("--data-folder", default="./data", help="data folder (default: ./data)")
+    parser.add_argument("--by", default="position",
+                        help="comma-separated grouping: position, day, event "
+                             "(default: position; e.g. position,event)")
+    parser.add_argument("--from", dest="start", type=date.fromisoformat,
+                        help="first day, YYYY-MM-DD")
+    parser.add_argument("--to", dest="end", type=date.fromisoformat, help="last day, YYYY-MM-DD")
+    parser.add_argument("--workers", type=int, help="parser processes (default: CPU count)")
+    parser.add_argument("--no-cache", action="store_true", help="ignore and don't write the cache")
+    parser.add_argument("--csv", metavar="FILE", help="also write the table to a CSV file")
+    args = parser.parse_args(argv)
+    
+    try:
+        by = [_GROUP_KEYS[key.strip().lower()] for key in args.by.split(',')]
+    except KeyError as e:
+        parser.error(f"--by: unknown key {e} (use position, day, event)")
+    
+    import pandas as pd
+    
+    trials = load_trials(args.data_folder, args.start, args.end, args.workers,
+                         use_cache=not args.no_cache)
+    if trials.empty:
+        print(f"No trials found in {args.data_folder}")
+        return 1
+    stats = dwell_stats(trials, by)
+    if 'Day' in by:
+        stats = stats.rename(index=lambda v: v.date() if isinstance(v, pd.Timestamp) else v)
+    
+    days = trials['Day'].nunique()
+    print(f"{len(trials)} trials over {days} day(s), dwell time in seconds")
+    with pd.option_context('display.max_rows', None, 'display.width', 120,
+                           'display.float_format', '{:.2f}'.format):
+        print(stats)
+    if args.csv:
+        stats.to_csv(args.csv)
+        print(f"Saved {args.csv}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+Carousel Controller - Beam Sensor Monitor
+Version: 1.4.0
+
+Streams the analog beam-break readings printed by the firmware's 'beam'
+test (S1=<value> BLOCKED|CLEAR  |  S2=<value> ...) into a preallocated
+NumPy ring buffer instead of the communication log. The GUI plots the
+buffer against BEAM_THRESHOLD from min/max-decimated bins; recordings are
+saved as compressed .npz arrays.
+
+Usage:
+    recorder = BeamRecorder()
+    recorder.append(time.perf_counter(), 512, 801)
+    t, s1, s2 = recorder.snapshot(since=time.perf_counter() - 10)
+    recorder.save("beam.npz")
+"""
+
+import time
+
+
+BEAM_THRESHOLD = 700        # Firmware: reading above this = beam blocked
+ADC_MAX = 1023              # analogRead() range
+BUFFER_SAMPLES = 65536      # Ring buffer capacity (~1.8 h at the firmware's 10 Hz)
+
+
+class BeamRecorder:
+    """
+    Fixed-size ring buffer of (time, S1, S2) samples.
+    
+    Written by the serial read thread only; readers copy with snapshot().
+    A reader racing a wrap-around may see one overwritten sample, which is
+    harmless for plotting.
+    """
+    
+    def __init__(self, capacity=BUFFER_SAMPLES):
+        """
+        Args:
+            capacity (int): Samples kept; older ones are overwritten
+        """
+        import numpy as np  # Deferred: only created once beam readings arrive
+        
+        self.capacity = capacity
+        self.t = np.zeros(capacity, dtype='f8')     # time.perf_counter()
+        self.s1 = np.zeros(capacity, dtype='<u2')
+        self.s2 = np.zeros(capacity, dtype='<u2')
+        self.count = 0                              # Samples ever appended
+    
+    def append(self, t, s1, s2):
+        """
+        Store one reading (O(1), no allocation).
+        
+        Args:
+            t (float): time.perf_counter() when received
+            s1 (int): Mainchamber sensor reading
+            s2 (int): Subchamber sensor reading
+        """
+        i = self.count % self.capacity
+        self.t[i] = t
+        self.s1[i] = s1
+        self.s2[i] = s2
+        self.count += 1
+    
+    def clear(self):
+        """Forget all samples."""
+        self.count = 0
+    
+    def snapshot(self, since=None, last=None):
+        """
+        Copy samples in time order.
+        
+        Args:
+            since (float): Only samples received at or after this perf_counter time
+            last (int): Only the most recent samples (applied first)
+        
+        Returns:
+            tuple: (t, s1, s2) numpy arrays
+        """
+        import numpy as np
+        
+        capacity = self.capacity
+        stored = min(self.count, capacity)
+        if last is not None:
+            stored = min(stored, last)
+        end = self.count % capacity or (capacity if stored else 0)  # Past the newest sample
+        start = end - stored          # Negative: the oldest samples are at the array's end
+        if since is not None:
+            # Each side of the wrap is sorted: search before copying
+            if start < 0 and self.t[capacity - 1] >= since:
+                start += int(np.searchsorted(self.t[capacity + start:], since))
+            else:
+                start = int(np.searchsorted(self.t[max(start, 0):end], since)) + max(start, 0)
+        if start >= 0:
+            return self.t[start:end].copy(), self.s1[start:end].copy(), self.s2[start:end].copy()
+        order = np.r_[capacity + start:capacity, 0:end]
+        return self.t[order], self.s1[order], self.s2[order]
+    
+    def summary(self, last):
+        """
+        Summarize the most recent samples (e.g. one test run).
+        
+        Args:
+            last (int): Number of samples
+        
+        Returns:
+            str: Sample count, range and time blocked per sensor
+        """
+        t, s1, s2 = self.snapshot(last=last)
+        if not len(t):
+            return "no samples"
+        parts = [f"{len(t)} samples"]
+        for name, values in (("S1", s1), ("S2", s2)):
+            blocked = (values > BEAM_THRESHOLD).mean() * 100
+            parts.append(f"{name} {values.min()}-{values.max()} (blocked {blocked:.0f}%)")
+        return ", ".join(parts)
+    
+    def save(self, path):
+        """
+        Save the buffer as compressed arrays.
+        
+        File contents: t (Unix seconds, f8), s1 / s2 (u2), threshold.
+        
+        Args:
+            path: Destination .npz file
+        
+        Returns:
+            int: Number of samples saved
+        """
+        import numpy as np
+        
+        t, s1, s2 = self.snapshot()
+        wall = t + (time.time() - time.perf_counter())
+        np.savez_compressed(path, t=wall, s1=s1, s2=s2, threshold=np.uint16(BEAM_THRESHOLD))
+        return len(t)
+
+
+def decimate(t, values, bins):
+    """
+    Min/max per bin, so spikes survive down-sampling to screen width.
+    
+    Args:
+        t (ndarray): Sample times, ascending
+        values (ndarray): Readings
+        bins (int): Maximum number of bins
+    
+    Returns:
+        tuple: (bin times, minima, maxima); the input itself if it already
+               fits in bins
+    """
+    import numpy as np
+    
+    if len(values) <= bins:
+        return t, values, values
+    starts = np.linspace(0, len(values), bins, endpoint=False).astype(np.intp)
+    return (t[starts], np.minimum.reduceat(values, starts),
+            np.maximum.reduceat(values, starts))
@@ -0,0 +1,261 @@
+"""
+Carousel Controller - Benchmark Suite
+Version: 1.4.0
+
+Throughput / latency / memory benchmarks for the serial-to-disk pipeline,
+driven by the simulated controller (carousel_simulator.py) over a pty.
+
+Stages:
+    parser    protocol.parse_line on a mixed line stream
+    logger    DataLogger.log_batch straight to the journal
+    reader    SerialHandler framing + routing from the pty
+    pipeline  reader + DataWriter + DataLogger, per trial rate / burst size
+    replay    a recorded capture (--capture) through SerialHandler.feed,
+              DataWriter and DataLogger, flat out
+
+Usage:
+    python benchmark.py
+    python benchmark.py --trials 5000 --rates 0,200,1000 --bursts 1,20
+    python benchmark.py --capture session.ccap
+"""
+
+import argparse
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import protocol
+from carousel_simulator import CarouselSimulator
+from data_logger import BACKENDS, DataLogger
+from data_writer import DataWriter
+from serial_capture import read_capture
+from serial_handler import SerialHandler, SerialListener
+
+
+class BenchmarkSink(SerialListener):
+    """Listener that counts the callbacks SerialHandler makes."""
+    
+    def __init__(self):
+        self.lines = 0
+        self.statuses = 0
+        self.errors = 0
+        self.done = threading.Event()
+        self.expected_lines = None
+        
+    def log_message(self, message, message_type="INFO"):
+        self.lines += 1
+        if message_type == "ERROR":
+            self.errors += 1
+        if self.expected_lines is not None and self.lines >= self.expected_lines:
+            self.done.set()
+            
+    def handle_status_update(self, update):
+        self.statuses += 1
+
+
+def percentiles(samples):
+    """
+    Summarize latency samples.
+    
+    Args:
+        samples (list): Latencies in seconds
+        
+    Returns:
+        str: p50 / p90 / p99 / max in milliseconds
+    """
+    if not samples:
+        return "no samples"
+    ordered = sorted(samples)
+    
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+        
+    return (f"p50={pick(0.50):.2f}ms p90={pick(0.90):.2f}ms "
+            f"p99={pick(0.99):.2f}ms max={ordered[-1] * 1000:.2f}ms")
+
+
+class MemoryProbe:
+    """Python heap growth across a benchmark stage (tracemalloc)."""
+    
+    def __enter__(self):
+        tracemalloc.start()
+        self.start, _ = tracemalloc.get_traced_memory()
+        return self
+        
+    def __exit__(self, *exc):
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.growth_kb = (current - self.start) / 1024
+        self.peak_kb = (peak - self.start) / 1024
+        return False
+        
+    def __str__(self):
+        return f"mem +{self.growth_kb:.0f}KB (peak +{self.peak_kb:.0f}KB)"
+
+
+def sample_lines(count):
+    """Build a realistic mixed stream: every door cycle is ~6 lines around one DATA packet."""
+    lines = []
+    for trial in range(1, count + 1):
+        lines += ["STATUS:DOOR:OPEN", "STATUS:MOUSE:ENTRY", "Mouse in subchamber",
+                  f"DATA,{trial},{trial % 12 + 1},12543,18865,6.32,AUTO",
+                  "STATUS:DOOR:CLOSED", "STATUS:MOUSE:IDLE"]
+    return lines
+
+
+def bench_parser(trials):
+    """Decode cost per line."""
+    lines = sample_lines(trials)
+    with MemoryProbe() as memory:
+        start = time.perf_counter()
+        for line in lines:
+            protocol.parse_line(line)
+        elapsed = time.perf_counter() - start
+    print(f"parser    {len(lines) / elapsed:12,.0f} lines/s   {memory}")
+
+
+def bench_logger(trials, data_folder, batch=50, backend="journal"):
+    """Storage append cost per trial."""
+    logger = DataLogger(data_folder, backend=backend)
+    records = [protocol.TrialRecord(i, i % 12 + 1, 1000, 2000, 1.0, "AUTO")
+               for i in range(trials)]
+    with MemoryProbe() as memory:
+        start = time.perf_counter()
+        for i in range(0, trials, batch):
+            logger.log_batch(records[i:i + batch])
+        elapsed = time.perf_counter() - start
+    print(f"logger    {trials / elapsed:12,.0f} trials/s  {memory}  (batch={batch}, {backend})")
+    logger.close()
+
+
+def connect(simulator, handler):
+    """Open the simulated port and wait for the banner to pass."""
+    if not handler.connect(simulator.device):
+        raise RuntimeError(f"Could not open {simulator.device}")
+
+
+def bench_reader(trials, burst):
+    """SerialHandler framing and routing, no persistence."""
+    simulator = CarouselSimulator(boot_delay=0)
+    simulator.start(banner=False)
+    sink = BenchmarkSink()
+    handler = SerialHandler(sink)
+    try:
+        connect(simulator, handler)
+        time.sleep(0.2)
+        sink.lines = 0
+        sink.expected_lines = trials
+        with MemoryProbe() as memory:
+            start = time.perf_counter()
+            simulator.inject_trials(trials, rate=0, burst=burst)
+            sink.done.wait(timeout=60)
+            elapsed = time.perf_counter() - start
+        print(f"reader    {sink.lines / elapsed:12,.0f} lines/s   {memory}  (burst={burst})")
+    finally:
+        handler.disconnect()
+        simulator.stop()
+
+
+def bench_pipeline(trials, rate, burst, data_folder):
+    """End to end: pty -> SerialHandler -> DataWriter -> journal."""
+    simulator = CarouselSimulator(boot_delay=0)
+    simulator.start(banner=False)
+    sink = BenchmarkSink()
+    logger = DataLogger(data_folder)
+    sent = {}
+    latencies = []
+    persisted = threading.Event()
+    
+    # Stamp each trial when log_batch returns (journal written, not fsynced)
+    log_batch = logger.log_batch
+    
+    def timed_log_batch(records):
+        ok = log_batch(records)
+        now = time.perf_counter()
+        for record in records:
+            if record.trial in sent:
+                latencies.append(now - sent[record.trial])
+        if len(latencies) >= trials:
+            persisted.set()
+        return ok
+        
+    logger.log_batch = timed_log_batch
+    writer = DataWriter(logger)
+    writer.start()
+    handler = SerialHandler(sink, data_writer=writer)
+    try:
+        connect(simulator, handler)
+        time.sleep(0.2)
+        with MemoryProbe() as memory:
+            start = time.perf_counter()
+            simulator.inject_trials(trials, rate=rate, burst=burst,
+                                    on_sent=lambda trial, t: sent.__setitem__(trial, t))
+            persisted.wait(timeout=120)
+            elapsed = time.perf_counter() - start
+        label = f"rate={rate:g}/s burst={burst}" if rate else f"rate=max burst={burst}"
+        print(f"pipeline  {len(latencies) / elapsed:12,.0f} trials/s  {memory}  ({label})")
+        print(f"          packet-to-disk {percentiles(latencies)}"
+              f"  mean={statistics.fmean(latencies) * 1000:.2f}ms" if latencies else
+              "          no trials persisted")
+    finally:
+        handler.disconnect()
+        writer.stop()
+        simulator.stop()
+
+
+def bench_replay(capture, data_folder):
+    """Production capture through framing, routing and persistence, no pacing."""
+    chunks = list(read_capture(capture))
+    sink = BenchmarkSink()
+    logger = DataLogger(data_folder)
+    writer = DataWriter(logger)
+    writer.start()
+    handler = SerialHandler(sink, data_writer=writer)
+    try:
+        with MemoryProbe() as memory:
+            start = time.perf_counter()
+            for _, chunk in chunks:
+                handler.feed(chunk)
+            writer.flush(timeout=120)
+            elapsed = time.perf_counter() - start
+        span = chunks[-1][0] - chunks[0][0] if chunks else 0.0
+        print(f"replay    {sink.lines / elapsed:12,.0f} lines/s   {memory}  "
+              f"({sink.lines} lines, {span:.0f}s of capture in {elapsed:.2f}s)")
+    finally:
+        writer.stop()
+        logger.close()
+
+
+def main():
+    """Run the benchmark suite."""
+    parser = argparse.ArgumentParser(description="Carousel serial-to-disk benchmarks")
+    parser.add_argument("--trials", type=int, default=2000, help="trials per scenario")
+    parser.add_argument("--rates", default="0,100,500",
+                        help="comma-separated trial rates per second (0 = flat out)")
+    parser.add_argument("--bursts", default="1,20", help="comma-separated packets per write")
+    parser.add_argument("--data-folder", default=None,
+                        help="journal folder (default: a temporary directory)")
+    parser.add_argument("--capture", help="also replay this serial capture (serial_capture.py)")
+    args = parser.parse_args()
+    
+    rates = [float(r) for r in args.rates.split(',')]
+    bursts = [int(b) for b in args.bursts.split(',')]
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        data_folder = args.data_folder or tmp
+        bench_parser(args.trials)
+        for backend in BACKENDS:
+            bench_logger(args.trials, data_folder, backend=backend)
+        for burst in bursts:
+            bench_reader(args.trials, burst)
+        for rate in rates:
+            for burst in bursts:
+                bench_pipeline(args.trials, rate, burst, data_folder)
+        if args.capture:
+            bench_replay(args.capture, data_folder)
+
+
+if __name__ == "__main__":
+    main()
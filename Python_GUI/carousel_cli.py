@@ -0,0 +1,361 @@
+"""
+Carousel Controller - Headless Command-Line Interface
+Version: 1.4.0
+
+Runs acquisition without a display: connects to the controller, logs
+trials through DataWriter/DataLogger and sends commands read from stdin
+or a script file. Never imports tkinter.
+
+Usage:
+    python carousel_cli.py                          # Auto-detect, commands from stdin
+    python carousel_cli.py --port /dev/ttyACM0 --script session.txt
+    python carousel_cli.py --port /dev/ttyACM0 --daemon
+    python carousel_cli.py --protocol 1-12 --blocks 3 --randomize --iti 10
+    python carousel_cli.py --capture session.ccap   # Also record raw serial input
+    python carousel_cli.py --replay session.ccap --speed 10 --data-folder /tmp/replay
+    python carousel_cli.py --replay session.ccap --speed 0 --metrics metrics.json
+    python carousel_cli.py --script beam.txt --beam beam.npz   # Keep beam test readings
+
+Script / stdin syntax (one per line):
+    home                # Any controller command is sent as-is
+    wait 30             # Pause for 30 seconds
+    state               # Print the device state (connection, magnet, position, ...)
+    # comment           # Ignored
+    quit                # Disconnect and exit
+"""
+
+import argparse
+import signal
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from column_store import ColumnStore
+from data_logger import BACKENDS, DataLogger
+from data_writer import DataWriter
+from experiment import ExperimentRunner, Schedule, parse_positions
+from pipeline_metrics import PipelineMetrics
+from serial_handler import SerialHandler, SerialListener
+
+
+class ConsoleListener(SerialListener):
+    """Prints serial events to stdout, one timestamped line each."""
+    
+    def __init__(self, quiet=False):
+        """
+        Args:
+            quiet (bool): Only print DATA, ERROR and WARNING lines
+        """
+        self.quiet = quiet
+        self.lock = threading.Lock()
+        
+    def log_message(self, message, message_type="INFO"):
+        if self.quiet and message_type not in ("DATA", "ERROR", "WARNING"):
+            return
+        self.show(message, message_type)
+        
+    def show(self, message, message_type="INFO"):
+        """Print one line regardless of quiet (answers to explicit requests)."""
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        with self.lock:
+            print(f"[{timestamp}] {message_type:<7} {message}", flush=True)
+            
+    def handle_connection_state(self, state):
+        self.log_message(f"Link {state.lower()}", "WARNING" if state != "CONNECTED" else "STATUS")
+
+
+class HeadlessSession:
+    """
+    Acquisition session without a GUI.
+    
+    Features:
+    - Same logging path as the GUI (DataWriter -> DataLogger journal)
+    - Commands from stdin, a script file, or none (daemon)
+    - Clean shutdown on quit, end of input, SIGINT or SIGTERM
+    - Pipeline latency summary on exit, optionally exported as JSON
+    - Beam test readings optionally saved as NumPy arrays on exit
+    """
+    
+    def __init__(self, data_folder="./data", quiet=False, backend="journal",
+                 metrics_file=None, beam_file=None):
+        """
+        Initialize session.
+        
+        Args:
+            data_folder: Path to data storage directory
+            quiet (bool): Only print DATA, ERROR and WARNING lines
+            backend (str): Storage backend name (journal or sqlite)
+            metrics_file: Optional path for the pipeline metrics JSON on exit
+            beam_file: Optional path for the beam test readings (.npz) on exit
+        """
+        self.console = ConsoleListener(quiet)
+        self.metrics_file = metrics_file
+        self.beam_file = beam_file
+        self.pipeline_metrics = PipelineMetrics()
+        self.data_logger = DataLogger(data_folder,
+                                      column_store=ColumnStore(Path(data_folder) / "columns"),
+                                      backend=backend)
+        self.data_writer = DataWriter(self.data_logger, on_result=self.handle_data_logged,
+                                      pipeline_metrics=self.pipeline_metrics)
+        self.serial_handler = SerialHandler(self.console, data_writer=self.data_writer,
+                                            pipeline_metrics=self.pipeline_metrics)
+        self.stop_event = threading.Event()
+        for name in self.data_logger.recover_workbooks():
+            self.console.log_message(f"Recovered {name} from its journal", "WARNING")
+        
+    def handle_data_logged(self, success, count, message=None):
+        """Report data writer commits."""
+        if success:
+            trials_today = self.data_logger.get_trial_count()
+            self.serial_handler.device_state.update(
+                trials_today=trials_today, data_file=self.data_logger.get_current_filename())
+            self.console.log_message(f"✓ {count} trial(s) logged, {trials_today} today", "STATUS")
+        else:
+            self.console.log_message(message or "✗ Failed to log data", "ERROR")
+            
+    def connect(self, port=None, baudrate=115200):
+        """
+        Connect to the given port, or the auto-detected Arduino.
+        
+        Returns:
+            bool: True if connected
+        """
+        port = port or self.serial_handler.auto_detect_arduino()
+        if not port:
+            self.console.log_message("No Arduino detected; use --port", "ERROR")
+            return False
+        self.console.log_message(f"Connecting to {port}...", "INFO")
+        if not self.serial_handler.connect(port, baudrate):
+            return False
+        self.console.log_message(f"Connected to {port}", "INFO")
+        self.console.log_message(f"Data file: {self.data_logger.get_current_filepath()}", "INFO")
+        return True
+        
+    def replay(self, path, speed):
+        """
+        Play a capture through the handler until it ends or a stop signal.
+        
+        Args:
+            path: Capture file (serial_capture format)
+            speed (float): Playback speed factor (1 = original pace, 0 = flat out)
+            
+        Returns:
+            bool: True if the capture played to the end
+        """
+        self.console.log_message(f"Replaying {path} at "
+                                 f"{f'{speed:g}x' if speed else 'full speed'}...", "INFO")
+        self.console.show(f"Replayed trials go to {self.data_logger.get_data_folder_path()}")
+        if not self.serial_handler.replay(path, speed):
+            return False
+        port = self.serial_handler.serial_port
+        started = time.perf_counter()
+        while not port.finished.wait(0.5):
+            if self.stop_event.is_set():
+                return False
+        self.serial_handler.read_thread.join()
+        elapsed = time.perf_counter() - started
+        self.console.log_message(
+            f"Replay done: {port.chunks} chunks, {port.bytes} bytes in {elapsed:.2f}s", "INFO")
+        return True
+        
+    def run_commands(self, lines):
+        """
+        Execute commands until input ends, 'quit', or a stop signal.
+        
+        Args:
+            lines: Iterable of command lines
+        """
+        for raw in lines:
+            if self.stop_event.is_set():
+                return
+            command = raw.strip()
+            if not command or command.startswith('#'):
+                continue
+            word = command.split()[0].lower()
+            if word in ("quit", "exit"):
+                self.stop_event.set()
+                return
+            if word == "wait":
+                try:
+                    seconds = float(command.split()[1])
+                except (IndexError, ValueError):
+                    self.console.log_message(f"Usage: wait SECONDS ({command})", "ERROR")
+                    continue
+                if self.stop_event.wait(seconds):
+                    return
+                continue
+            if word == "state":
+                snapshot = self.serial_handler.device_state.snapshot()
+                self.console.show(
+                    " ".join(f"{field}={value}" for field, value in snapshot.items()), "STATUS")
+                continue
+            self.serial_handler.send_command(command)
+            
+    def run_protocol(self, schedule, trial_timeout):
+        """
+        Run a scheduled protocol until it ends or a stop signal.
+        
+        Args:
+            schedule (Schedule): Positions and inter-trial interval
+            trial_timeout (float): Seconds to wait for a mouse per trial
+        """
+        runner = ExperimentRunner(self.serial_handler, schedule,
+                                  on_message=self.console.log_message,
+                                  trial_timeout=trial_timeout)
+        runner.start()
+        try:
+            while not runner.wait(0.5):
+                if self.stop_event.is_set():
+                    break
+        finally:
+            runner.stop()
+            runner.wait(5)
+        summary = runner.summary()
+        if summary['mean_iti_s'] is not None:
+            self.console.log_message(
+                f"ITI mean {summary['mean_iti_s']:.3f}s max {summary['max_iti_s']:.3f}s, "
+                f"move ack mean {summary['mean_ack_s']:.2f}s", "INFO")
+        if summary['mismatched']:
+            self.console.log_message(f"{summary['mismatched']} DATA packets from other "
+                                     f"positions were not counted as scheduled trials", "WARNING")
+            
+    def wait_for_stop(self):
+        """Block until SIGINT / SIGTERM (daemon mode)."""
+        while not self.stop_event.wait(1.0):
+            pass
+            
+    def shutdown(self):
+        """Disconnect, flush pending trials and materialize the workbook."""
+        handler = self.serial_handler
+        if handler.is_connected or handler.reconnecting:
+            handler.disconnect()
+        handler.stop_capture()
+        metrics = handler.get_metrics()
+        if metrics['link_drops']:
+            self.console.log_message(
+                f"Link drops: {metrics['link_drops']}, reconnects: {metrics['reconnects']}, "
+                f"downtime: {metrics['total_downtime_s']:.1f}s, commands replayed/expired: "
+                f"{metrics['commands_replayed']}/{metrics['commands_expired']}", "INFO")
+        self.data_writer.stop()
+        for line in self.pipeline_metrics.report():
+            self.console.log_message(line, "INFO")
+        if self.metrics_file:
+            try:
+                self.pipeline_metrics.export(self.metrics_file,
+                                             firmware=handler.firmware_version,
+                                             backend=self.data_logger.backend.name)
+                self.console.log_message(f"Metrics saved to {self.metrics_file}", "INFO")
+            except OSError as e:
+                self.console.log_message(f"Could not save metrics: {e}", "ERROR")
+        if self.beam_file and handler.beam_recorder and handler.beam_recorder.count:
+            try:
+                saved = handler.beam_recorder.save(self.beam_file)
+                self.console.log_message(f"Saved {saved} beam readings to {self.beam_file}", "INFO")
+            except OSError as e:
+                self.console.log_message(f"Could not save beam readings: {e}", "ERROR")
+        if self.data_logger.file_exists() and self.data_logger.export_to_excel():
+            self.console.log_message(f"Exported {self.data_logger.get_current_filename()}", "INFO")
+        self.data_logger.close()
+
+
+def main(argv=None):
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Headless Carousel Controller acquisition")
+    parser.add_argument("--port", help="serial port (default: auto-detect)")
+    parser.add_argument("--baud", type=int, default=115200, help="baud rate (default: 115200)")
+    parser.add_argument("--data-folder",
+                        help="data folder (default: ./data, or a new temporary folder with --replay)")
+    parser.add_argument("--backend", choices=BACKENDS, default="journal",
+                        help="trial storage: daily CSV journal or SQLite (default: journal)")
+    parser.add_argument("--script", help="file with one command per line")
+    parser.add_argument("--daemon", action="store_true",
+                        help="ignore stdin and run until SIGINT/SIGTERM (after --script, if given)")
+    parser.add_argument("--quiet", action="store_true",
+                        help="only print DATA, ERROR and WARNING lines")
+    parser.add_argument("--protocol", metavar="POSITIONS",
+                        help="run a scheduled protocol over positions, e.g. 1-12 or 1,5,9")
+    parser.add_argument("--blocks", type=int, default=1,
+                        help="times to run the position list (default: 1)")
+    parser.add_argument("--randomize", action="store_true",
+                        help="shuffle positions within each block")
+    parser.add_argument("--iti", type=float, default=0.0,
+                        help="inter-trial interval in seconds (default: 0)")
+    parser.add_argument("--seed", type=int, help="random seed for --randomize")
+    parser.add_argument("--trial-timeout", type=float, default=600.0,
+                        help="seconds to wait for a mouse before moving on (default: 600)")
+    parser.add_argument("--capture", metavar="FILE",
+                        help="record raw serial input to a capture file")
+    parser.add_argument("--replay", metavar="FILE",
+                        help="play a capture file instead of connecting to a port")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="replay speed factor (default: 1 = original pace, 0 = flat out)")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="write per-stage pipeline latency metrics (JSON) on exit")
+    parser.add_argument("--beam", metavar="FILE",
+                        help="save beam test readings (NumPy .npz) on exit")
+    args = parser.parse_args(argv)
+    
+    schedule = None
+    if args.protocol:
+        try:
+            positions = parse_positions(args.protocol)
+        except ValueError as e:
+            parser.error(f"--protocol: {e}")
+        if args.randomize:
+            schedule = Schedule.randomized_blocks(positions, args.blocks, args.iti, args.seed)
+        else:
+            schedule = Schedule.fixed(positions, args.blocks, args.iti)
+    
+    if args.data_folder is None:
+        # Replayed trials must not land in today's production journal
+        args.data_folder = (tempfile.mkdtemp(prefix="carousel_replay_") if args.replay
+                            else "./data")
+    
+    session = HeadlessSession(args.data_folder, quiet=args.quiet, backend=args.backend,
+                              metrics_file=args.metrics, beam_file=args.beam)
+    
+    stopping = threading.Event()  # Set once a stop is under way
+    
+    def request_stop(signum, frame):
+        if stopping.is_set():
+            # Never interrupt the flush/export in shutdown()
+            print(f"Signal {signal.Signals(signum).name} ignored: shutting down, please wait...",
+                  file=sys.stderr, flush=True)
+            return
+        stopping.set()
+        session.stop_event.set()
+        raise KeyboardInterrupt  # Also interrupts a blocking stdin read
+        
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+    
+    session.data_writer.start()
+    try:
+        if args.replay:
+            return 0 if session.replay(args.replay, args.speed) else 1
+        if args.capture:
+            session.serial_handler.start_capture(args.capture)
+        if not session.connect(args.port, args.baud):
+            return 1
+        if args.script:
+            with open(args.script, encoding='utf-8') as f:
+                session.run_commands(f)
+        if schedule and not session.stop_event.is_set():
+            session.run_protocol(schedule, args.trial_timeout)
+        if args.daemon:
+            session.wait_for_stop()
+        elif not args.script and not schedule:
+            session.run_commands(sys.stdin)
+        return 0
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        stopping.set()
+        session.shutdown()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,20 +3,70 @@ Carousel Controller - Main GUI Application
 Version: 1.4.1
 
 Complete GUI interface for controlling the carousel and logging dwell time data.
+
+Usage:
+    python carousel_gui.py
+    python carousel_gui.py --startup-time    # Print time-to-first-window and exit
+    python carousel_gui.py --backend sqlite  # Store trials in data/carousel.db
 """
 
+import time
+_START_TIME = time.perf_counter()  # Startup budget reference (before heavy imports)
+
+import argparse
 import tkinter as tk
 from tkinter import ttk, scrolledtext, filedialog, messagebox
 import os
 import subprocess
 import platform
+from collections import deque
 from datetime import datetime
 
-from serial_handler import SerialHandler
-from data_logger import DataLogger
+from serial_handler import SerialHandler, SerialListener
+from column_store import ColumnStore
+from data_logger import BACKENDS, DataLogger
+from data_writer import DataWriter
+from device_state import DeviceState
+from experiment import ExperimentRunner, Schedule, parse_positions
+from log_filter import LogFilter
+from beam_monitor import ADC_MAX, BEAM_THRESHOLD, decimate
+from pipeline_metrics import STAGES, PipelineMetrics
+from session_log import SessionLog
+from port_monitor import PortMonitor
+
+_IMPORTS_DONE = time.perf_counter()
+
+
+# UI update pipeline: worker threads queue events, the Tk thread applies them
+UI_FRAME_MS = 50                  # Drain interval (~20 frames per second)
+UI_MAX_EVENTS_PER_FRAME = 5000    # Bound work per frame; the rest waits a frame
+
+# Communication log: lines kept on screen (full history goes to the session log)
+LOG_MAX_LINES = 5000
+LOG_TRIM_SLACK = 500              # Trim in bulk once this many lines over the cap
 
+# Startup: work kept off the critical path until the window is up
+STARTUP_PORT_SCAN_MS = 100
 
-class CarouselControlGUI:
+# Diagnostics window refresh interval
+DIAGNOSTICS_REFRESH_MS = 1000
+
+# Device state views: value -> colour (connection: -> (colour, text))
+CONNECTION_STYLES = {
+    "DISCONNECTED": ("red", "Disconnected"),
+    "CONNECTING": ("orange", "Connecting"),
+    "CONNECTED": ("green", "Connected"),
+    "RECONNECTING": ("orange", "Reconnecting"),
+}
+MAGNET_COLORS = {"ON_MAGNET": "green"}
+MOUSE_COLORS = {"IDLE": "blue", "ENTRY": "orange", "ENTERED": "green"}
+
+# Beam sensor plot: fixed redraw rate, seconds of history shown
+BEAM_PLOT_MS = 100
+BEAM_PLOT_SPAN_S = 10.0
+
+
+class CarouselControlGUI(SerialListener):
     """
     Main GUI application for Carousel Controller.
     
@@ -25,22 +75,52 @@ class CarouselControlGUI:
     - Real-time system status display (Magnet State, Mouse Status)
     - Control buttons (Home, Position, Door, Tests)
     - Data storage location display
-    - Communication log with color coding
+    - Communication log with color coding; repeated lines coalesced, bursts rate-limited
+    - Pipeline diagnostics (per-stage latency, counters, queue depths)
+    - Live beam sensor plot with recording export
     """
     
-    def __init__(self, root):
-        """Initialize the GUI application."""
+    def __init__(self, root, max_log_lines=LOG_MAX_LINES, storage_backend="journal"):
+        """
+        Initialize the GUI application.
+        
+        Args:
+            root: Tk root window
+            max_log_lines (int): Lines kept in the communication log widget
+            storage_backend (str): Trial storage (journal or sqlite)
+        """
         self.root = root
         self.root.title("Carousel Controller v1.4.0 - Dwell Time Logger")
         self.root.geometry("700x750")
         
+        # Events queued by any thread, applied on the Tk thread once per frame
+        # (deque append/popleft are atomic, so producers never take a lock)
+        self._ui_events = deque()
+        
         # Initialize backend components
-        self.serial_handler = SerialHandler(self)
-        self.data_logger = DataLogger()
+        self.pipeline_metrics = PipelineMetrics()
+        self.device_state = DeviceState()  # Connection, controller and session state
+        self.data_logger = DataLogger(defer_scan=True,  # Journal scanned after first paint
+                                      column_store=ColumnStore(),
+                                      backend=storage_backend)
+        self.data_writer = DataWriter(self.data_logger, on_result=self.handle_data_logged,
+                                      pipeline_metrics=self.pipeline_metrics)
+        self.data_writer.start()
+        self.serial_handler = SerialHandler(self, data_writer=self.data_writer,
+                                            pipeline_metrics=self.pipeline_metrics,
+                                            device_state=self.device_state)
+        self.session_log = SessionLog(self.data_logger.data_folder / "logs")
+        self.port_monitor = PortMonitor(
+            on_change=lambda ports, arduino_port: self.call_in_ui(
+                self.update_port_list, ports, arduino_port))
+        self.max_log_lines = max_log_lines
+        self.log_filter = LogFilter()  # Coalesces / rate-limits what the log widget draws
         
         # State tracking
         self.auto_detect_enabled = tk.BooleanVar(value=True)
         self.auto_connect_attempted = False  # Track if we've tried auto-connect on startup
+        self.connecting = False  # Non-blocking connect in progress
+        self.experiment = None   # Running ExperimentRunner, if any
         
         # Build GUI sections
         self.create_section1_serial_connection()
@@ -49,13 +129,31 @@ class CarouselControlGUI:
         self.create_section4_data_storage()
         self.create_section5_communication_log()
         
+        # Device state -> widgets, applied once per frame
+        self._state_views = {
+            'connection': self._show_connection,
+            'magnet': self._show_magnet,
+            'mouse': self._show_mouse,
+            'position': self._show_position,
+            'trials_today': self._show_trials_today,
+            'data_file': self._show_data_file,
+        }
+        self.device_state.subscribe(self._queue_state_changes, fields=self._state_views)
+        
         # Configure grid weights for resizing
         self.root.grid_rowconfigure(3, weight=1)
         self.root.grid_columnconfigure(0, weight=1)
         self.root.grid_columnconfigure(1, weight=1)
         
-        # Start port refresh timer
-        self.refresh_ports()
+        # Materialize the workbook when the window closes
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # Start UI update pipeline
+        self._drain_ui_events()
+        
+        # Deferred startup work: journal scan on a worker, first port scan after paint
+        self.data_logger.scan_in_background(on_done=self.on_startup_scan_done)
+        self.root.after(STARTUP_PORT_SCAN_MS, self.port_monitor.start)
         
     # ============================================
     # SECTION 1: Serial Connection
@@ -94,13 +192,21 @@ class CarouselControlGUI:
         self.conn_text_label.grid(row=0, column=6, padx=5)
     
     def refresh_ports(self):
-        """Refresh available serial ports."""
-        ports = self.serial_handler.get_available_ports()
+        """Rescan serial ports now (Refresh button)."""
+        self.port_monitor.refresh()
+    
+    def update_port_list(self, ports, arduino_port):
+        """
+        Apply a port list change reported by the port monitor.
+        
+        Args:
+            ports (list): Available port device names
+            arduino_port (str or None): Detected Arduino port
+        """
         self.port_combo['values'] = ports
         
         if self.auto_detect_enabled.get():
             # Try to auto-detect Arduino
-            arduino_port = self.serial_handler.auto_detect_arduino()
             if arduino_port and arduino_port in ports:
                 self.port_combo.set(arduino_port)
                 
@@ -115,14 +221,11 @@ class CarouselControlGUI:
                 self.port_combo.set(ports[0])
         elif not self.port_combo.get() and ports:
             self.port_combo.set(ports[0])
-        
-        # Schedule next refresh
-        self.root.after(2000, self.refresh_ports)
     
     def on_auto_detect_toggle(self):
         """Handle auto-detect checkbox toggle."""
         if self.auto_detect_enabled.get():
-            self.refresh_ports()
+            self.update_port_list(self.port_monitor.ports, self.port_monitor.arduino_port)
     
     def auto_connect(self, port):
         """
@@ -131,37 +234,73 @@ class CarouselControlGUI:
         Args:
             port (str): Port name to connect to
         """
-        if self.serial_handler.connect(port):
+        self.start_connect(port, auto=True)
+    
+    def start_connect(self, port, auto=False):
+        """
+        Begin a non-blocking connect; the result arrives via on_connect_result.
+        
+        Args:
+            port (str): Port name to connect to
+            auto (bool): True for the startup auto-connect
+        """
+        if self.connecting or self.serial_handler.is_connected:
+            return
+        self.connecting = True
+        self.port_monitor.pause()
+        self.connect_btn.config(text="Connecting...", state="disabled")
+        self.serial_handler.connect_async(
+            port, lambda success, port_name: self.call_in_ui(
+                self.on_connect_result, success, port_name, auto))
+    
+    def on_connect_result(self, success, port, auto=False):
+        """
+        Apply the result of a non-blocking connect (Tk thread).
+        
+        Args:
+            success (bool): True if connected and ready
+            port (str): Port name
+            auto (bool): True for the startup auto-connect
+        """
+        self.connecting = False
+        self.connect_btn.config(state="normal")
+        if success:
             self.connect_btn.config(text="Disconnect")
-            self.conn_status_label.config(foreground="green")
-            self.conn_text_label.config(text="Connected")
-            self.log_message(f"✓ Successfully connected to {port}", "STATUS")
+            version = self.serial_handler.firmware_version
+            detail = f" (firmware {version})" if version else ""
+            if auto:
+                self.log_message(f"✓ Successfully connected to {port}{detail}", "STATUS")
+            else:
+                self.log_message(f"Connected to {port}{detail}", "INFO")
         else:
-            self.log_message(f"✗ Failed to auto-connect to {port}", "ERROR")
+            self.port_monitor.resume()
+            self.connect_btn.config(text="Connect")
+            if auto:
+                self.log_message(f"✗ Failed to auto-connect to {port}", "ERROR")
+            else:
+                messagebox.showerror("Error", "Failed to connect!")
     
     def toggle_connection(self):
         """Toggle serial connection on/off."""
-        if not self.serial_handler.is_connected:
+        if self.connecting:
+            return
+        if not (self.serial_handler.is_connected or self.serial_handler.reconnecting):
             # Connect
             port = self.port_combo.get()
             if not port:
                 messagebox.showerror("Error", "No port selected!")
                 return
             
-            if self.serial_handler.connect(port):
-                self.connect_btn.config(text="Disconnect")
-                self.conn_status_label.config(foreground="green")
-                self.conn_text_label.config(text="Connected")
-                self.log_message(f"Connected to {port}", "INFO")
-            else:
-                messagebox.showerror("Error", "Failed to connect!")
+            self.start_connect(port)
         else:
             # Disconnect
+            if self.experiment:
+                self.experiment.stop()
             self.serial_handler.disconnect()
             self.connect_btn.config(text="Connect")
-            self.conn_status_label.config(foreground="red")
-            self.conn_text_label.config(text="Disconnected")
             self.log_message("Disconnected", "INFO")
+            self.port_monitor.resume()
+            self.export_excel()
     
     # ============================================
     # SECTION 2: System Status
@@ -207,6 +346,10 @@ class CarouselControlGUI:
                    width=10).pack(side="left", padx=5)
         ttk.Button(trouble_frame, text="Test Beam", command=self.send_beam,
                    width=10).pack(side="left", padx=5)
+        ttk.Button(trouble_frame, text="Beam Plot", command=self.show_beam_plot,
+                   width=10).pack(side="left", padx=5)
+        self.beam_window = None
+        self.beam_drawn = None  # BeamRecorder.count last drawn
     
     def send_status_command(self):
         """Send status command to Arduino."""
@@ -255,6 +398,33 @@ class CarouselControlGUI:
                    width=10).pack(side="left", padx=5)
         ttk.Button(door_frame, text="Close", command=self.send_close,
                    width=10).pack(side="left", padx=5)
+        
+        # Scheduled protocol
+        protocol_frame = ttk.LabelFrame(frame, text="Protocol", padding=5)
+        protocol_frame.grid(row=4, column=0, columnspan=4, sticky="ew")
+        
+        self.protocol_positions = tk.StringVar(value="1-12")
+        self.protocol_blocks = tk.StringVar(value="1")
+        self.protocol_iti = tk.StringVar(value="10")
+        self.protocol_random = tk.BooleanVar(value=True)
+        
+        ttk.Label(protocol_frame, text="Positions:").grid(row=0, column=0, sticky="w")
+        ttk.Entry(protocol_frame, textvariable=self.protocol_positions,
+                  width=12).grid(row=0, column=1, sticky="w", padx=2)
+        ttk.Label(protocol_frame, text="Blocks:").grid(row=0, column=2, sticky="w")
+        ttk.Entry(protocol_frame, textvariable=self.protocol_blocks,
+                  width=4).grid(row=0, column=3, sticky="w", padx=2)
+        ttk.Label(protocol_frame, text="ITI (s):").grid(row=1, column=0, sticky="w")
+        ttk.Entry(protocol_frame, textvariable=self.protocol_iti,
+                  width=6).grid(row=1, column=1, sticky="w", padx=2)
+        ttk.Checkbutton(protocol_frame, text="Randomize",
+                        variable=self.protocol_random).grid(row=1, column=2, columnspan=2, sticky="w")
+        
+        self.protocol_btn = ttk.Button(protocol_frame, text="Run Protocol",
+                                       command=self.toggle_protocol, width=14)
+        self.protocol_btn.grid(row=2, column=0, columnspan=2, pady=(5, 0), sticky="w")
+        self.protocol_label = ttk.Label(protocol_frame, text="Idle", foreground="gray")
+        self.protocol_label.grid(row=2, column=2, columnspan=2, pady=(5, 0), sticky="w")
     
     def send_home(self):
         """Send home command."""
@@ -277,13 +447,173 @@ class CarouselControlGUI:
         """Send manual door close command."""
         self.serial_handler.send_command("close")
     
+    def toggle_protocol(self):
+        """Start the scheduled protocol, or stop the running one."""
+        if self.experiment and self.experiment.running:
+            self.experiment.stop()
+            return
+        if not self.serial_handler.is_connected:
+            messagebox.showerror("Error", "Not connected to Arduino!")
+            return
+        try:
+            positions = parse_positions(self.protocol_positions.get())
+            blocks = int(self.protocol_blocks.get())
+            iti = float(self.protocol_iti.get())
+        except ValueError as e:
+            messagebox.showerror("Error", f"Invalid protocol: {e}")
+            return
+        if self.protocol_random.get():
+            schedule = Schedule.randomized_blocks(positions, blocks, iti)
+        else:
+            schedule = Schedule.fixed(positions, blocks, iti)
+        
+        # Runner callbacks arrive on its worker thread
+        self.experiment = ExperimentRunner(
+            self.serial_handler, schedule,
+            on_message=self.log_message,
+            on_progress=lambda done, total, result: self.call_in_ui(
+                self.update_protocol_progress, done, total),
+            on_finished=lambda results, reason: self.call_in_ui(
+                self.on_protocol_finished, reason))
+        self.experiment.start()
+        self.protocol_btn.config(text="Stop Protocol")
+        self.update_protocol_progress(0, len(schedule))
+    
+    def update_protocol_progress(self, done, total):
+        """
+        Show protocol progress (Tk thread).
+        
+        Args:
+            done (int): Trials finished
+            total (int): Trials scheduled
+        """
+        self.protocol_label.config(text=f"Trial {done}/{total}", foreground="green")
+    
+    def on_protocol_finished(self, reason):
+        """
+        Reset the protocol controls when a run ends (Tk thread).
+        
+        Args:
+            reason (str): completed, stopped or aborted (...)
+        """
+        self.protocol_btn.config(text="Run Protocol")
+        color = "gray" if reason in ("completed", "stopped") else "red"
+        self.protocol_label.config(text=reason.split(' ')[0].capitalize(), foreground=color)
+    
     def send_mag(self):
         """Send mag test command."""
         self.serial_handler.send_command("mag")
     
     def send_beam(self):
-        """Send beam test command."""
+        """Send beam test command and show the readings."""
         self.serial_handler.send_command("beam")
+        self.show_beam_plot()
+    
+    def show_beam_plot(self):
+        """Open (or raise) the live beam sensor plot."""
+        if self.beam_window is not None:
+            self.beam_window.lift()
+            return
+        window = tk.Toplevel(self.root)
+        window.title("Beam Sensors - S1 (mainchamber) / S2 (subchamber)")
+        window.protocol("WM_DELETE_WINDOW", self.close_beam_plot)
+        
+        canvas = tk.Canvas(window, width=600, height=260, background="white")
+        canvas.pack(fill="both", expand=True, padx=5, pady=5)
+        canvas.bind("<Configure>", lambda event: setattr(self, 'beam_drawn', None))
+        self.beam_values = ttk.Label(window, text="No readings yet", font=("Courier", 10))
+        self.beam_values.pack(side="left", padx=5, pady=(0, 5))
+        ttk.Button(window, text="Save Recording...",
+                   command=self.save_beam_recording).pack(side="right", padx=5, pady=(0, 5))
+        ttk.Button(window, text="Clear",
+                   command=self.clear_beam_recording).pack(side="right", padx=5, pady=(0, 5))
+        
+        self.beam_window = window
+        self.beam_canvas = canvas
+        self.beam_drawn = None
+        self.update_beam_plot()
+    
+    def close_beam_plot(self):
+        """Close the beam plot (recording continues)."""
+        self.beam_window.destroy()
+        self.beam_window = None
+    
+    def update_beam_plot(self):
+        """Redraw the beam plot while it is open, at most every BEAM_PLOT_MS and only on new samples."""
+        if self.beam_window is None:
+            return
+        recorder = self.serial_handler.beam_recorder
+        count = recorder.count if recorder else 0
+        if count != self.beam_drawn:
+            self.beam_drawn = count
+            self.draw_beam_plot(recorder)
+        self.root.after(BEAM_PLOT_MS, self.update_beam_plot)
+    
+    def draw_beam_plot(self, recorder):
+        """Draw the last BEAM_PLOT_SPAN_S seconds as min/max envelopes (O(canvas width))."""
+        import numpy as np  # Deferred: already loaded by the recorder
+        
+        canvas = self.beam_canvas
+        canvas.delete("all")
+        width = max(canvas.winfo_width(), 2)
+        height = max(canvas.winfo_height(), 2)
+        
+        y_scale = (height - 1) / ADC_MAX
+        threshold_y = height - BEAM_THRESHOLD * y_scale
+        canvas.create_line(0, threshold_y, width, threshold_y, fill="red", dash=(4, 4))
+        canvas.create_text(width - 5, threshold_y - 2, anchor="se", fill="red",
+                           text=f"threshold {BEAM_THRESHOLD}")
+        canvas.create_text(5, 5, anchor="nw", fill="blue", text="S1")
+        canvas.create_text(30, 5, anchor="nw", fill="darkorange", text="S2")
+        if not recorder or not recorder.count:
+            self.beam_values.config(text="No readings yet")
+            return
+        
+        end = recorder.snapshot(last=1)[0][-1]  # Newest sample at the right edge
+        t, s1, s2 = recorder.snapshot(since=end - BEAM_PLOT_SPAN_S)
+        for values, color in ((s1, "blue"), (s2, "darkorange")):
+            times, low, high = decimate(t, values, width // 2)
+            xs = (times - (end - BEAM_PLOT_SPAN_S)) * (width / BEAM_PLOT_SPAN_S)
+            upper = np.column_stack((xs, height - high * y_scale)).ravel().tolist()
+            if len(xs) < 2:
+                x, y = upper
+                canvas.create_oval(x - 2, y - 2, x + 2, y + 2, fill=color, outline=color)
+            elif low is high:
+                canvas.create_line(*upper, fill=color)
+            else:
+                lower = np.column_stack((xs, height - low * y_scale))[::-1].ravel().tolist()
+                canvas.create_polygon(*upper, *lower, fill=color, outline=color)
+        
+        latest = [(name, int(values[-1])) for name, values in (("S1", s1), ("S2", s2))]
+        self.beam_values.config(text="   ".join(
+            f"{name}={value} {'BLOCKED' if value > BEAM_THRESHOLD else 'CLEAR'}"
+            for name, value in latest))
+    
+    def save_beam_recording(self):
+        """Save the recorded beam readings as compressed NumPy arrays (.npz)."""
+        recorder = self.serial_handler.beam_recorder
+        if not recorder or not recorder.count:
+            messagebox.showinfo("Beam Recording", "No beam readings recorded yet",
+                                parent=self.beam_window)
+            return
+        filename = filedialog.asksaveasfilename(
+            parent=self.beam_window,
+            defaultextension=".npz",
+            filetypes=[("NumPy archives", "*.npz"), ("All files", "*.*")],
+            initialfile=f"carousel_beam_{datetime.now().strftime('%Y%m%d_%H%M%S')}.npz"
+        )
+        if filename:
+            try:
+                saved = recorder.save(filename)
+                self.log_message(f"Saved {saved} beam readings to {filename}", "INFO")
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to save beam recording: {e}")
+    
+    def clear_beam_recording(self):
+        """Forget the recorded beam readings."""
+        if self.serial_handler.beam_recorder:
+            self.serial_handler.beam_recorder.clear()
+        self.beam_drawn = None
     
     # ============================================
     # SECTION 4: Data Storage
@@ -311,24 +641,104 @@ class CarouselControlGUI:
         self.location_label = ttk.Label(frame, text=location_text, font=("Courier", 10))
         self.location_label.grid(row=1, column=1, columnspan=2, sticky="w", padx=10)
         
-        # Open folder button
+        # Open folder / export buttons
         ttk.Button(frame, text="Open Folder", 
                    command=self.open_data_folder).grid(row=1, column=3, padx=5)
+        ttk.Button(frame, text="Export Excel", 
+                   command=self.export_excel).grid(row=1, column=4, padx=5)
+        ttk.Button(frame, text="Position Stats",
+                   command=self.show_position_stats).grid(row=0, column=4, padx=5)
+        self.stats_window = None
+        self.stats_version = None  # PositionStats.version last shown
         
         # Update file display every 5 seconds
         self.update_file_display()
     
     def update_file_display(self):
-        """Update file display with current information."""
-        filename = self.data_logger.get_current_filename()
-        trial_count = self.data_logger.get_trial_count()
-        
-        self.file_label.config(text=filename)
-        self.trial_count_label.config(text=str(trial_count))
+        """Update file display with current information (labels change only if the values did)."""
+        self.device_state.update(data_file=self.data_logger.get_current_filename(),
+                                 trials_today=self.data_logger.get_trial_count())
         
         # Schedule next update
         self.root.after(5000, self.update_file_display)
     
+    def export_excel(self):
+        """Materialize today's Excel workbook from the trial journal."""
+        if not self.data_logger.file_exists():
+            return
+        if self.data_logger.export_to_excel():
+            self.log_message(f"Exported {self.data_logger.get_current_filename()}", "INFO")
+        else:
+            self.log_message("✗ Failed to export Excel file", "ERROR")
+    
+    def on_startup_scan_done(self, recovered):
+        """
+        Report the deferred startup scan (runs on the scan thread).
+        
+        Args:
+            recovered (list): Workbooks rebuilt from their journals
+        """
+        for name in recovered:
+            self.log_message(f"Recovered {name} from its journal", "WARNING")
+        self.call_in_ui(self.update_trial_count)
+    
+    def update_trial_count(self):
+        """Refresh the Trials Today count (backend count query, no file scan)."""
+        self.device_state.update(trials_today=self.data_logger.get_trial_count())
+        self.update_position_stats()
+    
+    def show_position_stats(self):
+        """Open (or raise) the live per-position dwell statistics window."""
+        if self.stats_window is not None:
+            self.stats_window.lift()
+            return
+        window = tk.Toplevel(self.root)
+        window.title("Position Statistics - Dwell Time (s)")
+        window.protocol("WM_DELETE_WINDOW", self.close_position_stats)
+        
+        columns = ("count", "mean", "std", "min", "median", "p90", "max")
+        headings = ("Trials", "Mean", "SD", "Min", "Median*", "P90*", "Max")
+        tree = ttk.Treeview(window, columns=columns, height=12)
+        tree.heading("#0", text="Position")
+        tree.column("#0", width=70, anchor="w")
+        for column, heading in zip(columns, headings):
+            tree.heading(column, text=heading)
+            tree.column(column, width=70, anchor="e")
+        for position in range(1, 13):
+            tree.insert("", "end", iid=str(position), text=f"p{position}",
+                        values=("0",) + ("-",) * 6)
+        tree.pack(fill="both", expand=True, padx=5, pady=5)
+        ttk.Label(window, text="* streaming estimate (P-square)",
+                  foreground="gray").pack(anchor="w", padx=5, pady=(0, 5))
+        
+        self.stats_window = window
+        self.stats_tree = tree
+        self.stats_version = None
+        self.update_position_stats()
+    
+    def close_position_stats(self):
+        """Close the statistics window."""
+        self.stats_window.destroy()
+        self.stats_window = None
+    
+    def update_position_stats(self):
+        """Refresh the statistics window if it is open and anything changed (O(12))."""
+        if self.stats_window is None:
+            return
+        version = self.data_logger.position_stats.version
+        if version == self.stats_version:
+            return
+        self.stats_version = version
+        stats = self.data_logger.get_position_stats()
+        for position in range(1, 13):
+            summary = stats.get(position)
+            if summary is None:
+                values = ("0",) + ("-",) * 6
+            else:
+                values = (summary['count'],) + tuple(
+                    f"{summary[key]:.2f}" for key in ("mean", "std", "min", "median", "p90", "max"))
+            self.stats_tree.item(str(position), values=values)
+    
     def open_data_folder(self):
         """Open data folder in file explorer."""
         folder_path = self.data_logger.get_data_folder_path()
@@ -371,6 +781,9 @@ class CarouselControlGUI:
                    command=self.clear_log).pack(side="left", padx=5)
         ttk.Button(btn_frame, text="Save Log", 
                    command=self.save_log).pack(side="left", padx=5)
+        ttk.Button(btn_frame, text="Diagnostics",
+                   command=self.show_diagnostics).pack(side="left", padx=5)
+        self.diagnostics_window = None
         
         # Configure grid weights
         frame.grid_rowconfigure(0, weight=1)
@@ -384,15 +797,107 @@ class CarouselControlGUI:
         """
         Add message to communication log with timestamp and color coding.
         
+        Safe to call from any thread; the text is inserted on the next frame
+        (through the log filter; the session log gets every line).
+        
         Args:
             message (str): Message to log
             message_type (str): Type of message (INFO, WARNING, ERROR, DATA, STATUS, COMMAND)
         """
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        formatted_message = f"[{timestamp}] {message}\n"
+        self._ui_events.append(("log", message, message_type, time.time()))
+    
+    def call_in_ui(self, func, *args, **kwargs):
+        """
+        Run a widget update on the Tk thread at the next frame.
+        
+        Args:
+            func: Callable to run
+            *args, **kwargs: Arguments for func
+        """
+        self._ui_events.append(("call", func, args, kwargs))
+    
+    def _drain_ui_events(self):
+        """
+        Apply queued UI events in one batch (runs every UI_FRAME_MS).
+        
+        Every log line goes to the session log; the log filter decides which
+        are drawn. Consecutive drawn lines with the same tag are joined into
+        one run and inserted with a single call; the log scrolls once per
+        frame, and only the latest value of each changed device state field
+        is applied.
+        """
+        events = self._ui_events
+        log_filter = self.log_filter
+        logged = []        # Every line, for the session log
+        drawn = []         # (text, tag) passed by the log filter
+        states = {}        # Latest value of each changed device state field
+        calls = []
+        rendered = []      # Receive times of trials shown this frame
+        self.pipeline_metrics.gauge("ui_queue", len(events))
+        
+        for _ in range(min(len(events), UI_MAX_EVENTS_PER_FRAME)):
+            event = events.popleft()
+            kind = event[0]
+            if kind == "log":
+                _, message, message_type, stamp = event
+                text = _format_log_line(message, stamp)
+                logged.append(text)
+                for shown_stamp, shown, tag in log_filter.submit(message, message_type, stamp):
+                    drawn.append((text if shown is message else
+                                  _format_log_line(shown, shown_stamp), tag))
+            elif kind == "state":
+                states.update(event[1])
+            elif kind == "trial":
+                rendered.append(event[1])
+            else:
+                calls.append(event)
+        for shown_stamp, shown, tag in log_filter.flush(time.time()):
+            drawn.append((_format_log_line(shown, shown_stamp), tag))
         
-        self.log_text.insert("end", formatted_message, message_type)
-        self.log_text.see("end")  # Auto-scroll to bottom
+        runs = []          # Alternating text, tag pairs for Text.insert
+        run_lines = []
+        run_tag = None
+        for text, tag in drawn:
+            if tag != run_tag and run_lines:
+                runs.extend(("".join(run_lines), run_tag))
+                run_lines = []
+            run_tag = tag
+            run_lines.append(text)
+        if run_lines:
+            runs.extend(("".join(run_lines), run_tag))
+        
+        try:
+            if logged:
+                self.session_log.write("".join(logged))
+            if runs:
+                self.log_text.insert("end", *runs)
+                self._trim_log()
+                self.log_text.see("end")  # Auto-scroll to bottom
+            for field, value in states.items():
+                self._state_views[field](value)
+            for _, func, args, kwargs in calls:
+                func(*args, **kwargs)
+            if rendered:
+                now = time.perf_counter()
+                for received in rendered:
+                    self.pipeline_metrics.record("rendered", received, now)
+        except Exception as e:
+            print(f"ERROR applying UI updates: {e}")
+        
+        self.root.after(UI_FRAME_MS, self._drain_ui_events)
+    
+    def _drain_pending_log(self):
+        """Write log lines still queued for the next frame to the session log."""
+        lines = [_format_log_line(event[1], event[3])
+                 for event in list(self._ui_events) if event[0] == "log"]
+        self.session_log.write("".join(lines))
+    
+    def _trim_log(self):
+        """Drop the oldest widget lines in bulk once the cap plus slack is exceeded."""
+        line_count = int(self.log_text.index("end-1c").split('.')[0])
+        excess = line_count - self.max_log_lines
+        if excess > LOG_TRIM_SLACK:
+            self.log_text.delete("1.0", f"{excess + 1}.0")
     
     def clear_log(self):
         """Clear the communication log."""
@@ -401,7 +906,7 @@ class CarouselControlGUI:
             self.log_message("Log cleared", "INFO")
     
     def save_log(self):
-        """Save communication log to file."""
+        """Save the complete session log (not just the visible lines) to file."""
         filename = filedialog.asksaveasfilename(
             defaultextension=".txt",
             filetypes=[("Text files", "*.txt"), ("All files", "*.*")],
@@ -409,79 +914,242 @@ class CarouselControlGUI:
         )
         if filename:
             try:
-                with open(filename, 'w') as f:
-                    f.write(self.log_text.get("1.0", "end"))
+                self.session_log.export(filename)
                 messagebox.showinfo("Success", f"Log saved to {filename}")
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to save log: {e}")
     
+    def show_diagnostics(self):
+        """Open (or raise) the pipeline diagnostics window."""
+        if self.diagnostics_window is not None:
+            self.diagnostics_window.lift()
+            return
+        window = tk.Toplevel(self.root)
+        window.title("Diagnostics - Serial Pipeline Latency")
+        window.protocol("WM_DELETE_WINDOW", self.close_diagnostics)
+        
+        columns = ("count", "mean", "p50", "p90", "p99", "max")
+        headings = ("Count", "Mean", "P50", "P90", "P99", "Max")
+        tree = ttk.Treeview(window, columns=columns, height=len(STAGES))
+        tree.heading("#0", text="Stage (ms)")
+        tree.column("#0", width=90, anchor="w")
+        for column, heading in zip(columns, headings):
+            tree.heading(column, text=heading)
+            tree.column(column, width=70, anchor="e")
+        for stage in STAGES:
+            tree.insert("", "end", iid=stage, text=stage, values=("0",) + ("-",) * 5)
+        tree.pack(fill="both", expand=True, padx=5, pady=5)
+        ttk.Label(window, text="Age of a line since its bytes were read; "
+                               "percentiles over the last minute",
+                  foreground="gray").pack(anchor="w", padx=5)
+        self.diagnostics_counters = ttk.Label(window, font=("Courier", 9), justify="left")
+        self.diagnostics_counters.pack(anchor="w", padx=5, pady=5)
+        ttk.Button(window, text="Export...",
+                   command=self.export_diagnostics).pack(anchor="e", padx=5, pady=(0, 5))
+        
+        self.diagnostics_window = window
+        self.diagnostics_tree = tree
+        self.update_diagnostics()
+    
+    def close_diagnostics(self):
+        """Close the diagnostics window."""
+        self.diagnostics_window.destroy()
+        self.diagnostics_window = None
+    
+    def update_diagnostics(self):
+        """Refresh the diagnostics window while it is open (every DIAGNOSTICS_REFRESH_MS)."""
+        if self.diagnostics_window is None:
+            return
+        snapshot = self.pipeline_metrics.snapshot()
+        for stage, summary in snapshot['stages'].items():
+            values = [summary['count']]
+            for key in ("mean_ms", "p50_ms", "p90_ms", "p99_ms", "max_ms"):
+                values.append("-" if summary[key] is None else f"{summary[key]:.2f}")
+            self.diagnostics_tree.item(stage, values=values)
+        counters = snapshot['counters']
+        rates = snapshot['rates']
+        gauges = snapshot['gauges']
+        self.diagnostics_counters.config(text=(
+            f"Lines: {counters['lines']} ({rates['lines']:.1f}/s)   "
+            f"Bytes: {counters['bytes']}   DATA: {counters['data']}\n"
+            f"Errors: {counters['errors']}   Write errors: {counters['write_errors']}\n"
+            f"Write queue: {gauges['write_queue']['current']} (max {gauges['write_queue']['max']})   "
+            f"UI queue: {gauges['ui_queue']['current']} (max {gauges['ui_queue']['max']})\n"
+            f"Log lines not drawn: {self.log_filter.counts['coalesced']} coalesced, "
+            f"{self.log_filter.counts['suppressed']} rate-limited"))
+        self.root.after(DIAGNOSTICS_REFRESH_MS, self.update_diagnostics)
+    
+    def export_diagnostics(self):
+        """Save the pipeline metrics as JSON for offline comparison."""
+        filename = filedialog.asksaveasfilename(
+            parent=self.diagnostics_window,
+            defaultextension=".json",
+            filetypes=[("JSON files", "*.json"), ("All files", "*.*")],
+            initialfile=f"carousel_metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        )
+        if filename:
+            try:
+                self.pipeline_metrics.export(
+                    filename, firmware=self.serial_handler.firmware_version,
+                    backend=self.data_logger.backend.name)
+                self.log_message(f"Diagnostics saved to {filename}", "INFO")
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to save diagnostics: {e}")
+    
+    # ============================================
+    # Shutdown
+    # ============================================
+    
+    def on_close(self):
+        """Disconnect, flush pending trials, materialize the workbook and close."""
+        self.port_monitor.stop()
+        if self.experiment:
+            self.experiment.stop()
+        if self.serial_handler.is_connected or self.serial_handler.reconnecting:
+            self.serial_handler.disconnect()
+        self.serial_handler.stop_capture()
+        self.data_writer.stop()
+        self.data_logger.export_to_excel()
+        self.data_logger.close()
+        self._drain_pending_log()
+        self.session_log.close()
+        self.root.destroy()
+    
     # ============================================
     # Data Handling Callbacks
     # ============================================
     
-    def handle_data_packet(self, line):
+    def handle_data_logged(self, success, count, message=None):
         """
-        Handle DATA packet from Arduino.
+        Handle a commit result from the background data writer.
         
         Args:
-            line (str): DATA packet line
+            success (bool): True if the trials reached the journal
+            count (int): Number of trials in the commit
+            message (str): Optional failure detail
         """
-        success = self.data_logger.parse_data_packet(line)
         if success:
-            self.log_message(f"✓ Data logged successfully", "STATUS")
+            if count == 1:
+                self.log_message(f"✓ Data logged successfully", "STATUS")
+            else:
+                self.log_message(f"✓ {count} trials logged successfully", "STATUS")
             # Update trial count
-            self.trial_count_label.config(text=str(self.data_logger.get_trial_count()))
+            self.call_in_ui(self.update_trial_count)
         else:
-            self.log_message(f"✗ Failed to log data", "ERROR")
+            self.log_message(message or f"✗ Failed to log data", "ERROR")
     
-    def handle_status_update(self, line):
+    def handle_trial(self, record):
         """
-        Handle STATUS update from Arduino.
+        Note a trial's receive time so its render latency is recorded.
         
-        Format: STATUS:FIELD:VALUE
-        Examples:
-            STATUS:MAGNET:ON_MAGNET
-            STATUS:MOUSE:ENTERED
-            STATUS:POSITION:5
+        Safe to call from any thread.
         
         Args:
-            line (str): STATUS update line
+            record (TrialRecord): Decoded trial
         """
-        try:
-            parts = line.split(':')
-            if len(parts) == 3:
-                field = parts[1].upper()  # Convert to uppercase for case-insensitive matching
-                value = parts[2]
-                
-                if field == "MAGNET":
-                    self.magnet_label.config(text=value)
-                    # Color coding
-                    if value == "ON_MAGNET":
-                        self.magnet_label.config(foreground="green")
-                    else:
-                        self.magnet_label.config(foreground="gray")
-                
-                elif field == "MOUSE":
-                    self.mouse_label.config(text=value)
-                    # Color coding for mouse status
-                    if value == "IDLE":
-                        self.mouse_label.config(foreground="blue")
-                    elif value == "ENTRY":
-                        self.mouse_label.config(foreground="orange")
-                    elif value == "ENTERED":
-                        self.mouse_label.config(foreground="green")
-                
-                elif field == "POSITION":
-                    self.position_label.config(text=value)
-                        
-        except Exception as e:
-            self.log_message(f"Error parsing status update: {e}", "ERROR")
+        if record.received is not None:
+            self._ui_events.append(("trial", record.received))
+    
+    def handle_connection_state(self, state):
+        """
+        Handle a link drop / recovery reported by the serial handler.
+        
+        The indicator follows device_state; this only resets the controls
+        once the handler gives up. Safe to call from any thread.
+        
+        Args:
+            state (str): CONNECTED, RECONNECTING or DISCONNECTED
+        """
+        if state == "DISCONNECTED":
+            self.call_in_ui(self._apply_link_closed)
+    
+    def _apply_link_closed(self):
+        """Re-enable connecting after the handler closed the link (Tk thread only)."""
+        self.connect_btn.config(text="Connect")
+        self.port_monitor.resume()
+    
+    # ============================================
+    # Device state views (Tk thread, once per frame)
+    # ============================================
+    
+    def _queue_state_changes(self, changes):
+        """
+        DeviceState subscriber: queue changed fields for the next frame.
+        
+        Runs on the updating thread with the state lock held, so it only
+        appends to the UI event queue.
+        
+        Args:
+            changes (dict): Changed fields and their new values
+        """
+        self._ui_events.append(("state", changes))
+    
+    def _show_connection(self, state):
+        color, text = CONNECTION_STYLES.get(state, ("red", state))
+        self.conn_status_label.config(foreground=color)
+        self.conn_text_label.config(text=text)
+    
+    def _show_magnet(self, value):
+        self.magnet_label.config(text=value or "Unknown",
+                                 foreground=MAGNET_COLORS.get(value, "gray"))
+    
+    def _show_mouse(self, value):
+        self.mouse_label.config(text=value or "Unknown",
+                                foreground=MOUSE_COLORS.get(value, "gray"))
+    
+    def _show_position(self, value):
+        self.position_label.config(text="Unknown" if value is None else f"p{value}")
+    
+    def _show_trials_today(self, count):
+        self.trial_count_label.config(text=str(count or 0))
+    
+    def _show_data_file(self, filename):
+        self.file_label.config(text=filename or "")
+
+
+def _format_log_line(message, stamp):
+    """Communication log line: [HH:MM:SS] message."""
+    return f"[{time.strftime('%H:%M:%S', time.localtime(stamp))}] {message}\n"
+
+
+def report_startup_time(root):
+    """
+    Print the startup budget once the window is mapped, then close.
+    
+    Args:
+        root: Tk root window
+    """
+    def on_map(event):
+        if event.widget is not root:
+            return
+        root.update_idletasks()
+        first_window = time.perf_counter()
+        print(f"imports:         {(_IMPORTS_DONE - _START_TIME) * 1000:7.1f} ms")
+        print(f"window built:    {(built - _IMPORTS_DONE) * 1000:7.1f} ms")
+        print(f"first window:    {(first_window - _START_TIME) * 1000:7.1f} ms")
+        root.after(0, root.destroy)
+    
+    built = time.perf_counter()
+    root.bind("<Map>", on_map, add="+")
 
 
-def main():
+def main(argv=None):
     """Main entry point for the application."""
+    parser = argparse.ArgumentParser(description="Carousel Controller GUI")
+    parser.add_argument("--startup-time", action="store_true",
+                        help="print time-to-first-window (ms) and exit")
+    parser.add_argument("--backend", choices=BACKENDS, default="journal",
+                        help="trial storage: daily CSV journal or SQLite (default: journal)")
+    parser.add_argument("--capture", metavar="FILE",
+                        help="record raw serial input to a capture file (see serial_capture.py)")
+    args = parser.parse_args(argv)
+    
     root = tk.Tk()
-    app = CarouselControlGUI(root)
+    app = CarouselControlGUI(root, storage_backend=args.backend)
+    if args.capture:
+        app.serial_handler.start_capture(args.capture)
+    if args.startup_time:
+        report_startup_time(root)
     root.mainloop()
 
 
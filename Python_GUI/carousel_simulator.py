@@ -0,0 +1,445 @@
+"""
+Carousel Controller - Simulator Module
+Version: 1.4.0
+
+Software stand-in for Carousel_Controller.ino on a Linux pseudo-terminal.
+Speaks the same line protocol (startup banner, STATUS:FIELD:VALUE, DATA
+packets, ERROR lines) and answers home / pN / open / close / status /
+stop / mag / beam, so SerialHandler and DataLogger can be exercised and
+benchmarked without the Arduino.
+
+Usage:
+    python carousel_simulator.py                  # Interactive rig on a pty
+    python carousel_simulator.py --speed 10       # Door cycles 10x faster
+"""
+
+import argparse
+import os
+import random
+import select
+import termios
+import threading
+import time
+import tty
+
+
+FIRMWARE_VERSION = "1.4.1"
+BEAM_THRESHOLD = 700
+POSITIONS = 12
+
+
+class CarouselSimulator:
+    """
+    Simulated Carousel Controller behind a pty.
+    
+    Features:
+    - Same banner, command replies and packet formats as the firmware
+    - Reset-on-open: re-prints the banner when a client configures the port
+    - Door cycles with simulated mouse entry/exit and millis() timestamps
+    - Direct DATA packet injection at a chosen rate and burst size (benchmarks)
+    """
+    
+    def __init__(self, speed=1.0, dwell_range=(1.0, 8.0), seed=None,
+                 reset_on_open=True, boot_delay=0.5):
+        """
+        Initialize simulator.
+        
+        Args:
+            speed (float): Time scale for motion and door cycles (10 = 10x faster)
+            dwell_range (tuple): Min/max simulated dwell time in seconds
+            seed: Optional random seed for reproducible sessions
+            reset_on_open (bool): Reboot (state reset + banner) when a client opens the port
+            boot_delay (float): Seconds from port open to banner (bootloader time)
+        """
+        self.speed = speed
+        self.reset_on_open = reset_on_open
+        self.boot_delay = boot_delay
+        self.dwell_range = dwell_range
+        self.random = random.Random(seed)
+        self.master_fd = None
+        self.slave_fd = None
+        self.device = None
+        self._port_settings = None
+        self.running = False
+        self.thread = None
+        self.write_lock = threading.Lock()
+        self.start_time = time.monotonic()
+        
+        # Controller state (mirrors the firmware globals)
+        self.is_calibrated = False
+        self.current_position = 0
+        self.on_magnet = False
+        self.door_open = False
+        self.door_auto = False
+        self.cycle_armed = False  # isDoorCycleArmed: set by a move, used by one cycle
+        self.session_trial = 0
+        self.cycle_token = 0
+        
+    # ============================================
+    # pty lifecycle
+    # ============================================
+    
+    def start(self, banner=True):
+        """
+        Create the pty and start answering commands.
+        
+        Args:
+            banner (bool): Print the firmware startup banner
+            
+        Returns:
+            str: Device path for the client side (e.g. '/dev/pts/5')
+        """
+        self.master_fd, self.slave_fd = os.openpty()
+        tty.setraw(self.slave_fd)  # No echo or newline translation
+        self.device = os.ttyname(self.slave_fd)
+        self._port_settings = termios.tcgetattr(self.slave_fd)
+        self.running = True
+        self.thread = threading.Thread(target=self._command_loop, daemon=True)
+        self.thread.start()
+        if banner:
+            self.print_banner()
+        return self.device
+        
+    def stop(self):
+        """Stop answering commands and close the pty."""
+        self.running = False
+        self.cycle_token += 1  # Cancel pending door cycles
+        if self.thread:
+            self.thread.join(timeout=1)
+        for fd in (self.master_fd, self.slave_fd):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self.master_fd = self.slave_fd = None
+        
+    def millis(self):
+        """
+        Simulated Arduino millis().
+        
+        Returns:
+            int: Milliseconds since start, wrapped to 32 bits
+        """
+        return int((time.monotonic() - self.start_time) * 1000) & 0xFFFFFFFF
+        
+    def emit(self, *lines):
+        """
+        Send lines to the client in a single write.
+        
+        Args:
+            *lines (str): Lines without newline
+        """
+        if self.master_fd is None:
+            return
+        data = "".join(f"{line}\r\n" for line in lines).encode('utf-8')
+        with self.write_lock:
+            view = memoryview(data)
+            while view:
+                written = os.write(self.master_fd, view)
+                view = view[written:]
+                
+    def status(self, field, value):
+        """Send STATUS:FIELD:VALUE (like sendStatusUpdate)."""
+        self.emit(f"STATUS:{field}:{value}")
+        
+    def sleep(self, seconds):
+        """Sleep for simulated seconds."""
+        time.sleep(seconds / self.speed)
+        
+    def print_banner(self):
+        """Send the startup banner printed by setup()."""
+        self.emit(
+            f"=== Carousel Controller {FIRMWARE_VERSION} ===",
+            "Commands:",
+            "  'home' - Find home position (MAG1) and initialize system",
+            "  'p1' to 'p12' - Move to specific position (shortest path)",
+            "  'open' - Open door (only when on magnet)",
+            "  'close' - Close door (only when on magnet)",
+            "  'stop' or 's' - Emergency stop",
+            "  'mag' - Test magnetic sensor reading",
+            "  'beam' - Test beam breaker sensors",
+            "  'status' - Show system status",
+            "",
+            "⚠️  IMPORTANT: Run 'home' command first to initialize the system!",
+            "Status: NOT HOMED",
+        )
+        
+    # ============================================
+    # Command handling
+    # ============================================
+    
+    def reboot(self):
+        """Simulate a board reset: clear controller state and print the banner."""
+        self.cycle_token += 1
+        self.is_calibrated = False
+        self.current_position = 0
+        self.on_magnet = False
+        self.door_open = False
+        self.cycle_armed = False
+        self.session_trial = 0
+        self.start_time = time.monotonic()
+        time.sleep(self.boot_delay)
+        self.print_banner()
+        
+    def _command_loop(self):
+        """Read newline-terminated commands from the client."""
+        buffer = bytearray()
+        while self.running:
+            try:
+                ready, _, _ = select.select([self.master_fd], [], [], 0.05)
+                if not ready:
+                    # A client opening the port reconfigures it (like DTR on a real board)
+                    settings = termios.tcgetattr(self.slave_fd)
+                    if settings != self._port_settings:
+                        self._port_settings = settings
+                        if self.reset_on_open:
+                            self.reboot()
+                    continue
+                buffer += os.read(self.master_fd, 1024)
+            except OSError:
+                break
+            while True:
+                end = min((i for i in (buffer.find(b'\n'), buffer.find(b'\r')) if i >= 0),
+                          default=-1)
+                if end < 0:
+                    break
+                command = buffer[:end].decode('utf-8', errors='ignore').strip().lower()
+                del buffer[:end + 1]
+                if command:
+                    self.process_command(command)
+                    
+    def process_command(self, command):
+        """
+        Handle one command like processCommand() in the firmware.
+        
+        Args:
+            command (str): Lower-case command without newline
+        """
+        if command == "home":
+            self._home()
+        elif command.startswith("p") and len(command) >= 2:
+            if self.door_open:
+                self.emit("ERROR: Cannot move while beam monitoring is active. Close the door first.")
+                return
+            try:
+                position = int(command[1:])
+            except ValueError:
+                position = 0
+            if 1 <= position <= POSITIONS:
+                self._move(position)
+            else:
+                self.emit("ERROR: Position must be p1 to p12")
+        elif command == "open":
+            if self.on_magnet:
+                self._open_door(auto=False)
+            else:
+                self.emit("ERROR: Can only open door when on a magnet.")
+        elif command == "close":
+            if self.on_magnet:
+                self.cycle_token += 1
+                self._close_door(entered=False)
+            else:
+                self.emit("ERROR: Can only close door when on a magnet.")
+        elif command in ("stop", "s"):
+            self.cycle_armed = False
+            self.emit("Motor stopped by user.")
+        elif command == "mag":
+            threading.Thread(target=self._test_mag, daemon=True).start()
+        elif command == "beam":
+            threading.Thread(target=self._test_beam, daemon=True).start()
+        elif command == "status":
+            self._print_status()
+        else:
+            self.emit("Commands: home | p1-p12 | open | close | stop/s | rpm [value] | mag | beam | status | setup,[RMS_current],[full_current],[pulse/rev],[RPM]")
+            
+    def _home(self):
+        """Simulate handleHomingCommand()."""
+        self.emit("", "=== HOMING START ===", "Finding Home Position...",
+                  "Searching for home position...")
+        self.sleep(1.0)
+        self.is_calibrated = True
+        self.current_position = 1
+        self.on_magnet = True
+        self.session_trial = 0
+        self.emit("Home position found.", "", "=== HOMING COMPLETE ===",
+                  "System initialized with 842 steps between positions.",
+                  "You can now use p1-p12 commands.",
+                  "Currently at Home Position (Box 1)",
+                  "New session started - trial counter reset")
+        self.status("SESSION", "NEW")
+        self.status("MAGNET", "ON_MAGNET")
+        self.status("MOUSE", "IDLE")
+        self.status("Position", "Home P1")
+        
+    def _move(self, target):
+        """Simulate handlePositionCommand()."""
+        if not self.is_calibrated:
+            self.emit("ERROR: System not homed! Run 'home' command first.")
+            return
+        if target == self.current_position:
+            self.emit(f"Already at position p{target}")
+        else:
+            self.cycle_armed = True
+            forward = (target - self.current_position) % POSITIONS
+            backward = (self.current_position - target) % POSITIONS
+            go_forward = forward <= backward
+            steps = 842 * (forward if go_forward else backward)
+            self.emit(f"Moving from p{self.current_position} to p{target} "
+                      f"({'forward' if go_forward else 'backward'}, {steps} steps)")
+            self.sleep(0.2 * min(forward, backward))
+            self.current_position = target
+            self.emit(f"Arrived at Box {target} - Sensor detected ✓")
+            self.status("Position", f"P{target}")
+        self.on_magnet = True
+        if self.cycle_armed:
+            self.cycle_armed = False
+            self.emit("Starting door cycle...")
+            self._open_door(auto=True)
+        
+    def _open_door(self, auto):
+        """Open the door and run a simulated mouse visit in the background."""
+        self.door_open = True
+        self.door_auto = auto
+        self.status("DOOR", "OPEN")
+        self.emit("Beam monitoring active - waiting for mouse movement")
+        self.cycle_token += 1
+        threading.Thread(target=self._door_cycle, args=(self.cycle_token,),
+                         daemon=True).start()
+                         
+    def _door_cycle(self, token):
+        """Mouse enters, dwells and returns, then the door closes."""
+        self.sleep(self.random.uniform(0.5, 2.0))
+        if token != self.cycle_token or not self.running:
+            return
+        self.status("MOUSE", "ENTRY")
+        self.sleep(0.3)
+        if token != self.cycle_token or not self.running:
+            return
+        entry_time = self.millis()
+        self.emit("Mouse in subchamber")
+        self.status("MOUSE", "ENTERED")
+        self.sleep(self.random.uniform(*self.dwell_range))
+        if token != self.cycle_token or not self.running:
+            return
+        exit_time = self.millis()
+        self.emit("Mouse returned - closing door")
+        self._close_door(entered=True, entry_time=entry_time, exit_time=exit_time)
+        
+    def _close_door(self, entered, entry_time=0, exit_time=0):
+        """Simulate closeDoor(): DATA packet if the mouse entered."""
+        if entered:
+            self.send_data_packet(self.current_position, entry_time, exit_time,
+                                  "AUTO" if self.door_auto else "MANUAL")
+        self.door_open = False
+        self.status("DOOR", "CLOSED")
+        self.status("MOUSE", "IDLE")
+        
+    def send_data_packet(self, position, entry_time, exit_time, event="AUTO"):
+        """
+        Send one DATA packet like sendDataPacket().
+        
+        Returns:
+            int: Trial number used
+        """
+        self.session_trial += 1
+        dwell = ((exit_time - entry_time) & 0xFFFFFFFF) / 1000.0
+        self.emit(f"DATA,{self.session_trial},{position},{entry_time},"
+                  f"{exit_time},{dwell:.2f},{event}")
+        return self.session_trial
+        
+    def _test_mag(self):
+        """Simulate testSensor(): 10 s of sensor readings every 300 ms."""
+        self.emit("Testing magnetic sensors for 10 seconds...")
+        end = time.monotonic() + 10.0 / self.speed
+        while time.monotonic() < end and self.running:
+            self.emit("Position sensor detected!" if self.on_magnet else "No sensor detected")
+            self.sleep(0.3)
+        self.emit("Test complete.")
+        
+    def _test_beam(self):
+        """Simulate testBeamSensors(): 10 s of analog readings every 100 ms."""
+        self.emit("Testing beam breaker sensors for 10 seconds...",
+                  "Format: S1(mainchamber) | S2(subchamber)")
+        end = time.monotonic() + 10.0 / self.speed
+        while time.monotonic() < end and self.running:
+            s1 = self.random.randint(100, 1000)
+            s2 = self.random.randint(100, 1000)
+            self.emit(f"S1={s1} {'BLOCKED' if s1 > BEAM_THRESHOLD else 'CLEAR'}"
+                      f"  |  S2={s2} {'BLOCKED' if s2 > BEAM_THRESHOLD else 'CLEAR'}")
+            self.sleep(0.1)
+        self.emit("Test complete.")
+        
+    def _print_status(self):
+        """Simulate printStatus() (structured section)."""
+        self.emit("", "=== SYSTEM STATUS ===", f"Version: {FIRMWARE_VERSION}",
+                  "Homing Status: " + ("HOMED ✓" if self.is_calibrated else "NOT HOMED ⚠️"),
+                  "--- System Status ---")
+        self.status("MAGNET", "ON_MAGNET" if self.on_magnet else "UNKNOWN")
+        self.status("MOUSE", "IDLE")
+        self.status("POSITION", str(self.current_position))
+        self.status("HOMED", "TRUE" if self.is_calibrated else "FALSE")
+        self.status("TRIAL", str(self.session_trial))
+        self.emit("------------------------", "")
+        
+    # ============================================
+    # Load generation (benchmarks)
+    # ============================================
+    
+    def inject_trials(self, count, rate=0, burst=1, on_sent=None):
+        """
+        Send DATA packets directly, bypassing the door cycle.
+        
+        Args:
+            count (int): Number of packets
+            rate (float): Average packets per second (0 = as fast as possible)
+            burst (int): Packets per write
+            on_sent: Callback(trial, perf_counter_time) per packet, before the write
+        """
+        interval = burst / rate if rate else 0
+        next_time = time.perf_counter()
+        sent = 0
+        while sent < count and self.running:
+            lines = []
+            now = time.perf_counter()
+            for _ in range(min(burst, count - sent)):
+                self.session_trial += 1
+                entry_time = self.millis()
+                exit_time = entry_time + self.random.randint(500, 8000)
+                position = self.random.randint(1, POSITIONS)
+                lines.append(f"DATA,{self.session_trial},{position},{entry_time},"
+                             f"{exit_time},{(exit_time - entry_time) / 1000:.2f},AUTO")
+                if on_sent:
+                    on_sent(self.session_trial, now)
+                sent += 1
+            self.emit(*lines)
+            if interval:
+                next_time += interval
+                delay = next_time - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+
+def main():
+    """Run a simulated controller until interrupted."""
+    parser = argparse.ArgumentParser(description="Simulated Carousel Controller on a pty")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="time scale for motion and door cycles (default: 1)")
+    parser.add_argument("--seed", type=int, default=None, help="random seed")
+    args = parser.parse_args()
+    
+    simulator = CarouselSimulator(speed=args.speed, seed=args.seed)
+    device = simulator.start()
+    print(f"Simulated Carousel Controller {FIRMWARE_VERSION} on {device}")
+    print("Connect the GUI or another client to that port. Ctrl+C to quit.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulator.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Carousel Controller - Controller Clock Model
+Version: 1.4.0
+
+Maps the controller's millis() values (DATA EntryTime / ExitTime) to PC
+wall-clock time. The firmware prints DATA in closeDoor() right after
+reading ExitTime, so every packet with an exit gives one (millis, receive
+time) pair; the model fits
+
+    wall = origin + offset + rate * (millis - origin_millis) / 1000
+
+over the most recent pairs. rate (controller drift, within MAX_DRIFT) is a
+least-squares fit once the pairs span MIN_FIT_SPAN; offset follows the
+fastest-arriving pair, since transport delay only ever adds time.
+millis() wraps after 2^32 ms (~49.7 days); a backward jump that doesn't
+match a wrap means the controller restarted and the model starts over.
+
+Usage:
+    clock = ClockModel()
+    clock.observe(record.exit_time, received_wall)
+    clock.to_wall(record.entry_time)          # Unix seconds, or None
+"""
+
+from collections import deque
+
+
+MILLIS_WRAP = 2 ** 32
+
+FIT_WINDOW = 32        # Most recent pairs used in the fit
+MIN_FIT_SPAN = 60.0    # Controller seconds covered before drift is estimated
+MAX_DRIFT = 0.02       # Largest accepted |rate - 1| (resonators are ~0.5%)
+WRAP_TOLERANCE = 10.0  # Seconds of disagreement still accepted as a wrap
+
+
+class ClockModel:
+    """
+    Incremental millis() -> wall-clock mapping for one controller.
+    
+    Updated from the serial read thread (one observe() per trial, O(window));
+    to_wall() is O(1).
+    """
+    
+    def __init__(self, window=FIT_WINDOW):
+        """
+        Args:
+            window (int): Number of recent pairs kept for the fit
+        """
+        self.window = window
+        self.reset()
+    
+    def reset(self):
+        """Forget all pairs (controller restarted, millis() starts over)."""
+        self.samples = deque(maxlen=self.window)  # (controller s, wall s) from origin
+        self.origin = None       # (unwrapped millis, wall) of the first pair
+        self.wraps = 0
+        self.last_millis = None
+        self.last_wall = None
+        self.rate = 1.0
+        self.offset = 0.0
+        self.observations = 0
+    
+    def _unwrap(self, millis):
+        """Unwrapped millis, assuming the value is within ~24 days of the latest pair."""
+        value = self.wraps * MILLIS_WRAP + millis
+        if value > self.wraps * MILLIS_WRAP + self.last_millis + MILLIS_WRAP // 2:
+            value -= MILLIS_WRAP  # From before the latest wrap
+        return value
+    
+    def observe(self, millis, wall):
+        """
+        Add one pair: a millis() value and the wall time it was received.
+        
+        Args:
+            millis (int): Controller millis() at (or just before) sending
+            wall (float): time.time() when the line arrived
+        """
+        if self.last_millis is not None and millis < self.last_millis:
+            expected = (MILLIS_WRAP - self.last_millis + millis) / 1000.0
+            elapsed = wall - self.last_wall
+            if (self.last_millis >= MILLIS_WRAP // 2 and
+                    abs(elapsed - expected) <= WRAP_TOLERANCE + MAX_DRIFT * elapsed):
+                self.wraps += 1
+            else:
+                self.reset()
+        
+        unwrapped = self.wraps * MILLIS_WRAP + millis
+        if self.origin is None:
+            self.origin = (unwrapped, wall)
+        self.samples.append(((unwrapped - self.origin[0]) / 1000.0, wall - self.origin[1]))
+        self.last_millis = millis
+        self.last_wall = wall
+        self.observations += 1
+        self._fit()
+    
+    def _fit(self):
+        """Refit rate (if the pairs span enough time) and the offset."""
+        samples = self.samples
+        n = len(samples)
+        if n >= 3 and samples[-1][0] - samples[0][0] >= MIN_FIT_SPAN:
+            mean_x = sum(x for x, _ in samples) / n
+            mean_y = sum(y for _, y in samples) / n
+            sxx = sum((x - mean_x) ** 2 for x, _ in samples)
+            if sxx > 0:
+                rate = sum((x - mean_x) * (y - mean_y) for x, y in samples) / sxx
+                self.rate = min(max(rate, 1.0 - MAX_DRIFT), 1.0 + MAX_DRIFT)
+        # Transport delay is never negative: follow the fastest pair
+        self.offset = min(y - self.rate * x for x, y in samples)
+    
+    def to_wall(self, millis):
+        """
+        Convert a millis() value from the current controller session.
+        
+        Args:
+            millis (int): Controller millis() (0 = not recorded)
+        
+        Returns:
+            float or None: Unix seconds, None if unknown
+        """
+        if self.origin is None or not millis:
+            return None
+        x = (self._unwrap(millis) - self.origin[0]) / 1000.0
+        return self.origin[1] + self.offset + self.rate * x
+    
+    def state(self):
+        """
+        Returns:
+            dict: observations, drift_ppm, wraps
+        """
+        return {
+            'observations': self.observations,
+            'drift_ppm': (self.rate - 1.0) * 1e6,
+            'wraps': self.wraps,
+        }
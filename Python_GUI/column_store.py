@@ -0,0 +1,419 @@
+"""
+Carousel Controller - Columnar Store Module
+Version: 1.4.0
+
+Keeps every trial in a columnar store next to the daily journals so
+analysis across months never has to re-parse workbooks.
+
+Layout (one partition per day, one raw little-endian array per column):
+    data/columns/2025-11-07/trial.bin       int32
+    data/columns/2025-11-07/position.bin    uint8
+    data/columns/2025-11-07/dwell.bin       float64  (seconds)
+    data/columns/2025-11-07/event.bin       uint8    (0 AUTO, 1 MANUAL, 255 other)
+    data/columns/2025-11-07/timestamp.bin   float64  (PC receive time, Unix seconds)
+    data/columns/2025-11-07/entry_ms.bin    uint32   (Arduino millis())
+    data/columns/2025-11-07/exit_ms.bin     uint32
+    data/columns/2025-11-07/entry_wall.bin  float64  (entry on the PC clock, NaN if unknown)
+    data/columns/2025-11-07/exit_wall.bin   float64
+
+Queries skip partitions outside the date range and memory-map only the
+columns they filter on or return.
+
+Usage:
+    python column_store.py import                 # Backfill from Carousel_*.csv / .xlsx
+    python column_store.py query --from 2025-10-01 --position 3 --event AUTO
+"""
+
+import argparse
+import os
+import re
+import sys
+import threading
+from datetime import date, datetime
+from pathlib import Path
+
+from data_logger import read_rows
+
+# Column name -> numpy dtype (fixed width, little-endian)
+SCHEMA = {
+    'trial': '<i4',
+    'position': 'u1',
+    'dwell': '<f8',
+    'event': 'u1',
+    'timestamp': '<f8',
+    'entry_ms': '<u4',
+    'exit_ms': '<u4',
+    'entry_wall': '<f8',
+    'exit_wall': '<f8',
+}
+
+# Columns added after the first release: missing in older partitions and
+# filled with NaN when such a partition is next written or read
+ADDED_COLUMNS = ('entry_wall', 'exit_wall')
+
+EVENT_CODES = {'AUTO': 0, 'MANUAL': 1}
+EVENT_OTHER = 255
+
+_PARTITION_RE = re.compile(r"\d{4}-\d{2}-\d{2}$")
+_JOURNAL_RE = re.compile(r"Carousel_(\d{2})(\d{2})(\d{2})\.(csv|xlsx)$")
+
+
+def _to_date(value):
+    """Accept a date, datetime or 'YYYY-MM-DD' string."""
+    if value is None or isinstance(value, date) and not isinstance(value, datetime):
+        return value
+    if isinstance(value, datetime):
+        return value.date()
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def _parse_time(text, fmt="%Y-%m-%d %H:%M:%S"):
+    """Unix seconds from a journal time string, NaN if empty or malformed."""
+    try:
+        return datetime.strptime(str(text), fmt).timestamp()
+    except ValueError:
+        return float('nan')
+
+
+def event_code(event):
+    """
+    Encode a door event name.
+    
+    Args:
+        event (str): 'AUTO', 'MANUAL' or anything else
+    
+    Returns:
+        int: Stored event code
+    """
+    return EVENT_CODES.get(str(event).strip().upper(), EVENT_OTHER)
+
+
+class ColumnStore:
+    """
+    Day-partitioned columnar trial store.
+    
+    Features:
+    - Appends are one short write per column per batch
+    - Partitions pruned by date range before any file is opened
+    - Only filter and requested columns are memory-mapped
+    - Torn appends (crash between column writes) repaired on next open
+    - Partitions rebuilt from the journals if they fall behind
+    """
+    
+    def __init__(self, root="./data/columns"):
+        """
+        Initialize store.
+        
+        Args:
+            root: Directory holding the day partitions
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self._checked = set()  # Partitions verified for equal column lengths
+    
+    # ============================================
+    # Writing
+    # ============================================
+    
+    def partition_path(self, day):
+        """
+        Get the directory of one day's partition.
+        
+        Args:
+            day: date, datetime or 'YYYY-MM-DD'
+        
+        Returns:
+            Path: Partition directory (may not exist yet)
+        """
+        return self.root / _to_date(day).isoformat()
+    
+    def append(self, records, when=None):
+        """
+        Append trials to the partition of the day they were logged.
+        
+        Args:
+            records (list): TrialRecord objects
+            when (datetime): PC time of the batch (default: now)
+        """
+        if not records:
+            return
+        when = when or datetime.now()
+        stamp = when.timestamp()
+        nan = float('nan')
+        self._write(when.date(), {
+            'trial': [r.trial for r in records],
+            'position': [r.position for r in records],
+            'dwell': [r.dwell_time for r in records],
+            'event': [event_code(r.event) for r in records],
+            'timestamp': [stamp if r.received_wall is None else r.received_wall
+                          for r in records],
+            'entry_ms': [r.entry_time for r in records],
+            'exit_ms': [r.exit_time for r in records],
+            'entry_wall': [nan if r.entry_wall is None else r.entry_wall for r in records],
+            'exit_wall': [nan if r.exit_wall is None else r.exit_wall for r in records],
+        })
+    
+    def _write(self, day, columns, replace=False):
+        """
+        Append (or replace) column values in one partition.
+        
+        Args:
+            day (date): Partition date
+            columns (dict): Column name -> list of values, all the same length
+            replace (bool): Truncate the partition first
+        """
+        import numpy as np  # Deferred: keeps GUI startup light
+        
+        path = self.partition_path(day)
+        with self.lock:
+            path.mkdir(exist_ok=True)
+            if replace:
+                for name in SCHEMA:
+                    (path / f"{name}.bin").unlink(missing_ok=True)
+            elif path not in self._checked:
+                self._repair(path)
+            self._checked.add(path)
+            for name, dtype in SCHEMA.items():
+                values = np.asarray(columns[name]).astype(dtype)
+                with open(path / f"{name}.bin", 'ab') as f:
+                    f.write(values.tobytes())
+    
+    def _repair(self, path):
+        """
+        Truncate every column to the shortest one (torn append after a crash)
+        and add NaN-filled ADDED_COLUMNS missing from an older partition.
+        """
+        import numpy as np
+        
+        rows = self._row_count(path)
+        for name, dtype in SCHEMA.items():
+            column_file = path / f"{name}.bin"
+            size = rows * self._itemsize(dtype)
+            if column_file.exists():
+                if column_file.stat().st_size != size:
+                    os.truncate(column_file, size)
+            elif name in ADDED_COLUMNS and rows:
+                column_file.write_bytes(np.full(rows, np.nan, dtype=dtype).tobytes())
+    
+    def sync_partition(self, day, rows):
+        """
+        Rebuild a partition from journal rows if it holds fewer trials.
+        
+        Args:
+            day: Partition date
+            rows (list): Typed journal rows in data_logger.COLUMNS order
+        
+        Returns:
+            bool: True if the partition was rewritten
+        """
+        day = _to_date(day)
+        if self.row_count(day) >= len(rows):
+            return False
+        columns = {name: [] for name in SCHEMA}
+        for (trial, position, dwell, event, timestamp, entry_time, exit_time,
+             entry_wall, exit_wall) in rows:
+            columns['trial'].append(trial)
+            columns['position'].append(position)
+            columns['dwell'].append(dwell)
+            columns['event'].append(event_code(event))
+            columns['timestamp'].append(_parse_time(timestamp))
+            columns['entry_ms'].append(entry_time)
+            columns['exit_ms'].append(exit_time)
+            columns['entry_wall'].append(_parse_time(entry_wall, "%Y-%m-%d %H:%M:%S.%f"))
+            columns['exit_wall'].append(_parse_time(exit_wall, "%Y-%m-%d %H:%M:%S.%f"))
+        self._write(day, columns, replace=True)
+        return True
+    
+    def import_journals(self, data_folder):
+        """
+        Backfill partitions from Carousel_MMDDYY.csv journals (or legacy
+        workbooks for days without a journal).
+        
+        Args:
+            data_folder: Folder written by DataLogger
+        
+        Returns:
+            int: Number of partitions rewritten
+        """
+        sources = {}
+        for path in Path(data_folder).iterdir():
+            match = _JOURNAL_RE.match(path.name)
+            if not match:
+                continue
+            month, day_of_month, year, kind = match.groups()
+            day = date(2000 + int(year), int(month), int(day_of_month))
+            if kind == 'csv' or day not in sources:
+                sources[day] = path
+        
+        rewritten = 0
+        for day, path in sorted(sources.items()):
+            try:
+                rows = read_rows(path)
+            except Exception as e:
+                print(f"ERROR importing {path.name}: {e}")
+                continue
+            if self.sync_partition(day, rows):
+                rewritten += 1
+        return rewritten
+    
+    # ============================================
+    # Reading
+    # ============================================
+    
+    @staticmethod
+    def _itemsize(dtype):
+        import numpy as np
+        return np.dtype(dtype).itemsize
+    
+    def _row_count(self, path):
+        """Rows present in every column of a partition (ADDED_COLUMNS may be absent)."""
+        counts = []
+        for name, dtype in SCHEMA.items():
+            column_file = path / f"{name}.bin"
+            if column_file.exists():
+                counts.append(column_file.stat().st_size // self._itemsize(dtype))
+            elif name not in ADDED_COLUMNS:
+                counts.append(0)
+        return min(counts) if counts else 0
+    
+    def row_count(self, day):
+        """
+        Get number of trials stored for one day.
+        
+        Returns:
+            int: Row count (0 if the partition doesn't exist)
+        """
+        path = self.partition_path(day)
+        return self._row_count(path) if path.is_dir() else 0
+    
+    def partitions(self, start=None, end=None):
+        """
+        List stored days, optionally within an inclusive date range.
+        
+        Returns:
+            list: Sorted date objects
+        """
+        start, end = _to_date(start), _to_date(end)
+        days = []
+        for entry in os.scandir(self.root):
+            if not entry.is_dir() or not _PARTITION_RE.match(entry.name):
+                continue
+            day = date.fromisoformat(entry.name)
+            if (start is None or day >= start) and (end is None or day <= end):
+                days.append(day)
+        return sorted(days)
+    
+    def _column(self, path, name, rows):
+        """Memory-map the first rows values of one column."""
+        import numpy as np
+        if rows == 0:
+            return np.empty(0, dtype=SCHEMA[name])
+        if name in ADDED_COLUMNS and not (path / f"{name}.bin").exists():
+            return np.full(rows, np.nan, dtype=SCHEMA[name])  # Older partition
+        return np.memmap(path / f"{name}.bin", dtype=SCHEMA[name], mode='r', shape=(rows,))
+    
+    def query(self, start=None, end=None, positions=None, events=None, columns=None):
+        """
+        Select trials by date range, position and door event.
+        
+        Args:
+            start: First day (date or 'YYYY-MM-DD'), inclusive; None = earliest
+            end: Last day, inclusive; None = latest
+            positions: Iterable of positions to keep (None = all)
+            events: Iterable of event names, e.g. ['AUTO'] (None = all)
+            columns: Column names to return (default: all of SCHEMA)
+        
+        Returns:
+            dict: Column name -> numpy array (plus 'date' as datetime64[D])
+        """
+        import numpy as np
+        
+        columns = list(columns or SCHEMA)
+        unknown = set(columns) - set(SCHEMA) - {'date'}
+        if unknown:
+            raise ValueError(f"Unknown column(s): {', '.join(sorted(unknown))}")
+        position_set = np.array(sorted(set(positions)), dtype='u1') if positions is not None else None
+        event_set = (np.array(sorted({event_code(e) for e in events}), dtype='u1')
+                     if events is not None else None)
+        
+        parts = {name: [] for name in columns}
+        for day in self.partitions(start, end):
+            path = self.partition_path(day)
+            rows = self._row_count(path)
+            if rows == 0:
+                continue
+            mask = None
+            if position_set is not None:
+                mask = np.isin(self._column(path, 'position', rows), position_set)
+            if event_set is not None:
+                event_mask = np.isin(self._column(path, 'event', rows), event_set)
+                mask = event_mask if mask is None else mask & event_mask
+            selected = rows if mask is None else int(mask.sum())
+            if selected == 0:
+                continue
+            for name in columns:
+                if name == 'date':
+                    parts[name].append(np.full(selected, np.datetime64(day, 'D')))
+                    continue
+                values = self._column(path, name, rows)
+                parts[name].append(np.array(values if mask is None else values[mask]))
+        
+        return {name: (np.concatenate(chunks) if chunks else
+                       np.empty(0, dtype='datetime64[D]' if name == 'date' else SCHEMA[name]))
+                for name, chunks in parts.items()}
+    
+    def query_frame(self, start=None, end=None, positions=None, events=None, columns=None):
+        """
+        query() as a pandas DataFrame, with event names and datetime timestamps.
+        
+        Returns:
+            pandas.DataFrame: One row per trial
+        """
+        import pandas as pd  # Deferred: only needed for reports
+        
+        result = self.query(start, end, positions, events, columns)
+        df = pd.DataFrame(result)
+        if 'event' in df:
+            names = {code: name for name, code in EVENT_CODES.items()}
+            df['event'] = df['event'].map(lambda code: names.get(code, 'OTHER'))
+        local = datetime.now().astimezone().tzinfo
+        for name in ('timestamp', 'entry_wall', 'exit_wall'):
+            if name in df:
+                df[name] = (pd.to_datetime(df[name], unit='s', utc=True)
+                            .dt.tz_convert(local).dt.tz_localize(None))
+        return df
+
+
+def main(argv=None):
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Carousel columnar trial store")
+    parser.add_argument("--data-folder", default="./data", help="data folder (default: ./data)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("import", help="backfill partitions from the daily journals")
+    query = sub.add_parser("query", help="per-position dwell summary for a selection")
+    query.add_argument("--from", dest="start", help="first day, YYYY-MM-DD")
+    query.add_argument("--to", dest="end", help="last day, YYYY-MM-DD")
+    query.add_argument("--position", type=int, action="append", help="position (repeatable)")
+    query.add_argument("--event", action="append", help="AUTO or MANUAL (repeatable)")
+    args = parser.parse_args(argv)
+    
+    store = ColumnStore(Path(args.data_folder) / "columns")
+    if args.command == "import":
+        count = store.import_journals(args.data_folder)
+        print(f"{count} partition(s) rebuilt, {len(store.partitions())} day(s) stored")
+        return 0
+    
+    import numpy as np
+    result = store.query(args.start, args.end, args.position, args.event,
+                         columns=['position', 'dwell'])
+    print(f"{len(result['dwell'])} trials")
+    for position in np.unique(result['position']):
+        dwell = result['dwell'][result['position'] == position]
+        print(f"  p{position:<3} n={len(dwell):<6} mean={dwell.mean():7.2f}s "
+              f"median={np.median(dwell):7.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,45 +3,714 @@ Carousel Controller - Data Logger Module
 Version: 1.4.0
 
 Handles Excel file operations for dwell time data logging.
-Creates/appends data to date-named Excel files (Carousel_MMDDYY.xlsx).
+Trials go to a pluggable storage backend - by default an append-only
+date-named journal (Carousel_MMDDYY.csv), or SQLite (sqlite_backend.py) -
+and the Excel workbook (Carousel_MMDDYY.xlsx) is materialized from the
+backend on demand.
+
+Crash safety: the journal is the write-ahead log. Appends are fsynced in
+groups (every SYNC_EVERY trials or SYNC_INTERVAL seconds, and on flush),
+workbooks are written to a temporary file and renamed into place, and at
+startup any workbook older than its journal is rebuilt from it.
 """
 
-import pandas as pd
+import csv
 import os
-from datetime import datetime
+import re
+import threading
+import time
+from datetime import date, datetime
 from pathlib import Path
 
+from live_stats import PositionStats
+from protocol import TrialRecord, decode_data
+
+
+# Column layout shared by the journal and the materialized workbook.
+# Timestamp: PC time the DATA packet arrived; EntryTime/ExitTime: controller
+# millis(); EntryDateTime/ExitDateTime: the same instants on the PC clock.
+COLUMNS = ['Trial', 'Position', 'DwellTime(s)', 'Door Event', 'Timestamp',
+           'EntryTime', 'ExitTime', 'EntryDateTime', 'ExitDateTime']
+LEGACY_COLUMN_COUNT = 7  # Files written before the wall-clock columns
+
+# Group commit: fsync the journal after this many trials or seconds
+SYNC_EVERY = 20
+SYNC_INTERVAL = 1.0
+
+_DAY_FILE_RE = re.compile(r"Carousel_(\d{2})(\d{2})(\d{2})\.csv$")
+
+
+class TrialIndex:
+    """
+    Incrementally maintained summary of the day's trials.
+    
+    Seeded once from the journal, then updated per logged trial so
+    count queries never touch the disk.
+    """
+    
+    def __init__(self):
+        """Initialize an empty index."""
+        self.reset()
+    
+    def reset(self):
+        """Clear all counters (date rollover)."""
+        self.count = 0
+        self.last_trial = None
+        self.position_counts = {}
+    
+    def add(self, row):
+        """
+        Record one trial.
+        
+        Args:
+            row (list): Trial row in COLUMNS order
+        """
+        self.count += 1
+        self.last_trial = dict(zip(COLUMNS, row))
+        position = row[1]
+        self.position_counts[position] = self.position_counts.get(position, 0) + 1
+
+
+def read_rows(path):
+    """
+    Read typed trial rows from a journal (.csv) or workbook (.xlsx).
+    
+    Args:
+        path (Path): Carousel_MMDDYY.csv or Carousel_MMDDYY.xlsx
+        
+    Returns:
+        list: Rows in COLUMNS order (malformed rows skipped)
+    """
+    path = Path(path)
+    if path.suffix == '.xlsx':
+        import pandas as pd  # Deferred: only needed for Excel I/O
+        records = (pd.read_excel(path).reindex(columns=COLUMNS)
+                   .fillna('').astype(str).values.tolist())
+    else:
+        with open(path, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            next(reader, None)  # Header
+            records = list(reader)
+    rows = []
+    for values in records:
+        if len(values) == LEGACY_COLUMN_COUNT:
+            values = list(values) + ['', '']
+        elif len(values) != len(COLUMNS):
+            continue
+        try:
+            rows.append(row_from_text(values))
+        except ValueError:
+            continue  # Skip malformed row
+    return rows
+
+
+def row_from_text(values):
+    """
+    Convert journal text fields back to typed values.
+    
+    Args:
+        values (list): Row of strings in COLUMNS order
+        
+    Returns:
+        list: Row with numeric fields converted
+    """
+    (trial, position, dwell_time, event, timestamp, entry_time, exit_time,
+     entry_wall, exit_wall) = values
+    return [int(float(trial)), int(float(position)), float(dwell_time), event,
+            timestamp, int(float(entry_time)), int(float(exit_time)),
+            _blank_if_missing(entry_wall), _blank_if_missing(exit_wall)]
+
+
+def _blank_if_missing(value):
+    """Empty string for cells pandas read back as NaN/None."""
+    return '' if value in ('nan', 'NaN', 'None') else value
+
+
+def format_wall(seconds, fallback=''):
+    """
+    Format a Unix time for the EntryDateTime / ExitDateTime columns.
+    
+    Args:
+        seconds (float): Unix seconds, or None
+        fallback (str): Returned for None
+        
+    Returns:
+        str: Local time as 'YYYY-MM-DD HH:MM:SS.mmm'
+    """
+    if seconds is None:
+        return fallback
+    return datetime.fromtimestamp(seconds).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
+
+def day_stem(day):
+    """
+    File stem for one day's data.
+    
+    Args:
+        day (date): Day
+        
+    Returns:
+        str: e.g. 'Carousel_110725'
+    """
+    return f"Carousel_{day.strftime('%m%d%y')}"
+
+
+def fsync_directory(folder):
+    """
+    Make directory entries in folder durable (new files, renames).
+    
+    No-op where directories can't be opened (Windows).
+    
+    Args:
+        folder (Path): Directory to fsync
+    """
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(folder, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class StorageBackend:
+    """
+    Where DataLogger keeps trial rows.
+    
+    DataLogger serializes all calls except the read queries (count,
+    last_trial, position_counts, exists), which the GUI thread may make
+    while the writer thread appends. Rows are lists in COLUMNS order.
+    """
+    
+    name = "base"
+    
+    def open_day(self, day):
+        """
+        Point the backend at a new day (cheap; no disk scan).
+        
+        Args:
+            day (date): Day that subsequent appends belong to
+        """
+        raise NotImplementedError
+    
+    def scan(self):
+        """Load whatever the current day needs (legacy import, counters)."""
+    
+    def append(self, rows):
+        """
+        Store rows for the current day in one batch.
+        
+        Args:
+            rows (list): Rows in COLUMNS order
+        """
+        raise NotImplementedError
+    
+    def rows(self, day):
+        """
+        Get all rows of one day (Excel export, column store sync).
+        
+        Args:
+            day (date): Day
+            
+        Returns:
+            list: Rows in COLUMNS order
+        """
+        raise NotImplementedError
+    
+    def count(self):
+        """Number of trials logged today."""
+        raise NotImplementedError
+    
+    def last_trial(self):
+        """Most recent trial today as a column -> value dict, or None."""
+        raise NotImplementedError
+    
+    def position_counts(self):
+        """Trials logged today per position."""
+        raise NotImplementedError
+    
+    def exists(self):
+        """True if any data exists for today."""
+        raise NotImplementedError
+    
+    def sync(self):
+        """Make everything appended so far durable (fsync)."""
+    
+    def stale_days(self):
+        """
+        Days whose workbook is missing or older than the stored rows
+        (crash before materialization).
+        
+        Returns:
+            list: date objects
+        """
+        return []
+    
+    def close(self):
+        """Release files / connections."""
+
+
+class JournalBackend(StorageBackend):
+    """
+    Append-only daily CSV journal (Carousel_MMDDYY.csv) plus an in-memory
+    TrialIndex, so count queries never touch the disk.
+    """
+    
+    name = "journal"
+    
+    def __init__(self, data_folder):
+        """
+        Args:
+            data_folder (Path): Folder holding the journals
+        """
+        self.data_folder = Path(data_folder)
+        self.journal_file = None
+        self.excel_file = None
+        self.index = TrialIndex()
+        self._file = None        # Open append handle for journal_file
+        self._new_file = False   # Directory entry not fsynced yet
+    
+    def journal_path(self, day):
+        """Journal file of one day."""
+        return self.data_folder / f"{day_stem(day)}.csv"
+    
+    def open_day(self, day):
+        self.close()
+        self.journal_file = self.journal_path(day)
+        self.excel_file = self.data_folder / f"{day_stem(day)}.xlsx"
+        self.index.reset()
+    
+    def scan(self):
+        """Import a pre-journal workbook, then rebuild the index from the journal."""
+        self._repair_tail()
+        self._upgrade_columns()
+        self._seed_journal()
+        self.index.reset()
+        if not self.journal_file.exists():
+            return
+        try:
+            for row in read_rows(self.journal_file):
+                self.index.add(row)
+        except Exception as e:
+            print(f"ERROR indexing {self.journal_file.name}: {e}")
+    
+    def _repair_tail(self):
+        """Drop a partial last line left by a crash mid-append (never acknowledged)."""
+        if self._file or not self.journal_file.exists():
+            return
+        with open(self.journal_file, 'rb+') as f:
+            size = f.seek(0, os.SEEK_END)
+            if size == 0:
+                return
+            f.seek(max(0, size - 4096))
+            tail = f.read()
+            if tail.endswith(b'\n'):
+                return
+            cut = tail.rfind(b'\n')
+            keep = size - len(tail) + cut + 1 if cut >= 0 else 0
+            f.truncate(keep)
+            print(f"Recovered {self.journal_file.name}: dropped {size - keep} bytes of a torn write")
+    
+    def _upgrade_columns(self):
+        """Rewrite a journal with the legacy header in the current COLUMNS layout."""
+        if self._file or not self.journal_file.exists():
+            return
+        with open(self.journal_file, newline='', encoding='utf-8') as f:
+            header = next(csv.reader(f), None)
+        if header is None or len(header) != LEGACY_COLUMN_COUNT:
+            return
+        rows = read_rows(self.journal_file)
+        tmp_file = self.journal_file.with_name(self.journal_file.name + ".tmp")
+        with open(tmp_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            writer.writerows(rows)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.journal_file)
+        fsync_directory(self.data_folder)
+    
+    def _seed_journal(self):
+        """
+        Import rows from a workbook written before the journal existed.
+        
+        Keeps earlier trials of the day when the workbook is re-materialized.
+        """
+        if self.journal_file.exists() or not self.excel_file.exists():
+            return
+        try:
+            self.append(read_rows(self.excel_file), index=False)
+            self.sync()
+        except Exception as e:
+            print(f"ERROR seeding journal from {self.excel_file.name}: {e}")
+    
+    def append(self, rows, index=True):
+        """
+        Append rows to the current journal, writing the header for a new file.
+        
+        Rows reach the OS immediately; sync() makes them durable.
+        
+        Args:
+            rows (list): Rows in COLUMNS order
+            index (bool): Also count them in the trial index
+        """
+        if self._file is None:
+            self._repair_tail()
+            self._upgrade_columns()
+            self._new_file = not self.journal_file.exists()
+            self._file = open(self.journal_file, 'a', newline='', encoding='utf-8')
+            self._writer = csv.writer(self._file)
+            if self._new_file:
+                self._writer.writerow(COLUMNS)
+        self._writer.writerows(rows)
+        self._file.flush()
+        if index:
+            for row in rows:
+                self.index.add(row)
+    
+    def sync(self):
+        if self._file is None:
+            return
+        os.fsync(self._file.fileno())
+        if self._new_file:
+            fsync_directory(self.data_folder)  # The new file's directory entry too
+        self._new_file = False
+    
+    def stale_days(self):
+        days = []
+        for entry in os.scandir(self.data_folder):
+            match = _DAY_FILE_RE.match(entry.name)
+            if not match:
+                continue
+            workbook = Path(entry.path).with_suffix('.xlsx')
+            try:
+                if workbook.exists() and workbook.stat().st_mtime_ns >= entry.stat().st_mtime_ns:
+                    continue
+                month, day_of_month, year = match.groups()
+                days.append(date(2000 + int(year), int(month), int(day_of_month)))
+            except (OSError, ValueError):
+                continue
+        return sorted(days)
+    
+    def close(self):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+    
+    def rows(self, day):
+        path = self.journal_path(day)
+        return read_rows(path) if path.exists() else []
+    
+    def count(self):
+        return self.index.count
+    
+    def last_trial(self):
+        return self.index.last_trial
+    
+    def position_counts(self):
+        return dict(self.index.position_counts)
+    
+    def exists(self):
+        return self.journal_file.exists() or self.excel_file.exists()
+
+
+def create_backend(name, data_folder):
+    """
+    Build a storage backend by name.
+    
+    Args:
+        name (str): 'journal' (CSV, default) or 'sqlite'
+        data_folder: Data folder
+        
+    Returns:
+        StorageBackend: New backend
+    """
+    if name == "journal":
+        return JournalBackend(data_folder)
+    if name == "sqlite":
+        from sqlite_backend import SqliteBackend  # Deferred: optional backend
+        return SqliteBackend(data_folder)
+    raise ValueError(f"Unknown storage backend: {name}")
+
+
+BACKENDS = ("journal", "sqlite")
+
 
 class DataLogger:
     """
     Manages Excel file operations for carousel dwell time data.
     
     Features:
-    - Auto-creates date-based Excel files (Carousel_MMDDYY.xlsx)
-    - Appends data to existing files on same date
-    - Stores Arduino timestamps and PC timestamps
+    - Pluggable storage backend: append-only daily journal (Carousel_MMDDYY.csv,
+      default) or SQLite (carousel.db)
+    - Materializes date-based Excel files (Carousel_MMDDYY.xlsx) from the backend
+    - Stores Arduino timestamps and PC timestamps (receive time, and
+      entry/exit mapped to the PC clock by SerialHandler's ClockModel)
+    - Count queries answered by the backend (in-memory index / indexed COUNT)
+    - Live per-position dwell statistics, updated per trial (live_stats)
+    - Group commit: fsync every sync_every trials / sync_interval seconds
+    - Atomic workbook writes (temp file + rename) and startup recovery
+    - Optional columnar store (column_store.ColumnStore) fed with every batch
     - Validates and parses DATA packets
     """
     
-    def __init__(self, data_folder="./data"):
+    def __init__(self, data_folder="./data", defer_scan=False, column_store=None,
+                 backend="journal", sync_every=SYNC_EVERY, sync_interval=SYNC_INTERVAL):
         """
         Initialize data logger.
         
         Args:
             data_folder: Path to data storage directory (default: ./data)
+            defer_scan (bool): Skip the initial scan; call scan() or
+                               scan_in_background() later (faster startup)
+            column_store: Optional ColumnStore that also receives every trial
+            backend: StorageBackend instance, or a name from BACKENDS
+            sync_every (int): fsync after this many trials (1 = every batch,
+                              0 = no count trigger)
+            sync_interval (float): fsync trials older than this many seconds
+                                   (None = no time trigger)
         """
         self.data_folder = Path(data_folder)
         self.data_folder.mkdir(exist_ok=True)  # Create if doesn't exist
+        self.backend = (create_backend(backend, self.data_folder)
+                        if isinstance(backend, str) else backend)
         self.current_file = None
+        self.current_day = None
         self.current_date = None
-        self.update_file_path()
+        self.scanned = False
+        self.column_store = column_store
+        self.position_stats = PositionStats()
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.unsynced = 0            # Trials appended since the last fsync
+        self._unsynced_since = None  # time.monotonic() of the oldest of them
+        self.lock = threading.RLock()  # Backend is shared with the writer thread
+        self._export_lock = threading.Lock()  # One workbook write at a time
+        self._workers = []           # Rollover / export threads (joined by close())
+        self._workers_lock = threading.Lock()
+        self.update_file_path(scan=not defer_scan)
+    
+    def update_file_path(self, scan=True):
+        """
+        Update file paths based on current date.
+        
+        At a date rollover yesterday's trials are fsynced here and its
+        workbook is exported on a worker thread, so the caller (normally
+        the writer thread) only waits for the switch itself.
+        
+        Args:
+            scan (bool): Scan the backend for a new date (False only at
+                         deferred startup)
+        """
+        now = datetime.now()
+        today = now.strftime("%m%d%y")
+        if today == self.current_date:
+            return
+        with self.lock:
+            if today == self.current_date:
+                return
+            previous = None
+            if self.current_date is not None:
+                # Date rollover - make yesterday's trials durable before switching
+                self.sync()
+                previous = (self.current_day, self.current_file)
+            self.current_day = now.date()
+            self.current_file = self.data_folder / f"{day_stem(self.current_day)}.xlsx"
+            self.backend.open_day(self.current_day)
+            self.position_stats.reset()
+            if scan:
+                self._scan_backend()
+            self.scanned = scan
+            self.current_date = today  # Published last for lock-free readers
+        if previous:
+            self._start_worker(self._materialize, *previous)
+    
+    def _rollover_pending(self):
+        """
+        Check for a date change without doing any I/O on the caller's thread.
+        
+        Used by the read-only getters: if the date has changed and no trial
+        has rolled the logger over yet, the rollover is started on a worker
+        thread and the getters answer for the new (still empty) day.
+        
+        Returns:
+            bool: True if today's files are not open yet
+        """
+        if datetime.now().strftime("%m%d%y") == self.current_date:
+            return False
+        self._start_worker(self.update_file_path, single=True)
+        return True
+    
+    def _start_worker(self, target, *args, single=False):
+        """
+        Run target(*args) on a daemon thread that close() waits for.
+        
+        Args:
+            single (bool): Don't start it if an earlier worker for the same
+                           target is still running
+        """
+        with self._workers_lock:
+            self._workers = [t for t in self._workers if t.is_alive()]
+            if single and any(t.name == target.__name__ for t in self._workers):
+                return
+            worker = threading.Thread(target=target, args=args, name=target.__name__,
+                                      daemon=True)
+            self._workers.append(worker)
+            worker.start()
+    
+    def _today_file(self):
+        """Workbook path for today's date, whether or not it is open yet."""
+        return self.data_folder / f"{day_stem(date.today())}.xlsx"
+    
+    def scan(self):
+        """Scan the backend for today (deferred startup scan)."""
+        with self.lock:
+            self.update_file_path()
+            self._scan_backend()
+            self.scanned = True
+    
+    def _scan_backend(self):
+        """
+        Load today's state, seed the live statistics and bring the columnar
+        partition up to date (one read of today's rows).
+        """
+        self.backend.scan()
+        try:
+            rows = self.backend.rows(self.current_day)
+        except Exception as e:
+            print(f"ERROR reading today's rows: {e}")
+            return
+        self.position_stats.seed(rows)
+        if self.column_store:
+            try:
+                self.column_store.sync_partition(self.current_day, rows)
+            except Exception as e:
+                print(f"ERROR syncing column store: {e}")
+    
+    def scan_in_background(self, on_done=None, recover=True):
+        """
+        Run scan() (and recover_workbooks()) on a worker thread.
+        
+        Args:
+            on_done: Optional callback(recovered) run on the worker thread when
+                     finished, with the list of rebuilt workbook names
+            recover (bool): Also rebuild stale workbooks
+        """
+        def run():
+            self.scan()
+            recovered = self.recover_workbooks() if recover else []
+            if on_done:
+                on_done(recovered)
+        threading.Thread(target=run, daemon=True).start()
+    
+    def recover_workbooks(self):
+        """
+        Rebuild every workbook that is missing trials from its journal
+        (e.g. after a crash or power cut before the workbook was written).
+        
+        Returns:
+            list: Names of the rebuilt workbooks
+        """
+        recovered = []
+        for day in self.backend.stale_days():
+            excel_file = self.data_folder / f"{day_stem(day)}.xlsx"
+            if self._materialize(day, excel_file):
+                recovered.append(excel_file.name)
+        return recovered
+    
+    # ============================================
+    # Group commit
+    # ============================================
+    
+    def sync(self):
+        """
+        fsync everything appended so far.
+        
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        with self.lock:
+            if not self.unsynced:
+                return True
+            try:
+                self.backend.sync()
+            except Exception as e:
+                print(f"ERROR syncing trials to disk: {e}")
+                return False
+            self.unsynced = 0
+            self._unsynced_since = None
+            return True
+    
+    def sync_delay(self):
+        """
+        Seconds until the time-based fsync is due.
+        
+        Returns:
+            float or None: Delay (0 if overdue), None if nothing is pending
+        """
+        since = self._unsynced_since
+        if since is None or self.sync_interval is None:
+            return None
+        return max(0.0, since + self.sync_interval - time.monotonic())
     
-    def update_file_path(self):
-        """Update file path based on current date."""
-        today = datetime.now().strftime("%m%d%y")
-        if today != self.current_date:
-            self.current_date = today
-            self.current_file = self.data_folder / f"Carousel_{today}.xlsx"
+    def sync_if_due(self):
+        """fsync if the count or time trigger has fired."""
+        delay = self.sync_delay()
+        if (self.sync_every and self.unsynced >= self.sync_every) or delay == 0.0:
+            self.sync()
+    
+    def _materialize(self, day, excel_file):
+        """
+        Rewrite an Excel workbook from the backend, atomically.
+        
+        Must not be called with self.lock held: the lock is taken only to
+        read the rows, so the writer thread keeps appending during the export.
+        The workbook is written and fsynced under a temporary name and then
+        renamed over the old one, so a crash leaves either the old or the
+        new workbook, never a truncated one.
+        
+        Args:
+            day (date): Day to export
+            excel_file (Path): Destination workbook
+            
+        Returns:
+            bool: True if successful (or nothing to write), False otherwise
+        """
+        tmp_file = excel_file.with_name(excel_file.name + ".tmp")
+        with self._export_lock:
+            try:
+                with self.lock:  # Held only to read the rows, not for the export
+                    rows = self.backend.rows(day)
+                if not rows:
+                    return True
+                import pandas as pd  # Deferred: only needed for Excel I/O
+                with open(tmp_file, 'wb') as f:
+                    pd.DataFrame(rows, columns=COLUMNS).to_excel(f, index=False, engine='openpyxl')
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_file, excel_file)
+                fsync_directory(excel_file.parent)  # Make the rename itself durable
+                return True
+            except Exception as e:
+                print(f"ERROR materializing {excel_file.name}: {e}")
+                try:
+                    tmp_file.unlink(missing_ok=True)
+                except OSError:
+                    pass
+                return False
+    
+    def export_to_excel(self):
+        """
+        Materialize today's Excel workbook from the backend.
+        
+        Called on demand and at session end; each trial only touches the backend.
+        
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        self.update_file_path()
+        return self._materialize(self.current_day, self.current_file)
     
     def get_current_filename(self):
         """
@@ -50,7 +719,8 @@ class DataLogger:
         Returns:
             str: Current Excel filename (e.g., 'Carousel_110725.xlsx')
         """
-        self.update_file_path()
+        if self._rollover_pending():
+            return self._today_file().name
         return self.current_file.name
     
     def get_current_filepath(self):
@@ -60,12 +730,13 @@ class DataLogger:
         Returns:
             Path: Full path to current Excel file
         """
-        self.update_file_path()
+        if self._rollover_pending():
+            return self._today_file()
         return self.current_file
     
     def log_data(self, trial, position, entry_time, exit_time, dwell_time, event):
         """
-        Log trial data to Excel file.
+        Log trial data to today's backend.
         
         Args:
             trial (int): Trial number
@@ -78,36 +749,55 @@ class DataLogger:
         Returns:
             bool: True if successful, False otherwise
         """
-        try:
-            self.update_file_path()
-            
-            # Create data dictionary
-            data = {
-                'Trial': [trial],
-                'Position': [position],
-                'DwellTime(s)': [dwell_time],
-                'Door Event': [event],
-                'Timestamp': [datetime.now().strftime("%Y-%m-%d %H:%M:%S")],                
-                'EntryTime': [entry_time],
-                'ExitTime': [exit_time]
-            }
-            
-            df = pd.DataFrame(data)
+        return self.log_batch([TrialRecord(trial, position, entry_time, exit_time,
+                                           dwell_time, event)])
+    
+    def log_batch(self, records):
+        """
+        Log several trials to today's backend in a single write (group commit).
+        
+        Args:
+            records (list): TrialRecord objects
             
-            # Append to existing file or create new
-            if self.current_file.exists():
-                # Append mode
-                existing_df = pd.read_excel(self.current_file)
-                combined_df = pd.concat([existing_df, df], ignore_index=True)
-                combined_df.to_excel(self.current_file, index=False)
-            else:
-                # Create new file
-                df.to_excel(self.current_file, index=False)
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        try:
+            with self.lock:
+                self.update_file_path()
+                if not self.scanned:
+                    self.scan()  # Never append before legacy rows are imported
+                now = datetime.now()
+                timestamp = now.strftime("%Y-%m-%d %H:%M:%S")
+                
+                # Rows in COLUMNS order; Timestamp is when the packet arrived
+                rows = [[r.trial, r.position, r.dwell_time, r.event,
+                         timestamp if r.received_wall is None else
+                         format_wall(r.received_wall)[:19],
+                         r.entry_time, r.exit_time,
+                         format_wall(r.entry_wall), format_wall(r.exit_wall)]
+                        for r in records]
+                
+                # One short write / transaction per batch; fsync per group
+                self.backend.append(rows)
+                if self._unsynced_since is None:
+                    self._unsynced_since = time.monotonic()
+                self.unsynced += len(rows)
+                self.sync_if_due()
+                for r in records:
+                    self.position_stats.add(r.position, r.dwell_time)
+                
+                if self.column_store:
+                    # Secondary copy: rebuilt from the journal on next scan if this fails
+                    try:
+                        self.column_store.append(records, now)
+                    except Exception as e:
+                        print(f"ERROR appending to column store: {e}")
             
             return True
             
         except Exception as e:
-            print(f"ERROR in log_data: {e}")
+            print(f"ERROR in log_batch: {e}")
             return False
     
     def parse_data_packet(self, line):
@@ -123,25 +813,11 @@ class DataLogger:
         Returns:
             bool: True if successfully logged, False otherwise
         """
-        try:
-            parts = line.split(',')
-            if len(parts) == 7 and parts[0] == "DATA":
-                trial = int(parts[1])
-                position = int(parts[2])
-                entry_time = int(parts[3])
-                exit_time = int(parts[4])
-                dwell_time = float(parts[5])
-                event = parts[6].strip()
-                
-                return self.log_data(trial, position, entry_time, exit_time, 
-                                   dwell_time, event)
-            else:
-                print(f"Invalid DATA packet format: {line}")
-                return False
-                
-        except Exception as e:
-            print(f"ERROR parsing DATA packet: {e}")
+        record = decode_data(line)
+        if record is None:
+            print(f"Invalid DATA packet format: {line}")
             return False
+        return self.log_batch([record])
     
     def get_data_folder_path(self):
         """
@@ -154,26 +830,65 @@ class DataLogger:
     
     def file_exists(self):
         """
-        Check if current date's file exists.
+        Check if current date's data exists.
         
         Returns:
-            bool: True if file exists, False otherwise
+            bool: True if the backend holds data for today, False otherwise
         """
-        self.update_file_path()
-        return self.current_file.exists()
+        if self._rollover_pending():
+            return False  # Nothing logged today yet (a trial would have rolled over)
+        return self.backend.exists()
     
     def get_trial_count(self):
         """
-        Get number of trials in current file.
+        Get number of trials logged today (index / indexed query, no file scan).
         
         Returns:
-            int: Number of trials, or 0 if file doesn't exist
+            int: Number of trials, or 0 if none logged yet
         """
-        self.update_file_path()
-        if self.current_file.exists():
-            try:
-                df = pd.read_excel(self.current_file)
-                return len(df)
-            except:
-                return 0
-        return 0
+        if self._rollover_pending():
+            return 0
+        return self.backend.count()
+    
+    def get_last_trial(self):
+        """
+        Get the most recent trial logged today.
+        
+        Returns:
+            dict or None: Column name -> value, or None if no trials yet
+        """
+        if self._rollover_pending():
+            return None
+        return self.backend.last_trial()
+    
+    def get_position_counts(self):
+        """
+        Get number of trials logged today per position.
+        
+        Returns:
+            dict: Position number -> trial count
+        """
+        if self._rollover_pending():
+            return {}
+        return self.backend.position_counts()
+    
+    def get_position_stats(self):
+        """
+        Get today's dwell time statistics per position (no disk access).
+        
+        Returns:
+            dict: Position -> {count, mean, std, min, median, p90, max}
+        """
+        if self._rollover_pending():
+            return {}
+        return self.position_stats.snapshot()
+    
+    def close(self):
+        """Finish rollover/export workers, fsync pending trials and close the storage backend."""
+        with self._workers_lock:
+            workers = list(self._workers)
+        for worker in workers:
+            worker.join()
+        with self.lock:
+            self.sync()
+            self.backend.close()
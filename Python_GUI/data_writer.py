@@ -0,0 +1,165 @@
+"""
+Carousel Controller - Data Writer Module
+Version: 1.4.0
+
+Persists trial records on a dedicated background thread.
+Keeps serial ingestion independent of disk speed: the read thread only
+enqueues, the writer group-commits several trials per journal write and
+lets DataLogger fsync them in groups (by count, by age while idle, and
+on flush).
+"""
+
+import queue
+import threading
+import time
+
+
+class DataWriter:
+    """
+    Background writer feeding DataLogger from a bounded queue.
+    
+    Features:
+    - Bounded queue between the serial read thread and the disk
+    - Group commit: all queued trials (up to batch_size) in one write
+    - Blocking flush for shutdown / disconnect (trials fsynced on return)
+    - Time-based fsync while idle (DataLogger.sync_interval)
+    - Asynchronous success/failure reporting via callback
+    - Persisted-stage latency and queue depth (PipelineMetrics)
+    """
+    
+    def __init__(self, data_logger, on_result=None, max_queue=1000, batch_size=50,
+                 submit_timeout=1.0, pipeline_metrics=None):
+        """
+        Initialize data writer.
+        
+        Args:
+            data_logger: DataLogger receiving the trial records
+            on_result: Callback(success, count, message) run on the writer thread
+            max_queue (int): Maximum number of pending trials
+            batch_size (int): Maximum trials committed per write
+            submit_timeout (float): Seconds submit() waits when the queue is full
+            pipeline_metrics: Optional PipelineMetrics receiving persisted latencies
+        """
+        self.data_logger = data_logger
+        self.on_result = on_result
+        self.batch_size = batch_size
+        self.submit_timeout = submit_timeout
+        self.pipeline_metrics = pipeline_metrics
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.thread = None
+        self._stop_marker = object()
+        
+    def start(self):
+        """Start the background writer thread."""
+        if self.thread and self.thread.is_alive():
+            return
+        self.thread = threading.Thread(target=self._write_loop, daemon=True)
+        self.thread.start()
+        
+    def submit(self, record):
+        """
+        Queue a trial for persistence (called from the read thread).
+        
+        Args:
+            record (TrialRecord): Decoded DATA packet
+            
+        Returns:
+            bool: True if queued, False if the queue stayed full
+        """
+        try:
+            self.queue.put(record, timeout=self.submit_timeout)
+            return True
+        except queue.Full:
+            self._report(False, 1, f"Write queue full, trial dropped: {record}")
+            return False
+            
+    def flush(self, timeout=5.0):
+        """
+        Block until everything queued so far is on disk (fsynced).
+        
+        Args:
+            timeout (float): Maximum seconds to wait
+            
+        Returns:
+            bool: True if flushed, False on timeout or if the writer isn't running
+        """
+        if not (self.thread and self.thread.is_alive()):
+            return False
+        done = threading.Event()
+        try:
+            self.queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+        
+    def stop(self, timeout=5.0):
+        """
+        Flush pending trials and stop the writer thread.
+        
+        Args:
+            timeout (float): Maximum seconds to wait
+        """
+        if not (self.thread and self.thread.is_alive()):
+            return
+        try:
+            self.queue.put(self._stop_marker, timeout=timeout)
+        except queue.Full:
+            return
+        self.thread.join(timeout)
+        
+    def _write_loop(self):
+        """Background loop: take a batch off the queue and commit it."""
+        running = True
+        while running:
+            try:
+                # Wake up when the oldest unsynced trial is due for fsync
+                items = [self.queue.get(timeout=self.data_logger.sync_delay())]
+            except queue.Empty:
+                self.data_logger.sync_if_due()
+                continue
+            while len(items) < self.batch_size:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+                    
+            records = []
+            waiters = []
+            for item in items:
+                if item is self._stop_marker:
+                    running = False
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    records.append(item)
+                        
+            if records:
+                success = self.data_logger.log_batch(records)
+                if self.pipeline_metrics:
+                    self._record_metrics(records, success)
+                self._report(success, len(records), None)
+                
+            if waiters or not running:
+                self.data_logger.sync()
+            for waiter in waiters:
+                waiter.set()
+                
+    def _record_metrics(self, records, success):
+        """Record the persisted stage for a committed batch and the queue depth left."""
+        metrics = self.pipeline_metrics
+        now = time.perf_counter()
+        if success:
+            for record in records:
+                if record.received is not None:
+                    metrics.record("persisted", record.received, now)
+        else:
+            metrics.count("write_errors", len(records))
+        metrics.gauge("write_queue", self.queue.qsize())
+        
+    def _report(self, success, count, message):
+        """Forward a commit result to the callback, if any."""
+        if self.on_result:
+            try:
+                self.on_result(success, count, message)
+            except Exception as e:
+                print(f"ERROR in data writer callback: {e}")
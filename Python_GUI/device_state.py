@@ -0,0 +1,187 @@
+"""
+Carousel Controller - Device State Model
+Version: 1.4.0
+
+One observable record of what is known about the controller and the
+session: link state, magnet, mouse, door, position, homing, trial
+counters and the current data file. SerialHandler updates it from decoded
+packets and link changes; the GUI and the data logger add the storage
+fields. Subscribers are told only about values that actually changed.
+
+Fields (None = not reported yet):
+    connection       DISCONNECTED, CONNECTING, CONNECTED or RECONNECTING
+    port, firmware   Port name / firmware version of the current link
+    magnet, mouse    STATUS values (ON_MAGNET / UNKNOWN, IDLE / ENTRY / ...)
+    door             OPEN or CLOSED
+    position         Position number (STATUS 5, P5 and Home P1 all -> int)
+    homed            True / False
+    session_trial    Controller's trial counter (STATUS:TRIAL, DATA)
+    last_dwell       Dwell time of the last DATA packet (seconds)
+    trials_received  DATA packets received since the program started
+    errors           ERROR lines received since the program started
+    trials_today     Trials in today's data file
+    data_file        Today's data file name
+
+Usage:
+    state = handler.device_state
+    state.subscribe(lambda changes: print(changes), fields=("magnet", "mouse"))
+    state.get("position")
+    state.snapshot()
+"""
+
+import re
+import threading
+
+
+CONNECTION_STATES = ("DISCONNECTED", "CONNECTING", "CONNECTED", "RECONNECTING")
+
+DEFAULTS = {
+    'connection': "DISCONNECTED",
+    'port': None,
+    'firmware': None,
+    'magnet': None,
+    'mouse': None,
+    'door': None,
+    'position': None,
+    'homed': None,
+    'session_trial': None,
+    'last_dwell': None,
+    'trials_received': 0,
+    'errors': 0,
+    'trials_today': None,
+    'data_file': None,
+}
+
+_NUMBER_RE = re.compile(r"\d+")
+
+
+class DeviceState:
+    """
+    Thread-safe observable device/session state.
+    
+    Updates may come from any thread. Subscribers are called with a dict of
+    the changed fields and their new values, in update order, while the
+    state lock is held: they must not block (queue the change and apply it
+    later, as the GUI does once per frame).
+    """
+    
+    def __init__(self):
+        """Start with DEFAULTS and no subscribers."""
+        self._values = dict(DEFAULTS)
+        self._lock = threading.RLock()
+        self._subscribers = []  # (callback, fields or None); copied on change
+        self.version = 0        # Incremented on every change
+    
+    # ============================================
+    # Reading
+    # ============================================
+    
+    def get(self, field, default=None):
+        """
+        Args:
+            field (str): Field name (see module docstring)
+            default: Returned for unknown fields
+        
+        Returns:
+            Current value
+        """
+        return self._values.get(field, default)
+    
+    def snapshot(self):
+        """
+        Returns:
+            dict: Copy of all fields
+        """
+        with self._lock:
+            return dict(self._values)
+    
+    def subscribe(self, callback, fields=None):
+        """
+        Call callback(changes) whenever any of fields changes.
+        
+        Args:
+            callback: Callable taking a {field: new value} dict
+            fields: Field names of interest (default: all)
+        
+        Returns:
+            The callback (for unsubscribe)
+        """
+        entry = (callback, frozenset(fields) if fields else None)
+        with self._lock:
+            self._subscribers = self._subscribers + [entry]
+        return callback
+    
+    def unsubscribe(self, callback):
+        """Stop calling a subscribed callback."""
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s[0] is not callback]
+    
+    # ============================================
+    # Updating
+    # ============================================
+    
+    def update(self, **values):
+        """
+        Set fields; subscribers hear about the ones whose value changed.
+        
+        Returns:
+            dict: Changed fields and their new values
+        """
+        with self._lock:
+            current = self._values
+            changes = {field: value for field, value in values.items()
+                       if field not in current or current[field] != value}
+            if changes:
+                current.update(changes)
+                self.version += 1
+                self._notify(changes)
+            return changes
+    
+    def increment(self, field, n=1):
+        """Add n to a counter field and notify."""
+        with self._lock:
+            return self.update(**{field: self._values.get(field, 0) + n})
+    
+    def _notify(self, changes):
+        for callback, fields in self._subscribers:
+            if fields is None:
+                callback(changes)
+            else:
+                relevant = {field: value for field, value in changes.items() if field in fields}
+                if relevant:
+                    callback(relevant)
+    
+    def apply_status(self, update):
+        """
+        Apply a decoded STATUS:FIELD:VALUE update.
+        
+        Args:
+            update (StatusUpdate): Decoded status update
+        """
+        field, value = update.field, update.value.strip()
+        if field == "POSITION":
+            match = _NUMBER_RE.search(value)  # '5', 'P5' or 'Home P1'
+            if match:
+                self.update(position=int(match.group()))
+        elif field == "HOMED":
+            self.update(homed=value == "TRUE")
+        elif field == "TRIAL":
+            if value.isdigit():
+                self.update(session_trial=int(value))
+        elif field == "SESSION":
+            if value == "NEW":  # Sent by 'home': calibrated, trial counter reset
+                self.update(homed=True, session_trial=0)
+        else:
+            self.update(**{field.lower(): value})  # MAGNET, MOUSE, DOOR, future fields
+    
+    def apply_trial(self, record):
+        """
+        Apply a decoded DATA packet.
+        
+        Args:
+            record (TrialRecord): Decoded trial
+        """
+        with self._lock:
+            self.update(session_trial=record.trial, position=record.position,
+                        last_dwell=record.dwell_time,
+                        trials_received=self._values['trials_received'] + 1)
@@ -0,0 +1,428 @@
+"""
+Carousel Controller - Experiment Protocol Module
+Version: 1.4.0
+
+Runs a schedule of positions without human clicks: send pN, wait for the
+controller to report the position (STATUS:Position:PN), wait for the door
+cycle's DATA packet, hold the inter-trial interval, then send the next
+command. Timing runs on time.monotonic() in a worker thread, independent
+of the Tk event loop, and every step is timestamped so inter-trial timing
+can be measured afterwards.
+
+Usage:
+    schedule = Schedule.randomized_blocks(range(1, 13), blocks=3, iti=10)
+    runner = ExperimentRunner(serial_handler, schedule, on_message=print)
+    runner.start()
+"""
+
+import random
+import re
+import threading
+import time
+
+from serial_handler import SerialListener
+
+
+# Seconds to wait for STATUS:Position after pN (moves take a few seconds)
+ACK_TIMEOUT = 30.0
+# Seconds to wait for the mouse before closing the door and moving on
+TRIAL_TIMEOUT = 600.0
+
+# Seconds to wait for "Starting door cycle..." after "Already at position"
+CYCLE_START_WAIT = 0.5
+
+_POSITION_RE = re.compile(r"(\d+)\s*$")
+
+
+def parse_positions(text):
+    """
+    Parse a position list such as '1,5,9-12'.
+    
+    Args:
+        text (str): Comma-separated positions and inclusive ranges
+    
+    Returns:
+        list: Position numbers (1-12)
+    
+    Raises:
+        ValueError: If an entry is malformed or out of range
+    """
+    positions = []
+    for part in text.replace(' ', '').split(','):
+        if not part:
+            continue
+        if '-' in part:
+            first, last = (int(p) for p in part.split('-', 1))
+            positions.extend(range(first, last + 1) if first <= last else range(first, last - 1, -1))
+        else:
+            positions.append(int(part))
+    if not positions:
+        raise ValueError("No positions given")
+    for position in positions:
+        if not 1 <= position <= 12:
+            raise ValueError(f"Position must be 1-12 (got {position})")
+    return positions
+
+
+class Schedule:
+    """
+    Ordered list of positions plus the inter-trial interval.
+    
+    The interval is measured from the DATA packet of one trial to the
+    command of the next.
+    """
+    
+    def __init__(self, positions, iti=0.0):
+        """
+        Args:
+            positions: Position numbers (1-12), one trial each
+            iti (float): Inter-trial interval in seconds
+        """
+        self.positions = list(positions)
+        self.iti = iti
+    
+    @classmethod
+    def fixed(cls, positions, repeats=1, iti=0.0):
+        """
+        Same list of positions, repeated.
+        
+        Args:
+            positions: Position numbers in order
+            repeats (int): Times to run the list
+            iti (float): Inter-trial interval in seconds
+        """
+        return cls(list(positions) * repeats, iti)
+    
+    @classmethod
+    def randomized_blocks(cls, positions, blocks=1, iti=0.0, seed=None):
+        """
+        Each block visits every position once, in a fresh random order.
+        
+        A block never starts with the position the previous block ended on,
+        so no position is visited twice in a row.
+        
+        Args:
+            positions: Position numbers making up one block
+            blocks (int): Number of blocks
+            iti (float): Inter-trial interval in seconds
+            seed: Optional random seed (reproducible schedules)
+        """
+        rng = random.Random(seed)
+        block = list(positions)
+        order = []
+        for _ in range(blocks):
+            rng.shuffle(block)
+            if order and len(block) > 1 and block[0] == order[-1]:
+                swap = rng.randrange(1, len(block))
+                block[0], block[swap] = block[swap], block[0]
+            order.extend(block)
+        return cls(order, iti)
+    
+    def __len__(self):
+        return len(self.positions)
+    
+    def __iter__(self):
+        return iter(self.positions)
+    
+    def __repr__(self):
+        return f"Schedule({len(self.positions)} trials, iti={self.iti:g}s)"
+
+
+class TrialResult:
+    """Timing of one scheduled trial (time.monotonic() seconds)."""
+    
+    __slots__ = ('index', 'position', 'command', 'sent_at', 'ack_at', 'data_at',
+                 'record', 'outcome', 'iti')
+    
+    def __init__(self, index, position, command):
+        """
+        Args:
+            index (int): Zero-based step in the schedule
+            position (int): Target position
+            command (str): Command sent ('pN', or 'open' when already there)
+        """
+        self.index = index
+        self.position = position
+        self.command = command
+        self.sent_at = None
+        self.ack_at = None
+        self.data_at = None
+        self.record = None      # TrialRecord from the DATA packet
+        self.outcome = None     # OK, NO_ENTRY, ERROR or STOPPED
+        self.iti = None         # Actual gap since the previous trial's DATA
+    
+    @property
+    def ack_latency(self):
+        """Seconds from command to position report (None if not moved)."""
+        if self.sent_at is None or self.ack_at is None:
+            return None
+        return self.ack_at - self.sent_at
+    
+    def __repr__(self):
+        return (f"TrialResult(index={self.index}, position={self.position}, "
+                f"outcome={self.outcome!r})")
+
+
+class ExperimentRunner(SerialListener):
+    """
+    Executes a Schedule against a connected SerialHandler.
+    
+    Features:
+    - Worker thread with its own monotonic-clock scheduler
+    - Next command only after the matching position report and DATA packet
+      (DATA from any other position is logged and counted, not used)
+    - Door closed and run continued when no mouse enters in time
+    - Run aborted on controller ERROR lines or a lost connection
+    - Per-trial timestamps (command, acknowledgement, DATA, actual ITI)
+    """
+    
+    def __init__(self, serial_handler, schedule, on_message=None, on_progress=None,
+                 on_finished=None, ack_timeout=ACK_TIMEOUT, trial_timeout=TRIAL_TIMEOUT):
+        """
+        Initialize runner.
+        
+        Args:
+            serial_handler: Connected SerialHandler
+            schedule (Schedule): Positions and inter-trial interval
+            on_message: Optional callback(message, message_type) for log lines
+            on_progress: Optional callback(done, total, result) after each trial
+            on_finished: Optional callback(results, reason) when the run ends
+            ack_timeout (float): Seconds to wait for the position report
+            trial_timeout (float): Seconds to wait for the DATA packet
+        """
+        self.serial_handler = serial_handler
+        self.schedule = schedule
+        self.on_message = on_message
+        self.on_progress = on_progress
+        self.on_finished = on_finished
+        self.ack_timeout = ack_timeout
+        self.trial_timeout = trial_timeout
+        self.results = []
+        self.running = False
+        self.thread = None
+        self.position = None  # Last position reported by the controller
+        self._stop = threading.Event()
+        self._cond = threading.Condition()
+        self._ack = None      # (position, monotonic time)
+        self._data = None     # (TrialRecord, monotonic time)
+        self._target = None   # Position the current step waits for DATA from
+        self.mismatched = 0   # DATA packets from other positions (stray/manual cycles)
+        self._error = None
+        self._already = False # Ack was "Already at position pN" (no move)
+        self._cycle = False   # "Starting door cycle..." seen
+    
+    # ============================================
+    # Control
+    # ============================================
+    
+    def start(self):
+        """Start the run on a worker thread."""
+        if self.running:
+            return
+        self.running = True
+        self._stop.clear()
+        self.results = []
+        self.mismatched = 0
+        self.serial_handler.add_listener(self)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        """Abort the run after the current wait (the door is left as is)."""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+    
+    def wait(self, timeout=None):
+        """
+        Block until the run ends.
+        
+        Returns:
+            bool: True if the run has ended
+        """
+        if self.thread:
+            self.thread.join(timeout)
+        return not self.running
+    
+    def summary(self):
+        """
+        Timing summary of the completed trials.
+        
+        Returns:
+            dict: trials, completed, no_entry, mismatched DATA packets,
+                  mean/max ack latency and mean/max actual ITI (seconds,
+                  None if unavailable)
+        """
+        acks = [r.ack_latency for r in self.results if r.ack_latency is not None]
+        itis = [r.iti for r in self.results if r.iti is not None]
+        return {
+            'trials': len(self.results),
+            'completed': sum(1 for r in self.results if r.outcome == "OK"),
+            'no_entry': sum(1 for r in self.results if r.outcome == "NO_ENTRY"),
+            'mismatched': self.mismatched,
+            'mean_ack_s': sum(acks) / len(acks) if acks else None,
+            'max_ack_s': max(acks) if acks else None,
+            'mean_iti_s': sum(itis) / len(itis) if itis else None,
+            'max_iti_s': max(itis) if itis else None,
+        }
+    
+    # ============================================
+    # SerialListener callbacks (read thread)
+    # ============================================
+    
+    def handle_status_update(self, update):
+        if update.field != "POSITION":
+            return
+        match = _POSITION_RE.search(update.value)  # 'P5' or 'Home P1'
+        if match:
+            with self._cond:
+                self._ack = (int(match.group(1)), time.monotonic())
+                self._cond.notify_all()
+    
+    def handle_trial(self, record):
+        with self._cond:
+            target = self._target
+            if target is not None and record.position != target:
+                self.mismatched += 1
+            else:
+                self._data = (record, time.monotonic())
+                self._cond.notify_all()
+                return
+        # Not the scheduled trial's cycle: don't let it complete the step
+        self._message(f"Ignored DATA from p{record.position} (trial {record.trial}) "
+                      f"while waiting for p{target}", "WARNING")
+    
+    def log_message(self, message, message_type="INFO"):
+        if message_type == "ERROR" and message.startswith("ERROR:"):
+            with self._cond:
+                self._error = message
+                self._cond.notify_all()
+        elif message.startswith("Already at position p"):
+            match = _POSITION_RE.search(message)
+            if match:
+                with self._cond:
+                    self._ack = (int(match.group(1)), time.monotonic())
+                    self._already = True
+                    self._cond.notify_all()
+        elif message.startswith("Starting door cycle"):
+            with self._cond:
+                self._cycle = True
+                self._cond.notify_all()
+    
+    def handle_connection_state(self, state):
+        if state == "DISCONNECTED":
+            with self._cond:
+                self._error = "Connection lost"
+                self._cond.notify_all()
+    
+    # ============================================
+    # Worker
+    # ============================================
+    
+    def _message(self, text, message_type="INFO"):
+        if self.on_message:
+            self.on_message(text, message_type)
+    
+    def _wait_for(self, predicate, timeout):
+        """
+        Wait until predicate() holds, an error arrives, or stop()/timeout.
+        
+        Returns:
+            bool: True if predicate() became true
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not predicate():
+                if self._error or self._stop.is_set():
+                    return False
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+    
+    def _run(self):
+        """Execute the schedule step by step."""
+        total = len(self.schedule)
+        reason = "completed"
+        last_data_at = None
+        self._message(f"Protocol started: {total} trials, ITI {self.schedule.iti:g}s", "STATUS")
+        try:
+            for index, position in enumerate(self.schedule):
+                # Inter-trial interval, measured from the previous DATA packet
+                if last_data_at is not None:
+                    delay = last_data_at + self.schedule.iti - time.monotonic()
+                    if delay > 0 and self._stop.wait(delay):
+                        reason = "stopped"
+                        break
+                if self._stop.is_set():
+                    reason = "stopped"
+                    break
+                
+                # The firmware only arms a door cycle after a move, so a repeat
+                # of the current position opens the door directly
+                command = "open" if position == self.position else f"p{position}"
+                result = TrialResult(index, position, command)
+                self.results.append(result)
+                with self._cond:
+                    self._ack = self._data = self._error = None
+                    self._already = self._cycle = False
+                    self._target = position
+                result.sent_at = time.monotonic()
+                if last_data_at is not None:
+                    result.iti = result.sent_at - last_data_at
+                self.serial_handler.send_command(command)
+                
+                if command != "open":
+                    if not self._wait_for(lambda: self._ack and self._ack[0] == position,
+                                          self.ack_timeout):
+                        reason = self._abort_reason(f"no position report for p{position}")
+                        result.outcome = "STOPPED" if reason == "stopped" else "ERROR"
+                        break
+                    result.ack_at = self._ack[1]
+                    self.position = position
+                    # Already there: the firmware only starts a cycle if one
+                    # was armed by an earlier move, otherwise open the door
+                    if self._already and not self._wait_for(lambda: self._cycle, CYCLE_START_WAIT):
+                        if self._error or self._stop.is_set():
+                            reason = self._abort_reason("")
+                            result.outcome = "STOPPED" if reason == "stopped" else "ERROR"
+                            break
+                        self.serial_handler.send_command("open")
+                
+                if self._wait_for(lambda: self._data is not None, self.trial_timeout):
+                    result.record, result.data_at = self._data
+                    result.outcome = "OK"
+                    last_data_at = result.data_at
+                elif self._error or self._stop.is_set():
+                    reason = self._abort_reason("")
+                    result.outcome = "STOPPED" if reason == "stopped" else "ERROR"
+                    break
+                else:
+                    # No mouse: close the door and carry on
+                    result.outcome = "NO_ENTRY"
+                    self._message(f"Trial {index + 1}: no entry at p{position} within "
+                                  f"{self.trial_timeout:g}s, closing door", "WARNING")
+                    self.serial_handler.send_command("close")
+                    last_data_at = time.monotonic()
+                
+                if self.on_progress:
+                    self.on_progress(index + 1, total, result)
+        finally:
+            self.serial_handler.remove_listener(self)
+            with self._cond:
+                self._target = None
+            self.running = False
+            done = sum(1 for r in self.results if r.outcome in ("OK", "NO_ENTRY"))
+            message_type = "ERROR" if reason not in ("completed", "stopped") else "STATUS"
+            self._message(f"Protocol {reason}: {done}/{total} trials", message_type)
+            if self.on_finished:
+                self.on_finished(self.results, reason)
+    
+    def _abort_reason(self, timeout_reason):
+        """Describe why a wait ended without its response."""
+        if self._stop.is_set():
+            return "stopped"
+        if self._error:
+            return f"aborted ({self._error})"
+        return f"aborted ({timeout_reason})" if timeout_reason else "aborted"
@@ -0,0 +1,198 @@
+"""
+Carousel Controller - Live Statistics Module
+Version: 1.4.0
+
+Constant-memory, O(1)-per-trial dwell time statistics for each position:
+Welford running mean/variance, min/max, and P-square streaming quantile
+estimates (Jain & Chlamtac, 1985) for the median and 90th percentile.
+Seeded once from the day's rows, then updated per logged trial.
+"""
+
+import math
+import threading
+
+
+class P2Quantile:
+    """
+    Streaming estimate of one quantile with five markers (P-square).
+    
+    Exact for the first five observations, then an estimate that needs no
+    stored samples.
+    """
+    
+    __slots__ = ('p', 'count', 'heights', 'positions', 'desired', 'increments')
+    
+    def __init__(self, p):
+        """
+        Args:
+            p (float): Quantile to track (0-1), e.g. 0.5 for the median
+        """
+        self.p = p
+        self.count = 0
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+    
+    def add(self, x):
+        """Add one observation."""
+        self.count += 1
+        q = self.heights
+        if self.count <= 5:
+            q.append(x)
+            q.sort()
+            return
+        
+        # Cell containing x, extending the extremes if needed
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+        
+        n = self.positions
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+        
+        # Nudge the three middle markers toward their desired positions
+        for i in (1, 2, 3):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                candidate = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+                    (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+                if not q[i - 1] < candidate < q[i + 1]:
+                    candidate = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = candidate
+                n[i] += d
+    
+    def value(self):
+        """
+        Current estimate.
+        
+        Returns:
+            float or None: Quantile estimate, None before the first observation
+        """
+        if self.count == 0:
+            return None
+        if self.count <= 5:
+            return self.heights[min(len(self.heights) - 1, int(self.p * len(self.heights)))]
+        return self.heights[2]
+
+
+class RunningStats:
+    """Welford count/mean/variance plus min/max and median/p90 sketches."""
+    
+    __slots__ = ('count', 'mean', 'm2', 'minimum', 'maximum', 'median', 'p90')
+    
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self.median = P2Quantile(0.5)
+        self.p90 = P2Quantile(0.9)
+    
+    def add(self, x):
+        """Add one observation."""
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        if x < self.minimum:
+            self.minimum = x
+        if x > self.maximum:
+            self.maximum = x
+        self.median.add(x)
+        self.p90.add(x)
+    
+    @property
+    def std(self):
+        """Sample standard deviation (0 for fewer than two observations)."""
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+    
+    def summary(self):
+        """
+        Returns:
+            dict: count, mean, std, min, median, p90, max
+        """
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'std': self.std,
+            'min': self.minimum,
+            'median': self.median.value(),
+            'p90': self.p90.value(),
+            'max': self.maximum,
+        }
+
+
+class PositionStats:
+    """
+    Dwell time statistics per position, safe to update from the writer
+    thread while the GUI reads snapshots.
+    """
+    
+    def __init__(self):
+        """Initialize with no positions."""
+        self.lock = threading.Lock()
+        self.positions = {}
+        self.version = 0  # Bumped on every change (cheap "anything new?" check)
+    
+    def reset(self):
+        """Clear all positions (new day)."""
+        with self.lock:
+            self.positions = {}
+            self.version += 1
+    
+    def add(self, position, dwell_time):
+        """
+        Record one trial.
+        
+        Args:
+            position (int): Position number (1-12)
+            dwell_time (float): Dwell time in seconds
+        """
+        with self.lock:
+            stats = self.positions.get(position)
+            if stats is None:
+                stats = self.positions[position] = RunningStats()
+            stats.add(dwell_time)
+            self.version += 1
+    
+    def seed(self, rows):
+        """
+        Rebuild from the day's rows (startup / date rollover only).
+        
+        Args:
+            rows (list): Rows in data_logger.COLUMNS order
+        """
+        positions = {}
+        for row in rows:
+            stats = positions.get(row[1])
+            if stats is None:
+                stats = positions[row[1]] = RunningStats()
+            stats.add(row[2])
+        with self.lock:
+            self.positions = positions
+            self.version += 1
+    
+    def snapshot(self):
+        """
+        Get a consistent copy of every position's summary.
+        
+        Returns:
+            dict: Position -> summary dict (see RunningStats.summary)
+        """
+        with self.lock:
+            return {position: stats.summary()
+                    for position, stats in sorted(self.positions.items())}
@@ -0,0 +1,203 @@
+"""
+Carousel Controller - Communication Log Filter
+Version: 1.4.0
+
+Bounds what reaches the communication log widget when the controller
+repeats itself (mag test, fault loops). Lines pass two steps in order:
+
+    coalesce    consecutive lines of one type whose text matches once
+                digits are masked ("Magnetic reading: 512", "...: 498")
+                are held back; the run is shown as one "(xN)" summary
+                line when it ends, and every COALESCE_FLUSH_S while it
+                lasts
+    rate limit  one token bucket per message type (RATE_LIMITS); lines
+                over the limit are counted and reported as a single
+                "N INFO lines not shown" warning once tokens return
+
+DATA and ERROR lines are never held, coalesced or dropped. The filter
+only decides what is drawn: the session log on disk gets every line.
+
+Usage:
+    log_filter = LogFilter()
+    for stamp, message, message_type in log_filter.submit(message, "INFO", time.time()):
+        ...                                        # Show these
+    for stamp, message, message_type in log_filter.flush(time.time()):
+        ...                                        # Once per frame
+"""
+
+import re
+
+
+PASS_THROUGH = frozenset(("DATA", "ERROR"))  # Always shown, in order
+
+# Token buckets: message type -> (lines per second, burst)
+RATE_LIMITS = {
+    "INFO": (20.0, 40),
+    "STATUS": (20.0, 40),
+    "WARNING": (10.0, 20),
+    "COMMAND": (10.0, 20),
+}
+DEFAULT_RATE_LIMIT = (20.0, 40)
+
+COALESCE_FLUSH_S = 1.0  # Summary interval while a run of repeats continues
+
+_DIGITS_RE = re.compile(r"\d+")
+
+
+class TokenBucket:
+    """Allows rate lines per second on average and bursts of up to capacity."""
+    
+    __slots__ = ('rate', 'capacity', 'tokens', 'stamp')
+    
+    def __init__(self, rate, capacity):
+        """
+        Args:
+            rate (float): Tokens added per second
+            capacity (int): Most tokens held (burst size)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.stamp = None
+    
+    def _refill(self, now):
+        if self.stamp is not None and now > self.stamp:
+            self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now if self.stamp is None else max(self.stamp, now)
+    
+    def take(self, now):
+        """
+        Take one token if available.
+        
+        Args:
+            now (float): Current time in seconds
+        
+        Returns:
+            bool: True if the line may be shown
+        """
+        self._refill(now)
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+class LogFilter:
+    """
+    Coalescing and rate-limiting stage in front of the log widget.
+    
+    Not thread-safe: the GUI calls it from the Tk thread only (inside the
+    per-frame drain of queued log events).
+    """
+    
+    def __init__(self, rate_limits=None, flush_interval=COALESCE_FLUSH_S):
+        """
+        Args:
+            rate_limits (dict): Overrides for RATE_LIMITS
+            flush_interval (float): Seconds between summaries of an ongoing run
+        """
+        self.rate_limits = dict(RATE_LIMITS, **(rate_limits or {}))
+        self.flush_interval = flush_interval
+        self.buckets = {}
+        self.suppressed = {}        # Message type -> lines dropped since the last notice
+        self.counts = {'coalesced': 0, 'suppressed': 0}  # Session totals
+        
+        # Coalescing state: the last line shown and the repeats held since
+        self._last_key = None       # (message type, digit-masked text)
+        self._last_message = None
+        self._held = 0
+        self._held_identical = True
+        self._held_last = None      # (stamp, message, message type) of the newest repeat
+        self._held_since = None
+    
+    def submit(self, message, message_type, stamp):
+        """
+        Pass one log line through the filter.
+        
+        Args:
+            message (str): Line text (without timestamp)
+            message_type (str): Log tag (INFO, WARNING, ERROR, DATA, STATUS, COMMAND)
+            stamp (float): time.time() when the line was logged
+        
+        Returns:
+            list: (stamp, message, message type) tuples to show now, in order
+        """
+        shown = []
+        if message_type in PASS_THROUGH:
+            self._end_run(shown)
+            self._last_key = None
+            shown.append((stamp, message, message_type))
+            return shown
+        
+        key = (message_type, _DIGITS_RE.sub("#", message))
+        if key == self._last_key:
+            if not self._held:
+                self._held_since = stamp
+                self._held_identical = True
+            self._held += 1
+            self._held_identical = self._held_identical and message == self._last_message
+            self._held_last = (stamp, message, message_type)
+            self.counts['coalesced'] += 1
+            if stamp - self._held_since >= self.flush_interval:
+                self._end_run(shown)
+            return shown
+        
+        self._end_run(shown)
+        if self._admit(message_type, stamp, shown):
+            self._last_key = key
+            self._last_message = message
+            shown.append((stamp, message, message_type))
+        else:
+            self._last_key = None  # Don't coalesce repeats of a line nobody saw
+        return shown
+    
+    def flush(self, now):
+        """
+        Emit summaries that are due without a new line arriving.
+        
+        Call periodically (the GUI calls it once per frame).
+        
+        Args:
+            now (float): time.time()
+        
+        Returns:
+            list: (stamp, message, message type) tuples to show now
+        """
+        shown = []
+        if self._held and now - self._held_since >= self.flush_interval:
+            self._end_run(shown)
+        for message_type in list(self.suppressed):
+            if self._bucket(message_type).take(now):
+                self._notify_suppressed(message_type, now, shown)
+        return shown
+    
+    def _end_run(self, shown):
+        """Replace the held repeats with one summary line."""
+        if not self._held:
+            return
+        stamp, message, message_type = self._held_last
+        kind = "more" if self._held_identical else "similar"
+        shown.append((stamp, f"{message} (x{self._held} {kind})", message_type))
+        self._held = 0
+    
+    def _bucket(self, message_type):
+        bucket = self.buckets.get(message_type)
+        if bucket is None:
+            rate, burst = self.rate_limits.get(message_type, DEFAULT_RATE_LIMIT)
+            bucket = self.buckets[message_type] = TokenBucket(rate, burst)
+        return bucket
+    
+    def _admit(self, message_type, stamp, shown):
+        """Take a token for a line, or count it as suppressed."""
+        if self._bucket(message_type).take(stamp):
+            if message_type in self.suppressed:
+                self._notify_suppressed(message_type, stamp, shown)
+            return True
+        self.suppressed[message_type] = self.suppressed.get(message_type, 0) + 1
+        self.counts['suppressed'] += 1
+        return False
+    
+    def _notify_suppressed(self, message_type, stamp, shown):
+        count = self.suppressed.pop(message_type)
+        shown.append((stamp, f"{count} {message_type} line{'s' if count != 1 else ''} "
+                             f"not shown (rate limit; all are in the session log)", "WARNING"))
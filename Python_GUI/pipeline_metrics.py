@@ -0,0 +1,263 @@
+"""
+Carousel Controller - Pipeline Metrics Module
+Version: 1.4.0
+
+Per-stage latency of the serial-to-disk/screen pipeline. Every line is
+stamped (time.perf_counter) when its bytes are read; each later stage
+records the line's age when it gets there:
+
+    framed      line cut out of the receive buffer
+    parsed      protocol.parse_line done
+    dispatched  routed to the listeners and the write queue
+    persisted   DATA only: written to the journal (before the group fsync)
+    rendered    DATA only: shown by the GUI
+
+Histograms have 8 log-spaced buckets per octave (about 6% resolution)
+and cover a rolling minute. Each histogram and counter is written by a
+single thread, so recording takes no lock; readers copy.
+
+Usage:
+    metrics = PipelineMetrics()
+    SerialHandler(listener, data_writer=DataWriter(logger, pipeline_metrics=metrics),
+                  pipeline_metrics=metrics)
+    metrics.export("metrics.json")
+"""
+
+import json
+import math
+import platform
+import time
+from datetime import datetime
+
+
+STAGES = ("framed", "parsed", "dispatched", "persisted", "rendered")
+COUNTERS = ("chunks", "bytes", "lines", "data", "errors", "write_errors")
+GAUGES = ("write_queue", "ui_queue")
+
+# Rolling histogram window: WINDOWS slots of WINDOW_S seconds each
+WINDOW_S = 10.0
+WINDOWS = 6
+
+# Buckets: 8 per octave of microseconds, from 1 us to ~2 min
+BUCKETS_PER_OCTAVE = 8
+BUCKET_COUNT = 27 * BUCKETS_PER_OCTAVE
+
+
+def bucket_index(seconds):
+    """
+    Map a latency to its histogram bucket (inlined in LatencyHistogram.add).
+    
+    Args:
+        seconds (float): Latency
+    
+    Returns:
+        int: Bucket index (0 for <= 1 us, BUCKET_COUNT - 1 for overflow)
+    """
+    mantissa, exponent = math.frexp(seconds * 1e6)  # mantissa in [0.5, 1)
+    if exponent <= 0:
+        return 0
+    index = exponent * BUCKETS_PER_OCTAVE + int((mantissa - 0.5) * 2 * BUCKETS_PER_OCTAVE)
+    return index if index < BUCKET_COUNT else BUCKET_COUNT - 1
+
+
+def bucket_midpoint(index):
+    """
+    Returns:
+        float: Representative latency of a bucket in seconds
+    """
+    exponent, step = divmod(index, BUCKETS_PER_OCTAVE)
+    return (0.5 + (step + 0.5) / (2 * BUCKETS_PER_OCTAVE)) * 2.0 ** exponent / 1e6
+
+
+class LatencyHistogram:
+    """Lifetime count/mean/max plus a rolling-minute bucket histogram."""
+    
+    __slots__ = ('count', 'total', 'maximum', '_slots', '_epochs', '_current', '_window_end')
+    
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        self._slots = [[0] * BUCKET_COUNT for _ in range(WINDOWS)]
+        self._epochs = [None] * WINDOWS
+        self._current = self._slots[0]
+        self._window_end = -math.inf  # First add() picks its window
+    
+    def add(self, seconds, now):
+        """
+        Record one latency (single producer thread).
+        
+        Args:
+            seconds (float): Latency
+            now (float): time.perf_counter() when measured
+        """
+        if now >= self._window_end:
+            self._rotate(now)
+        mantissa, exponent = math.frexp(seconds * 1e6)
+        if exponent <= 0:
+            index = 0
+        else:
+            index = exponent * BUCKETS_PER_OCTAVE + int((mantissa - 0.5) * 2 * BUCKETS_PER_OCTAVE)
+            if index >= BUCKET_COUNT:
+                index = BUCKET_COUNT - 1
+        self._current[index] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.maximum:
+            self.maximum = seconds
+    
+    def _rotate(self, now):
+        """Start the window containing now (its slot's old counts are dropped)."""
+        epoch = int(now // WINDOW_S)
+        slot = epoch % WINDOWS
+        self._current = self._slots[slot] = [0] * BUCKET_COUNT
+        self._epochs[slot] = epoch
+        self._window_end = (epoch + 1) * WINDOW_S
+    
+    def buckets(self, now):
+        """
+        Merge the windows of the last minute.
+        
+        Returns:
+            list: Count per bucket
+        """
+        epoch = int(now // WINDOW_S)
+        merged = [0] * BUCKET_COUNT
+        for slot_epoch, counts in zip(list(self._epochs), list(self._slots)):
+            if slot_epoch is not None and epoch - slot_epoch < WINDOWS:
+                for i, n in enumerate(counts):
+                    if n:
+                        merged[i] += n
+        return merged
+    
+    def summary(self, now):
+        """
+        Returns:
+            dict: count, mean_ms, max_ms (lifetime); recent, p50_ms, p90_ms,
+                  p99_ms (last minute); buckets (midpoint ms -> count)
+        """
+        merged = self.buckets(now)
+        recent = sum(merged)
+        result = {
+            'count': self.count,
+            'mean_ms': self.total / self.count * 1000 if self.count else None,
+            'max_ms': self.maximum * 1000 if self.count else None,
+            'recent': recent,
+        }
+        for name, q in (('p50_ms', 0.50), ('p90_ms', 0.90), ('p99_ms', 0.99)):
+            result[name] = None
+            if recent:
+                target = q * recent
+                seen = 0
+                for i, n in enumerate(merged):
+                    seen += n
+                    if seen >= target:
+                        result[name] = min(bucket_midpoint(i), self.maximum) * 1000
+                        break
+        result['buckets'] = {f"{bucket_midpoint(i) * 1000:.4g}": n
+                             for i, n in enumerate(merged) if n}
+        return result
+
+
+class PipelineMetrics:
+    """
+    Stage latencies, throughput counters and queue depths for one session.
+    
+    Shared by SerialHandler (framed/parsed/dispatched, counters), DataWriter
+    (persisted, write queue) and the GUI (rendered, UI queue).
+    """
+    
+    def __init__(self):
+        """Start with empty histograms and zeroed counters."""
+        self.started = time.perf_counter()
+        self.histograms = {stage: LatencyHistogram() for stage in STAGES}
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.gauges = {name: [0, 0] for name in GAUGES}  # name -> [current, max]
+    
+    def record(self, stage, received, now=None):
+        """
+        Record a line's age at a stage.
+        
+        Args:
+            stage (str): One of STAGES
+            received (float): time.perf_counter() when its bytes were read
+            now (float): time.perf_counter() at the stage (default: now)
+        """
+        if now is None:
+            now = time.perf_counter()
+        self.histograms[stage].add(now - received, now)
+    
+    def count(self, name, n=1):
+        """Add n to a counter (see COUNTERS)."""
+        self.counters[name] += n
+    
+    def gauge(self, name, value):
+        """Set a queue depth gauge (see GAUGES), keeping its maximum."""
+        gauge = self.gauges[name]
+        gauge[0] = value
+        if value > gauge[1]:
+            gauge[1] = value
+    
+    def snapshot(self):
+        """
+        Get a copy of everything.
+        
+        Returns:
+            dict: uptime_s, counters, rates (per second since start),
+                  gauges ({current, max}), stages (LatencyHistogram.summary)
+        """
+        now = time.perf_counter()
+        uptime = now - self.started
+        counters = dict(self.counters)
+        return {
+            'uptime_s': uptime,
+            'counters': counters,
+            'rates': {name: counters[name] / uptime if uptime else 0.0
+                      for name in ("lines", "bytes", "data")},
+            'gauges': {name: {'current': current, 'max': maximum}
+                       for name, (current, maximum) in self.gauges.items()},
+            'stages': {stage: histogram.summary(now)
+                       for stage, histogram in self.histograms.items()},
+        }
+    
+    def report(self):
+        """
+        Format the snapshot as text lines (CLI shutdown summary).
+        
+        Returns:
+            list: Lines of text
+        """
+        snapshot = self.snapshot()
+        counters = snapshot['counters']
+        lines = [f"{counters['lines']} lines, {counters['bytes']} bytes, "
+                 f"{counters['data']} DATA, {counters['errors']} errors, "
+                 f"max write queue {snapshot['gauges']['write_queue']['max']}"]
+        for stage, summary in snapshot['stages'].items():
+            if summary['count']:
+                lines.append(f"{stage:<10} n={summary['count']:<6} "
+                             f"mean={summary['mean_ms']:.3f}ms "
+                             f"p50={_ms(summary['p50_ms'])} p99={_ms(summary['p99_ms'])} "
+                             f"max={summary['max_ms']:.3f}ms")
+        return lines
+    
+    def export(self, path, **info):
+        """
+        Write the snapshot as JSON for comparison between versions.
+        
+        Args:
+            path: Output file
+            **info: Extra fields stored under 'info' (e.g. firmware, backend)
+        """
+        document = {
+            'exported': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'info': info,
+        }
+        document.update(self.snapshot())
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(document, f, indent=2)
+
+
+def _ms(value):
+    return "-" if value is None else f"{value:.3f}ms"
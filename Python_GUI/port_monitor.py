@@ -0,0 +1,163 @@
+"""
+Carousel Controller - Port Monitor Module
+Version: 1.4.0
+
+Background serial port discovery for the GUI.
+Enumerates ports on a worker thread, caches the result and reports only
+changes. On Linux it waits for udev tty events (pyudev, optional) or for
+/dev to change before enumerating again; elsewhere it polls.
+"""
+
+import os
+import sys
+import threading
+
+from serial_handler import is_arduino_port
+
+
+class PortMonitor:
+    """
+    Serial port discovery service.
+    
+    Features:
+    - One comports() call per cycle, on a worker thread
+    - Cached port list and detected Arduino port
+    - Callback only when the port list changes
+    - udev notifications when pyudev is installed, cheap /dev change check otherwise
+    - Paused while a connection is up
+    """
+    
+    def __init__(self, on_change, interval=2.0):
+        """
+        Initialize port monitor.
+        
+        Args:
+            on_change: Callback(ports, arduino_port) run on the worker thread
+            interval (float): Seconds between checks when polling
+        """
+        self.on_change = on_change
+        self.interval = interval
+        self.ports = []
+        self.arduino_port = None
+        self.paused = False
+        self.running = False
+        self.thread = None
+        self._wake = threading.Event()
+        self._force = False      # Enumerate and report even if unchanged
+        self._rescan = False     # Enumerate, report only changes
+        self._snapshot = None
+        self._dev_mtime = None
+        self._udev_observer = None
+        
+    def start(self):
+        """Start scanning (first scan happens immediately)."""
+        if self.running:
+            return
+        self.running = True
+        self._force = True
+        self._start_udev()
+        self.thread = threading.Thread(target=self._monitor_loop, daemon=True)
+        self.thread.start()
+        
+    def stop(self):
+        """Stop the worker thread."""
+        self.running = False
+        self._wake.set()
+        if self._udev_observer:
+            self._udev_observer.stop()
+            self._udev_observer = None
+        if self.thread:
+            self.thread.join(timeout=2)
+            
+    def pause(self):
+        """Stop scanning (e.g. while connected)."""
+        self.paused = True
+        
+    def resume(self):
+        """Resume scanning and rescan now."""
+        self.paused = False
+        self.refresh()
+        
+    def refresh(self):
+        """Force a rescan now and report the result even if unchanged."""
+        self._force = True
+        self._snapshot = None
+        self._wake.set()
+        
+    def _start_udev(self):
+        """Subscribe to udev tty add/remove events if pyudev is available."""
+        if not sys.platform.startswith('linux'):
+            return
+        try:
+            import pyudev
+        except ImportError:
+            return
+        try:
+            context = pyudev.Context()
+            monitor = pyudev.Monitor.from_netlink(context)
+            monitor.filter_by('tty')
+            self._udev_observer = pyudev.MonitorObserver(
+                monitor, callback=lambda device: self._on_udev_event())
+            self._udev_observer.start()
+        except Exception as e:
+            print(f"udev monitoring unavailable, polling instead: {e}")
+            self._udev_observer = None
+            
+    def _on_udev_event(self):
+        """udev reported a tty change: rescan."""
+        self._rescan = True
+        self._wake.set()
+        
+    def _devices_changed(self):
+        """
+        Cheap pre-check before enumerating (Linux without pyudev).
+        
+        Returns:
+            bool: True if /dev may have gained or lost a device node
+        """
+        if not sys.platform.startswith('linux'):
+            return True
+        try:
+            mtime = os.stat('/dev').st_mtime_ns
+        except OSError:
+            return True
+        changed = mtime != self._dev_mtime
+        self._dev_mtime = mtime
+        return changed
+        
+    def _monitor_loop(self):
+        """Worker: enumerate when needed, report changes, then sleep."""
+        while self.running:
+            if not self.paused:
+                force, rescan = self._force, self._rescan
+                self._force = self._rescan = False
+                if force or rescan or (not self._udev_observer and self._devices_changed()):
+                    self._scan(force)
+            # With udev, events wake us; the timeout is only a safety net
+            timeout = self.interval * 15 if self._udev_observer else self.interval
+            self._wake.wait(timeout)
+            self._wake.clear()
+            
+    def _scan(self, force):
+        """
+        Enumerate ports once and report if they changed.
+        
+        Args:
+            force (bool): Report even if unchanged (manual refresh)
+        """
+        try:
+            import serial.tools.list_ports  # Deferred: slow to import
+            ports = serial.tools.list_ports.comports()
+        except Exception as e:
+            print(f"ERROR enumerating serial ports: {e}")
+            return
+        snapshot = tuple(sorted((port.device, port.description) for port in ports))
+        if snapshot == self._snapshot and not force:
+            return
+        self._snapshot = snapshot
+        self.ports = [port.device for port in ports]
+        self.arduino_port = next((port.device for port in ports if is_arduino_port(port)), None)
+        try:
+            self.on_change(list(self.ports), self.arduino_port)
+        except Exception as e:
+            print(f"ERROR in port monitor callback: {e}")
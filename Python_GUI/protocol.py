@@ -0,0 +1,251 @@
+"""
+Carousel Controller - Protocol Module
+Version: 1.4.0
+
+Decodes lines received from the Arduino exactly once.
+A dispatch table keyed on the message prefix turns DATA, STATUS, ERROR
+and beam test lines into compact records shared by the GUI and the data
+logger.
+
+Protocol:
+    DATA,Trial,Position,EntryTime,ExitTime,DwellTime,Event
+    STATUS:FIELD:VALUE
+    ERROR:Message
+    S1=<value> BLOCKED|CLEAR  |  S2=<value> BLOCKED|CLEAR   (beam test)
+"""
+
+import re
+
+
+class TrialRecord:
+    """One completed door cycle (DATA packet)."""
+    
+    __slots__ = ('trial', 'position', 'entry_time', 'exit_time', 'dwell_time', 'event',
+                 'received', 'received_wall', 'entry_wall', 'exit_wall')
+    
+    def __init__(self, trial, position, entry_time, exit_time, dwell_time, event):
+        """
+        Args:
+            trial (int): Trial number
+            position (int): Position number (1-12)
+            entry_time (int): Arduino millis() when mouse entered
+            exit_time (int): Arduino millis() when mouse exited
+            dwell_time (float): Dwell time in seconds
+            event (str): Event type ('AUTO' or 'MANUAL')
+        
+        Set by SerialHandler (None for records not from a port):
+            received: time.perf_counter() when the packet's bytes were read
+            received_wall: time.time() at the same moment
+            entry_wall, exit_wall: entry_time / exit_time as Unix seconds
+                                   (clock_sync.ClockModel), None if unknown
+        """
+        self.trial = trial
+        self.position = position
+        self.entry_time = entry_time
+        self.exit_time = exit_time
+        self.dwell_time = dwell_time
+        self.event = event
+        self.received = None
+        self.received_wall = None
+        self.entry_wall = None
+        self.exit_wall = None
+        
+    def __repr__(self):
+        return (f"TrialRecord(trial={self.trial}, position={self.position}, "
+                f"dwell_time={self.dwell_time}, event={self.event!r})")
+
+
+class StatusUpdate:
+    """One STATUS:FIELD:VALUE update."""
+    
+    __slots__ = ('field', 'value')
+    
+    def __init__(self, field, value):
+        """
+        Args:
+            field (str): Upper-case field name (MAGNET, MOUSE, POSITION, ...)
+            value (str): Field value
+        """
+        self.field = field
+        self.value = value
+        
+    def __repr__(self):
+        return f"StatusUpdate({self.field!r}, {self.value!r})"
+
+
+class ErrorMessage:
+    """One ERROR: line."""
+    
+    __slots__ = ('text',)
+    
+    def __init__(self, text):
+        """
+        Args:
+            text (str): Error text after the 'ERROR:' prefix
+        """
+        self.text = text
+        
+    def __repr__(self):
+        return f"ErrorMessage({self.text!r})"
+
+
+class BeamSample:
+    """One beam test reading (both sensors)."""
+    
+    __slots__ = ('s1', 's2')
+    
+    def __init__(self, s1, s2):
+        """
+        Args:
+            s1 (int): Mainchamber sensor analogRead() value
+            s2 (int): Subchamber sensor analogRead() value
+        """
+        self.s1 = s1
+        self.s2 = s2
+        
+    def __repr__(self):
+        return f"BeamSample(s1={self.s1}, s2={self.s2})"
+
+
+class Message:
+    """
+    A decoded line.
+    
+    kind matches the communication log tags: DATA, STATUS, ERROR, WARNING
+    or INFO, plus BEAM for beam test readings (not logged line by line).
+    record holds the decoded record (None for plain text lines and for
+    malformed packets).
+    """
+    
+    __slots__ = ('kind', 'line', 'record')
+    
+    def __init__(self, kind, line, record=None):
+        self.kind = kind
+        self.line = line
+        self.record = record
+
+
+# ============================================
+# Decoders
+# ============================================
+
+def decode_data(line):
+    """
+    Decode a DATA packet.
+    
+    Expected format: DATA,Trial,Position,EntryTime,ExitTime,DwellTime,Event
+    Example: DATA,1,5,12543,18865,6.32,AUTO
+    
+    Args:
+        line (str): Raw DATA packet line
+        
+    Returns:
+        TrialRecord or None: Decoded record, or None if the packet is invalid
+    """
+    parts = line.split(',')
+    if len(parts) != 7 or parts[0] != "DATA":
+        return None
+    try:
+        return TrialRecord(int(parts[1]), int(parts[2]), int(parts[3]),
+                           int(parts[4]), float(parts[5]), parts[6].strip())
+    except ValueError:
+        return None
+
+
+def decode_status(line):
+    """
+    Decode a STATUS update.
+    
+    Args:
+        line (str): Raw STATUS:FIELD:VALUE line
+        
+    Returns:
+        StatusUpdate or None: Decoded update, or None if malformed
+    """
+    parts = line.split(':')
+    if len(parts) != 3:
+        return None
+    return StatusUpdate(parts[1].upper(), parts[2])
+
+
+def decode_error(line):
+    """
+    Decode an ERROR line.
+    
+    Args:
+        line (str): Raw ERROR:... line
+        
+    Returns:
+        ErrorMessage: Decoded error
+    """
+    return ErrorMessage(line[6:].strip())
+
+
+def decode_beam(line):
+    """
+    Decode a beam test reading.
+    
+    Expected format: S1=<value> BLOCKED|CLEAR  |  S2=<value> BLOCKED|CLEAR
+    Example: S1=512 CLEAR  |  S2=801 BLOCKED
+    
+    Args:
+        line (str): Raw beam test line
+        
+    Returns:
+        BeamSample or None: Decoded sample, or None if malformed
+    """
+    parts = line.split()
+    if len(parts) != 5 or not parts[3].startswith("S2="):
+        return None
+    try:
+        return BeamSample(int(parts[0][3:]), int(parts[3][3:]))
+    except ValueError:
+        return None
+
+
+# Prefix (including separator) -> (log tag, decoder)
+DISPATCH = {
+    "DATA,": ("DATA", decode_data),
+    "STATUS:": ("STATUS", decode_status),
+    "ERROR:": ("ERROR", decode_error),
+    "S1=": ("BEAM", decode_beam),
+}
+
+_PREFIX_RE = re.compile(r"[A-Z][A-Z0-9]*[,:=]")
+_BANNER_RE = re.compile(r"=== Carousel Controller (\d+\.\d+\.\d+) ===")
+_WARNING_RE = re.compile("WARNING|⚠️")
+
+
+def parse_banner(line):
+    """
+    Recognize the startup banner printed by setup().
+    
+    Args:
+        line (str): Received line
+        
+    Returns:
+        str or None: Firmware version (e.g. '1.4.1'), or None if not the banner
+    """
+    match = _BANNER_RE.match(line)
+    return match.group(1) if match else None
+
+
+def parse_line(line):
+    """
+    Classify and decode one stripped line from the Arduino.
+    
+    Args:
+        line (str): Received line
+        
+    Returns:
+        Message: Decoded message
+    """
+    match = _PREFIX_RE.match(line)
+    if match:
+        entry = DISPATCH.get(match.group())
+        if entry:
+            kind, decoder = entry
+            return Message(kind, line, decoder(line))
+    if _WARNING_RE.search(line):
+        return Message("WARNING", line)
+    return Message("INFO", line)
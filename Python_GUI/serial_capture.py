@@ -0,0 +1,236 @@
+"""
+Carousel Controller - Raw Serial Capture and Replay
+Version: 1.4.0
+
+Records every chunk SerialHandler's read thread receives, with the
+receive time the handler stamps its lines with (time.perf_counter()), and
+plays captures back through the same framing and routing code at the
+original pace, N times faster, or flat out.
+
+File format (little-endian):
+    header   b"CARCAP1\\n" + f8 wall-clock start time (time.time())
+    record   f8 seconds since capture start + u4 length + raw bytes
+
+A record cut short by a crash ends the capture; everything before it is
+kept.
+
+Usage:
+    handler.start_capture("session.ccap")       # Record while connected
+    handler.replay("session.ccap", speed=10)    # Play back at 10x
+    python carousel_cli.py --replay session.ccap --speed 0 --data-folder /tmp/replay
+    python serial_capture.py session.ccap       # Summary / --dump lines
+"""
+
+import argparse
+import struct
+import sys
+import threading
+import time
+
+
+MAGIC = b"CARCAP1\n"
+_HEADER = struct.Struct("<d")
+_RECORD = struct.Struct("<dI")
+
+
+class CaptureWriter:
+    """
+    Append-only capture file written by the serial read thread.
+    
+    Writes are buffered; close() (or flush()) pushes them to disk.
+    """
+    
+    def __init__(self, path):
+        """
+        Args:
+            path: Capture file to create (overwritten if it exists)
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC + _HEADER.pack(time.time()))
+        self.start = time.perf_counter()  # Same clock as SerialHandler's receive stamps
+        self.chunks = 0
+        self.bytes = 0
+    
+    def write(self, chunk, received=None):
+        """
+        Record one received chunk.
+        
+        Args:
+            chunk (bytes): Raw bytes as read from the port
+            received (float): time.perf_counter() at receipt (default: now)
+        """
+        if received is None:
+            received = time.perf_counter()
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.write(_RECORD.pack(received - self.start, len(chunk)))
+            self.file.write(chunk)
+            self.chunks += 1
+            self.bytes += len(chunk)
+    
+    def flush(self):
+        """Push buffered records to the OS."""
+        with self.lock:
+            if self.file is not None:
+                self.file.flush()
+    
+    def close(self):
+        """Flush and close the file (further writes are ignored)."""
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+def read_capture(path):
+    """
+    Iterate over a capture file.
+    
+    Args:
+        path: Capture file
+    
+    Yields:
+        tuple: (seconds since capture start, bytes)
+    
+    Raises:
+        ValueError: If the file is not a capture
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC or len(f.read(_HEADER.size)) != _HEADER.size:
+            raise ValueError(f"{path} is not a serial capture")
+        while True:
+            header = f.read(_RECORD.size)
+            if len(header) < _RECORD.size:
+                return
+            offset, length = _RECORD.unpack(header)
+            chunk = f.read(length)
+            if len(chunk) < length:
+                return  # Torn last record
+            yield offset, chunk
+
+
+def capture_start_time(path):
+    """
+    Returns:
+        float: Wall-clock time (time.time()) the capture started
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a serial capture")
+        return _HEADER.unpack(f.read(_HEADER.size))[0]
+
+
+class ReplayPort:
+    """
+    Stand-in for serial.Serial that plays a capture back.
+    
+    Each chunk is released at its original offset divided by speed
+    (speed 0 = no pacing) and returned whole by one read(), so the reader
+    sees the captured chunk boundaries. Writes are accepted and discarded;
+    the port closes itself at the end of the capture so the read loop exits.
+    """
+    
+    def __init__(self, path, speed=1.0, timeout=0.1):
+        """
+        Args:
+            path: Capture file
+            speed (float): Playback speed factor (1 = original pace, 0 = flat out)
+            timeout (float): Longest a read() blocks, like serial.Serial(timeout=)
+        """
+        self.path = path
+        self.speed = speed
+        self.timeout = timeout
+        self.is_open = True
+        self.finished = threading.Event()
+        self.chunks = 0
+        self.bytes = 0
+        self._records = read_capture(path)
+        self._pending = b""
+        self._due = 0.0
+        self._start = None
+    
+    def _next(self):
+        """Load the next record, or close at the end of the capture."""
+        try:
+            offset, self._pending = next(self._records)
+        except StopIteration:
+            self.close()
+            return False
+        if self._start is None:
+            self._start = time.monotonic() - (offset / self.speed if self.speed else 0)
+        self._due = self._start + offset / self.speed if self.speed else 0.0
+        self.chunks += 1
+        self.bytes += len(self._pending)
+        return True
+    
+    @property
+    def in_waiting(self):
+        if self._pending and time.monotonic() >= self._due:
+            return len(self._pending)
+        return 0
+    
+    def read(self, size=1):
+        """
+        Return the next due chunk, whole.
+        
+        size is ignored: in_waiting can't see a chunk before it is loaded,
+        so honouring read(1) would split every captured chunk in two.
+        Blocks until the chunk is due, for at most timeout seconds.
+        """
+        if not self.is_open:
+            return b""
+        if not self._pending and not self._next():
+            return b""
+        delay = self._due - time.monotonic()
+        if delay > 0:
+            time.sleep(min(delay, self.timeout))
+            if delay > self.timeout:
+                return b""
+        data, self._pending = self._pending, b""
+        return data
+    
+    def write(self, data):
+        return len(data)
+    
+    def close(self):
+        self.is_open = False
+        self.finished.set()
+
+
+def main(argv=None):
+    """Summarize or dump a capture file."""
+    parser = argparse.ArgumentParser(description="Inspect a Carousel serial capture")
+    parser.add_argument("capture", help="capture file (.ccap)")
+    parser.add_argument("--dump", action="store_true",
+                        help="print every line with its receive offset")
+    args = parser.parse_args(argv)
+    
+    try:
+        started = capture_start_time(args.capture)
+        chunks = total = lines = 0
+        last = 0.0
+        partial = b""
+        for offset, chunk in read_capture(args.capture):
+            chunks += 1
+            total += len(chunk)
+            last = offset
+            lines += chunk.count(b'\n')
+            if args.dump:
+                partial += chunk
+                *complete, partial = partial.split(b'\n')
+                for line in complete:
+                    print(f"{offset:10.3f}  {line.decode('utf-8', errors='replace').rstrip()}")
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {e}")
+        return 1
+    
+    print(f"{args.capture}: started {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(started))}, "
+          f"{last:.1f}s, {chunks} chunks, {total} bytes, {lines} lines")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,9 +7,93 @@ Handles connection, disconnection, reading, and command sending.
 """
 
 import serial
-import serial.tools.list_ports
 import threading
 import time
+from collections import deque
+
+import protocol
+from clock_sync import ClockModel
+from device_state import DeviceState
+from pipeline_metrics import PipelineMetrics
+
+
+# Reader: blocks in read() for at most READ_TIMEOUT so disconnect() is noticed
+READ_TIMEOUT = 0.1
+MAX_LINE_BYTES = 4096  # Discard unterminated input beyond this
+
+# Connect: ready once the startup banner arrives, or after this many seconds
+READY_TIMEOUT = 2.0
+
+# Reconnect supervisor: exponential backoff between reopen attempts
+RECONNECT_INITIAL_DELAY = 0.5
+RECONNECT_MAX_DELAY = 30.0
+COMMAND_TTL = 30.0          # Seconds a command queued during an outage stays valid
+MAX_QUEUED_COMMANDS = 100
+
+
+def is_arduino_port(port):
+    """
+    Check a port for common Arduino identifiers.
+    
+    Args:
+        port: serial.tools.list_ports ListPortInfo
+        
+    Returns:
+        bool: True if the port looks like an Arduino
+    """
+    return ('Arduino' in port.description or 'CH340' in port.description or
+            'USB' in port.description or 'ACM' in port.device)
+
+
+class SerialListener:
+    """
+    Observer interface for SerialHandler events.
+    
+    Override the callbacks you need; the defaults do nothing. Callbacks run
+    on the serial read thread (or the caller's thread for command echoes),
+    so implementations must not block or touch UI toolkits directly.
+    """
+    
+    def log_message(self, message, message_type="INFO"):
+        """
+        Line or event for the communication log.
+        
+        Args:
+            message (str): Message text
+            message_type (str): INFO, WARNING, ERROR, DATA, STATUS or COMMAND
+        """
+    
+    def handle_status_update(self, update):
+        """
+        Decoded STATUS:FIELD:VALUE line.
+        
+        Args:
+            update (StatusUpdate): Decoded status update
+        """
+    
+    def handle_trial(self, record):
+        """
+        Decoded DATA packet (persistence is done by the data writer).
+        
+        Args:
+            record (TrialRecord): Decoded trial
+        """
+    
+    def handle_connection_state(self, state):
+        """
+        Link state change detected by the handler.
+        
+        Args:
+            state (str): CONNECTED, RECONNECTING or DISCONNECTED
+        """
+    
+    def handle_beam_sample(self, sample):
+        """
+        Decoded beam test reading (already stored in the beam recorder).
+        
+        Args:
+            sample (BeamSample): Decoded reading
+        """
 
 
 class SerialHandler:
@@ -22,21 +106,94 @@ class SerialHandler:
     - Line parsing and routing (DATA, STATUS, ERROR)
     - Command sending
     - Connection state management
+    - Observer callbacks (SerialListener), no GUI dependency
+    - Automatic reconnect with backoff; commands queued during outages
+    - Raw capture of received bytes and replay of captures (serial_capture)
+    - Per-stage latency and throughput counters (pipeline_metrics)
+    - Receive timestamps per chunk; controller millis() mapped to wall clock
+    - Beam test readings recorded in a ring buffer (beam_monitor), not logged
+    - Observable device state (device_state) updated from every packet
     """
     
-    def __init__(self, gui):
+    def __init__(self, listener=None, data_writer=None, auto_reconnect=True,
+                 pipeline_metrics=None, device_state=None):
         """
         Initialize serial handler.
         
         Args:
-            gui: Reference to GUI object for callbacks
+            listener: Optional SerialListener receiving callbacks
+            data_writer: Optional DataWriter that persists DATA packets
+            auto_reconnect (bool): Reopen the same port if the link drops
+            pipeline_metrics: PipelineMetrics shared with the writer and GUI
+                              (default: a private one)
+            device_state: DeviceState to keep current (default: a private one)
         """
-        self.gui = gui
+        self.listeners = [listener] if listener else []
+        self.data_writer = data_writer
         self.serial_port = None
         self.is_connected = False
         self.read_thread = None
         self.running = False
+        self.firmware_version = None
+        self._banner_seen = threading.Event()
+        self._rx_buffer = bytearray()  # Received bytes not yet framed into a line
+        self.capture = None            # CaptureWriter while recording
+        self.pipeline_metrics = pipeline_metrics or PipelineMetrics()
+        self.clock = ClockModel()      # Controller millis() -> wall clock
+        self.device_state = device_state or DeviceState()
+        self.beam_recorder = None      # BeamRecorder, created on the first reading
+        self._beam_run = 0             # Readings in the current beam test
+        
+        # Reconnect supervisor state
+        self.auto_reconnect = auto_reconnect
+        self.reconnecting = False
+        self.port_name = None
+        self.baudrate = 115200
+        self._link_lock = threading.Lock()
+        self._stop_reconnect = threading.Event()
+        self._lost_during_reopen = threading.Event()  # Reopened port failed before recovery
+        self._pending_commands = deque()  # (command, expiry) queued during an outage
+        self.metrics = {
+            'link_drops': 0,
+            'reconnects': 0,
+            'reconnect_attempts': 0,
+            'last_recovery_s': None,
+            'total_downtime_s': 0.0,
+            'commands_queued': 0,
+            'commands_replayed': 0,
+            'commands_expired': 0,
+        }
         
+    def add_listener(self, listener):
+        """
+        Subscribe a SerialListener to handler events.
+        
+        Args:
+            listener: SerialListener implementation
+        """
+        if listener not in self.listeners:
+            self.listeners = self.listeners + [listener]  # Copy: read thread iterates
+    
+    def remove_listener(self, listener):
+        """
+        Unsubscribe a SerialListener.
+        
+        Args:
+            listener: Previously added listener
+        """
+        self.listeners = [l for l in self.listeners if l is not listener]
+    
+    def _log(self, message, message_type="INFO"):
+        """Send a communication log entry to all listeners."""
+        for listener in self.listeners:
+            listener.log_message(message, message_type)
+    
+    def _notify_state(self, state):
+        """Send a connection state change to the device state and all listeners."""
+        self.device_state.update(connection=state)
+        for listener in self.listeners:
+            listener.handle_connection_state(state)
+    
     def get_available_ports(self):
         """
         Get list of available serial ports.
@@ -44,6 +201,7 @@ class SerialHandler:
         Returns:
             list: List of port device names (e.g., ['COM3', '/dev/ttyUSB0'])
         """
+        import serial.tools.list_ports  # Deferred: port enumeration is slow to import
         ports = serial.tools.list_ports.comports()
         return [port.device for port in ports]
     
@@ -54,121 +212,468 @@ class SerialHandler:
         Returns:
             str or None: Port name if Arduino found, None otherwise
         """
+        import serial.tools.list_ports
         ports = serial.tools.list_ports.comports()
         for port in ports:
-            # Look for common Arduino identifiers
-            if 'Arduino' in port.description or 'CH340' in port.description or \
-               'USB' in port.description or 'ACM' in port.device:
+            if is_arduino_port(port):
                 return port.device
         return None
     
-    def connect(self, port_name, baudrate=115200):
+    def connect(self, port_name, baudrate=115200, ready_timeout=READY_TIMEOUT):
         """
-        Connect to Arduino on specified port.
+        Connect to Arduino on specified port (blocks until ready).
+        
+        The controller counts as ready when its startup banner
+        (=== Carousel Controller X.Y.Z ===) arrives, or after ready_timeout
+        for boards that don't reset when the port opens.
         
         Args:
             port_name (str): Serial port name (e.g., 'COM3', '/dev/ttyUSB0')
             baudrate (int): Baud rate (default: 115200)
+            ready_timeout (float): Maximum seconds to wait for the banner
             
         Returns:
             bool: True if connected successfully, False otherwise
         """
+        self._stop_reconnect.clear()
+        self._pending_commands.clear()
+        self.device_state.update(connection="CONNECTING", port=port_name)
         try:
-            self.serial_port = serial.Serial(port_name, baudrate, timeout=0.1)
-            time.sleep(2)  # Wait for Arduino reset after connection
-            self.is_connected = True
-            self.start_reading()
-            return True
+            self._open(port_name, baudrate, ready_timeout)
         except Exception as e:
-            self.gui.log_message(f"Connection error: {e}", "ERROR")
+            self._log(f"Connection error: {e}", "ERROR")
+            self.device_state.update(connection="DISCONNECTED")
+            return False
+        self.port_name = port_name
+        self.baudrate = baudrate
+        self.is_connected = True
+        self.device_state.update(connection="CONNECTED")
+        return True
+    
+    def _open(self, port_name, baudrate, ready_timeout):
+        """
+        Open the port, start the reader and wait for the banner.
+        
+        Raises:
+            serial.SerialException: If the port can't be opened
+        """
+        self._banner_seen.clear()
+        self.firmware_version = None
+        self.device_state.update(firmware=None)
+        self.serial_port = serial.Serial(port_name, baudrate, timeout=READ_TIMEOUT)
+        self.start_reading()
+        if not self._banner_seen.wait(ready_timeout):
+            self._log(f"No startup banner within {ready_timeout:g}s, assuming ready", "INFO")
+    
+    def replay(self, path, speed=1.0):
+        """
+        Play a capture file through the reader as if it came from a port.
+        
+        Lines are framed and routed exactly as live input; commands are
+        discarded. The port closes itself at the end of the capture
+        (serial_port.finished is set).
+        
+        Args:
+            path: Capture written by start_capture()
+            speed (float): Playback speed factor (1 = original pace, 0 = flat out)
+            
+        Returns:
+            bool: True if playback started
+        """
+        from serial_capture import ReplayPort
+        
+        try:
+            self.serial_port = ReplayPort(path, speed, timeout=READ_TIMEOUT)
+        except (OSError, ValueError) as e:
+            self._log(f"Replay error: {e}", "ERROR")
             return False
+        self.auto_reconnect = False
+        self._banner_seen.clear()
+        self.firmware_version = None
+        self.device_state.update(firmware=None)
+        self.port_name = str(path)
+        self.is_connected = True
+        self.device_state.update(connection="CONNECTED", port=self.port_name)
+        self.start_reading()
+        return True
+    
+    def start_capture(self, path):
+        """
+        Record every received chunk (with its receive time) to a file.
+        
+        Recording continues across reconnects until stop_capture().
+        
+        Args:
+            path: Capture file to create
+            
+        Returns:
+            bool: True if recording started
+        """
+        from serial_capture import CaptureWriter
+        
+        self.stop_capture()
+        try:
+            self.capture = CaptureWriter(path)
+        except OSError as e:
+            self._log(f"Capture error: {e}", "ERROR")
+            return False
+        self._log(f"Recording raw serial input to {path}", "INFO")
+        return True
+    
+    def stop_capture(self):
+        """Stop recording and close the capture file."""
+        capture, self.capture = self.capture, None
+        if capture:
+            capture.close()
+            self._log(f"Capture saved: {capture.path} "
+                      f"({capture.chunks} chunks, {capture.bytes} bytes)", "INFO")
+    
+    def connect_async(self, port_name, callback, baudrate=115200, ready_timeout=READY_TIMEOUT):
+        """
+        Connect on a worker thread and report the result.
+        
+        Args:
+            port_name (str): Serial port name
+            callback: Callback(success, port_name) run on the worker thread
+            baudrate (int): Baud rate (default: 115200)
+            ready_timeout (float): Maximum seconds to wait for the banner
+        """
+        def worker():
+            success = self.connect(port_name, baudrate, ready_timeout)
+            callback(success, port_name)
+        threading.Thread(target=worker, daemon=True).start()
     
     def disconnect(self):
-        """Disconnect from Arduino."""
+        """Disconnect from Arduino (also cancels a pending reconnect)."""
+        self._stop_reconnect.set()
         self.running = False
-        if self.read_thread:
+        if self.read_thread and self.read_thread is not threading.current_thread():
             self.read_thread.join(timeout=2)
         if self.serial_port and self.serial_port.is_open:
             self.serial_port.close()
         self.is_connected = False
+        self.reconnecting = False
+        self._pending_commands.clear()
+        self.device_state.update(connection="DISCONNECTED")
+        if self.data_writer:
+            self.data_writer.flush()  # Commit trials still in the write queue
+    
+    def get_metrics(self):
+        """
+        Get link reliability metrics.
+        
+        Returns:
+            dict: link_drops, reconnects, reconnect_attempts, last_recovery_s,
+                  total_downtime_s, commands_queued/replayed/expired
+        """
+        return dict(self.metrics)
+    
+    def _handle_link_lost(self, error):
+        """
+        React to a dead port: close it and start the reconnect supervisor.
+        
+        Args:
+            error (Exception): Error that revealed the outage
+        """
+        with self._link_lock:
+            if self._stop_reconnect.is_set():
+                return
+            if self.reconnecting:
+                # The supervisor's reopened port died before it was declared
+                # recovered: tell it to keep backing off
+                self._lost_during_reopen.set()
+                return
+            self.is_connected = False
+            self.running = False
+            try:
+                self.serial_port.close()
+            except Exception:
+                pass
+            self.metrics['link_drops'] += 1
+            if not self.auto_reconnect:
+                self._log(f"Connection lost: {error}", "ERROR")
+                self._notify_state("DISCONNECTED")
+                return
+            self.reconnecting = True
+        self._log(f"Connection lost ({error}), reconnecting to {self.port_name}...", "ERROR")
+        self._notify_state("RECONNECTING")
+        threading.Thread(target=self._reconnect_loop, daemon=True).start()
+    
+    def _reconnect_loop(self):
+        """Reopen the same port with exponential backoff until it works or disconnect()."""
+        lost_at = time.monotonic()
+        delay = RECONNECT_INITIAL_DELAY
+        while not self._stop_reconnect.wait(delay):
+            self.metrics['reconnect_attempts'] += 1
+            self._lost_during_reopen.clear()
+            try:
+                self._open(self.port_name, self.baudrate, READY_TIMEOUT)
+            except Exception:
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+                continue
+            if self._stop_reconnect.is_set():
+                self.disconnect()  # disconnect() raced with the reopen
+                return
+            with self._link_lock:
+                # Recovered only if the new reader survived the banner wait;
+                # after reconnecting is cleared, a failure starts a new outage
+                alive = (not self._lost_during_reopen.is_set() and
+                         self.read_thread.is_alive() and self.serial_port.is_open)
+                if alive:
+                    self.reconnecting = False
+                    self.is_connected = True
+            if not alive:
+                self.running = False
+                try:
+                    self.serial_port.close()
+                except Exception:
+                    pass
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+                continue
+            recovery = time.monotonic() - lost_at
+            self.metrics['reconnects'] += 1
+            self.metrics['last_recovery_s'] = recovery
+            self.metrics['total_downtime_s'] += recovery
+            self._log(f"Reconnected to {self.port_name} after {recovery:.1f}s", "STATUS")
+            self._notify_state("CONNECTED")
+            self._replay_commands()
+            return
+    
+    def _replay_commands(self):
+        """Send commands queued during the outage, dropping expired ones."""
+        now = time.monotonic()
+        while self._pending_commands:
+            command, expiry = self._pending_commands.popleft()
+            if expiry < now:
+                self.metrics['commands_expired'] += 1
+                self._log(f"Dropped queued command '{command}' (expired)", "WARNING")
+                continue
+            if self.send_command(command):
+                self.metrics['commands_replayed'] += 1
+    
+    def _queue_command(self, command):
+        """
+        Hold a command until the link is back.
+        
+        Returns:
+            bool: True if queued, False if the queue is full
+        """
+        if len(self._pending_commands) >= MAX_QUEUED_COMMANDS:
+            self.metrics['commands_expired'] += 1
+            self._log(f"Command queue full, dropped '{command}'", "ERROR")
+            return False
+        self._pending_commands.append((command, time.monotonic() + COMMAND_TTL))
+        self.metrics['commands_queued'] += 1
+        self._log(f">> {command} (queued until reconnect)", "COMMAND")
+        return True
     
     def start_reading(self):
         """Start background thread for reading serial data."""
         self.running = True
+        self._rx_buffer.clear()
         self.read_thread = threading.Thread(target=self._read_loop, daemon=True)
         self.read_thread.start()
     
     def _read_loop(self):
-        """Background loop to continuously read serial data."""
-        buffer = ""
+        """
+        Background loop to continuously read serial data.
+        
+        Blocks in read() until data arrives (or READ_TIMEOUT expires) instead of
+        polling, records the chunk if a capture is running, then frames it.
+        """
         while self.running and self.serial_port and self.serial_port.is_open:
             try:
-                if self.serial_port.in_waiting:
-                    # Read available bytes
-                    chunk = self.serial_port.read(self.serial_port.in_waiting).decode('utf-8', errors='ignore')
-                    buffer += chunk
+                # Wait for at least one byte, then take everything already waiting
+                chunk = self.serial_port.read(max(1, self.serial_port.in_waiting))
+                if not chunk:
+                    continue
+                received = time.perf_counter()
+                received_wall = time.time()
+                capture = self.capture
+                if capture:
+                    capture.write(chunk, received)  # Same stamp the lines get
+                self.feed(chunk, received, received_wall)
                     
-                    # Process complete lines
-                    while '\n' in buffer:
-                        line, buffer = buffer.split('\n', 1)
-                        line = line.strip()
-                        if line:
-                            self.process_line(line)
-                            
             except Exception as e:
-                self.gui.log_message(f"Read error: {e}", "ERROR")
-                time.sleep(0.1)
-            time.sleep(0.01)  # Small delay to prevent CPU hogging
+                if not self.running:
+                    break  # Port closed by disconnect()
+                self._handle_link_lost(e)
+                break
     
-    def process_line(self, line):
+    def feed(self, chunk, received=None, received_wall=None):
+        """
+        Frame received bytes into lines and route each complete line.
+        
+        Lines are framed out of a reusable bytearray and only complete lines
+        are decoded, so a burst costs time linear in its size. Also used to
+        push captured bytes through the handler without a port or thread.
+        
+        Args:
+            chunk (bytes): Raw bytes in arrival order
+            received (float): time.perf_counter() when read (default: now)
+            received_wall (float): time.time() when read (default: now)
+        """
+        metrics = self.pipeline_metrics
+        if received is None:
+            received = time.perf_counter()
+        if received_wall is None:
+            received_wall = time.time()
+        counters = metrics.counters
+        counters["chunks"] += 1
+        counters["bytes"] += len(chunk)
+        framed = metrics.histograms["framed"]
+        buffer = self._rx_buffer
+        buffer += chunk
+        
+        # Process complete lines
+        start = 0
+        while True:
+            end = buffer.find(b'\n', start)
+            if end < 0:
+                break
+            line = buffer[start:end].decode('utf-8', errors='ignore').strip()
+            start = end + 1
+            if line:
+                now = time.perf_counter()
+                framed.add(now - received, now)
+                self.process_line(line, received, received_wall)
+        
+        # Drop consumed bytes once per chunk
+        if start:
+            del buffer[:start]
+        if len(buffer) > MAX_LINE_BYTES:
+            buffer.clear()
+    
+    def process_line(self, line, received=None, received_wall=None):
         """
         Parse and route incoming serial line.
         
+        The line is decoded once by the protocol module; the GUI and the
+        data writer receive the resulting records.
+        
         Args:
             line (str): Received line from Arduino
+            received (float): time.perf_counter() when its bytes were read
+                              (default: now)
+            received_wall (float): time.time() at the same moment (default: now)
         """
-        if line.startswith("DATA,"):
-            # Data packet - send to data logger and GUI
-            self.gui.handle_data_packet(line)
-            self.gui.log_message(line, "DATA")
+        metrics = self.pipeline_metrics
+        if received is None:
+            received = time.perf_counter()
+        if received_wall is None:
+            received_wall = time.time()
+        metrics.count("lines")
+        message = protocol.parse_line(line)
+        metrics.record("parsed", received)
+        kind = message.kind
+        
+        if kind == "BEAM" and message.record is not None:
+            self._record_beam(message.record, received)
+            metrics.record("dispatched", received)
+            return
+        if self._beam_run:
+            self._end_beam_run()
+        
+        if kind == "INFO" and not self._banner_seen.is_set():
+            version = protocol.parse_banner(line)
+            if version:
+                self.firmware_version = version
+                self.clock.reset()  # Controller restarted: millis() from zero
+                self.device_state.update(firmware=version, homed=False, session_trial=0)
+                self._banner_seen.set()
+        
+        if kind == "DATA":
+            # Data packet - queue for the background writer, show in GUI
+            if message.record is None:
+                metrics.count("errors")
+                self._log(f"Invalid DATA packet: {line}", "ERROR")
+                return
+            metrics.count("data")
+            self._stamp(message.record, received, received_wall)
+            self.device_state.apply_trial(message.record)
+            if self.data_writer:
+                self.data_writer.submit(message.record)
+            for listener in self.listeners:
+                listener.handle_trial(message.record)
+            self._log(line, "DATA")
             
-        elif line.startswith("STATUS:"):
+        elif kind == "STATUS":
             # Status update - send to GUI
-            self.gui.handle_status_update(line)
-            self.gui.log_message(line, "STATUS")
-            
-        elif line.startswith("ERROR:"):
-            # Error message
-            self.gui.log_message(line, "ERROR")
-            
-        elif "WARNING" in line or "⚠️" in line:
-            # Warning message
-            self.gui.log_message(line, "WARNING")
+            if message.record is not None:
+                self.device_state.apply_status(message.record)
+                for listener in self.listeners:
+                    listener.handle_status_update(message.record)
+            self._log(line, "STATUS")
             
         else:
-            # General information
-            self.gui.log_message(line, "INFO")
+            # ERROR, WARNING or general information
+            if kind == "ERROR":
+                metrics.count("errors")
+                self.device_state.increment("errors")
+            self._log(line, kind)
+        metrics.record("dispatched", received)
+    
+    def _record_beam(self, sample, received):
+        """Store a beam test reading instead of logging the line."""
+        if self.beam_recorder is None:
+            from beam_monitor import BeamRecorder  # Deferred: NumPy only when needed
+            self.beam_recorder = BeamRecorder()
+        if not self._beam_run:
+            self._log("Beam readings streaming to the beam monitor", "INFO")
+        self.beam_recorder.append(received, sample.s1, sample.s2)
+        self._beam_run += 1
+        for listener in self.listeners:
+            listener.handle_beam_sample(sample)
+    
+    def _end_beam_run(self):
+        """Log one summary line for the beam test that just ended."""
+        summary = self.beam_recorder.summary(self._beam_run)
+        self._beam_run = 0
+        self._log(f"Beam test: {summary}", "INFO")
+    
+    def _stamp(self, record, received, received_wall):
+        """
+        Attach receive times and wall-clock entry/exit times to a trial.
+        
+        DATA is printed right after ExitTime is read, so a packet with an
+        exit also updates the clock model.
+        """
+        record.received = received
+        record.received_wall = received_wall
+        clock = self.clock
+        if record.exit_time:
+            clock.observe(record.exit_time, received_wall)
+        record.entry_wall = clock.to_wall(record.entry_time)
+        record.exit_wall = clock.to_wall(record.exit_time)
     
     def send_command(self, command):
         """
         Send command to Arduino.
         
+        While reconnecting, the command is queued (COMMAND_TTL) and replayed
+        once the link is back.
+        
         Args:
             command (str): Command to send (without newline)
             
         Returns:
-            bool: True if sent successfully, False otherwise
+            bool: True if sent (or queued) successfully, False otherwise
         """
         if self.is_connected and self.serial_port:
             try:
                 self.serial_port.write(f"{command}\n".encode('utf-8'))
-                self.gui.log_message(f">> {command}", "COMMAND")
+                self._log(f">> {command}", "COMMAND")
                 return True
             except Exception as e:
-                self.gui.log_message(f"Send error: {e}", "ERROR")
-                return False
+                self._log(f"Send error: {e}", "ERROR")
+                if not self.auto_reconnect:
+                    return False
+                self._handle_link_lost(e)
+                return self._queue_command(command)
+        elif self.reconnecting:
+            return self._queue_command(command)
         else:
-            self.gui.log_message("ERROR: Not connected to Arduino", "ERROR")
+            self._log("ERROR: Not connected to Arduino", "ERROR")
             return False
     
     def is_open(self):
@@ -0,0 +1,97 @@
+"""
+Carousel Controller - Session Log Module
+Version: 1.4.0
+
+Streams the communication log to disk for the whole session.
+The GUI keeps only recent lines on screen; the full history lives in
+rotating segment files (data/logs/session_YYYYMMDD_HHMMSS[_NNN].log).
+"""
+
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+
+class SessionLog:
+    """
+    Append-only, segmented on-disk copy of the communication log.
+    
+    Features:
+    - One log per GUI session, named by start time
+    - Rolls over to a new segment file once max_bytes is reached
+    - Exports the complete session history as a single text file
+    """
+    
+    def __init__(self, log_folder="./data/logs", max_bytes=5 * 1024 * 1024):
+        """
+        Initialize session log and open its first segment.
+        
+        Args:
+            log_folder: Directory for session log files (default: ./data/logs)
+            max_bytes (int): Segment size that triggers rotation
+        """
+        self.log_folder = Path(log_folder)
+        self.log_folder.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.session_name = f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        self.segments = []
+        self._file = None
+        self._size = 0
+        self._open_segment()
+        
+    def _open_segment(self):
+        """Close the current segment (if any) and start the next one."""
+        if self._file:
+            self._file.close()
+        index = len(self.segments)
+        suffix = f"_{index:03d}" if index else ""
+        path = self.log_folder / f"{self.session_name}{suffix}.log"
+        self.segments.append(path)
+        self._file = open(path, 'a', encoding='utf-8')
+        self._size = 0
+        
+    def write(self, text):
+        """
+        Append already formatted log text.
+        
+        Args:
+            text (str): One or more newline-terminated log lines
+        """
+        if not self._file or not text:
+            return
+        data_size = len(text.encode('utf-8'))
+        if self._size and self._size + data_size > self.max_bytes:
+            self._open_segment()
+        self._file.write(text)
+        self._file.flush()
+        self._size += data_size
+        
+    def export(self, filename):
+        """
+        Write the complete session history to a single file.
+        
+        Args:
+            filename (str): Destination path
+        """
+        if self._file:
+            self._file.flush()
+        with open(filename, 'wb') as out:
+            for path in self.segments:
+                if path.exists():
+                    with open(path, 'rb') as segment:
+                        shutil.copyfileobj(segment, out)
+                        
+    def get_log_folder_path(self):
+        """
+        Get absolute path to the session log folder.
+        
+        Returns:
+            str: Absolute path to log folder
+        """
+        return str(self.log_folder.absolute())
+        
+    def close(self):
+        """Close the current segment."""
+        if self._file:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,139 @@
+"""
+Carousel Controller - SQLite Storage Backend
+Version: 1.4.0
+
+Stores all trials in one database (data/carousel.db) instead of a CSV
+journal per day. WAL journaling lets the GUI read counts while the writer
+thread commits, each DataWriter batch is a single transaction, and the
+Trials Today / file-exists queries are indexed COUNTs.
+
+Usage:
+    logger = DataLogger(backend="sqlite")
+    python carousel_cli.py --backend sqlite
+"""
+
+import sqlite3
+import threading
+from pathlib import Path
+
+from data_logger import COLUMNS, StorageBackend, day_stem, read_rows
+
+
+DB_NAME = "carousel.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trials (
+    id        INTEGER PRIMARY KEY,
+    day       TEXT NOT NULL,          -- YYYY-MM-DD (PC date)
+    trial     INTEGER NOT NULL,
+    position  INTEGER NOT NULL,
+    dwell     REAL NOT NULL,
+    event     TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    entry_ms  INTEGER NOT NULL,
+    exit_ms   INTEGER NOT NULL,
+    entry_wall TEXT NOT NULL DEFAULT '',   -- entry on the PC clock (EntryDateTime)
+    exit_wall  TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_trials_day_position ON trials (day, position);
+CREATE INDEX IF NOT EXISTS idx_trials_day_trial ON trials (day, trial);
+"""
+
+# Table columns in data_logger.COLUMNS order
+_FIELDS = "trial, position, dwell, event, timestamp, entry_ms, exit_ms, entry_wall, exit_wall"
+
+# Columns added after the first release: (name, declaration)
+_ADDED_COLUMNS = (("entry_wall", "TEXT NOT NULL DEFAULT ''"),
+                  ("exit_wall", "TEXT NOT NULL DEFAULT ''"))
+
+
+class SqliteBackend(StorageBackend):
+    """
+    SQLite trial storage.
+    
+    Features:
+    - WAL journaling (readers never block the writer), synchronous=NORMAL
+    - One transaction per batch (executemany)
+    - Indexes on (day, position) and (day, trial) for the count queries
+    - Imports a day's CSV journal / legacy workbook the first time it is opened
+    """
+    
+    name = "sqlite"
+    
+    def __init__(self, data_folder, db_name=DB_NAME):
+        """
+        Args:
+            data_folder (Path): Folder holding the database
+            db_name (str): Database file name
+        """
+        self.data_folder = Path(data_folder)
+        self.db_file = self.data_folder / db_name
+        self.current_day = None
+        self.day = None                # current_day as the YYYY-MM-DD key
+        self.lock = threading.Lock()  # One connection, shared with the GUI thread
+        self.conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.executescript(_SCHEMA)
+            existing = {row[1] for row in self.conn.execute("PRAGMA table_info(trials)")}
+            for name, declaration in _ADDED_COLUMNS:
+                if name not in existing:
+                    self.conn.execute(f"ALTER TABLE trials ADD COLUMN {name} {declaration}")
+    
+    def open_day(self, day):
+        self.current_day = day
+        self.day = day.isoformat()
+    
+    def scan(self):
+        """Import today's CSV journal or legacy workbook if the database has no rows yet."""
+        if self.exists():
+            return
+        stem = day_stem(self.current_day)
+        for source in (self.data_folder / f"{stem}.csv", self.data_folder / f"{stem}.xlsx"):
+            if source.exists():
+                try:
+                    self.append(read_rows(source))
+                except Exception as e:
+                    print(f"ERROR importing {source.name}: {e}")
+                return
+    
+    def append(self, rows):
+        if not rows:
+            return
+        with self.lock, self.conn:
+            self.conn.executemany(
+                f"INSERT INTO trials (day, {_FIELDS}) VALUES (?{', ?' * len(COLUMNS)})",
+                [(self.day, *row) for row in rows])
+    
+    def _query(self, sql, args):
+        with self.lock:
+            return self.conn.execute(sql, args).fetchall()
+    
+    def rows(self, day):
+        return [list(row) for row in self._query(
+            f"SELECT {_FIELDS} FROM trials WHERE day = ? ORDER BY id", (day.isoformat(),))]
+    
+    def count(self):
+        return self._query("SELECT COUNT(*) FROM trials WHERE day = ?", (self.day,))[0][0]
+    
+    def last_trial(self):
+        result = self._query(
+            f"SELECT {_FIELDS} FROM trials WHERE day = ? ORDER BY id DESC LIMIT 1", (self.day,))
+        return dict(zip(COLUMNS, result[0])) if result else None
+    
+    def position_counts(self):
+        return dict(self._query(
+            "SELECT position, COUNT(*) FROM trials WHERE day = ? GROUP BY position", (self.day,)))
+    
+    def exists(self):
+        return bool(self._query("SELECT 1 FROM trials WHERE day = ? LIMIT 1", (self.day,)))
+    
+    def sync(self):
+        # WAL + synchronous=NORMAL: commits are fsynced at checkpoints
+        with self.lock:
+            self.conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+    
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,45 @@
+"""
+Carousel Controller - Serial Capture Tests
+
+Run with: python -m pytest test_serial_capture.py
+"""
+
+from serial_capture import CaptureWriter, ReplayPort, read_capture
+from serial_handler import SerialHandler
+
+
+CHUNKS = [b"Carousel Controller v1.4.0\r\n", b"STATUS:MAG", b"NET:ON_MAGNET\r\nSTATUS:MOUSE:",
+          b"IDLE\r\n", b"D", b"ATA,1,5,12543,18865,6.32,AUTO\r\n", b"x" * 300 + b"\r\n"]
+
+
+def write_capture(path, chunks):
+    writer = CaptureWriter(path)
+    for i, chunk in enumerate(chunks):
+        writer.write(chunk, writer.start + i * 0.001)
+    writer.close()
+
+
+def test_replay_port_returns_captured_chunks(tmp_path):
+    path = tmp_path / "session.ccap"
+    write_capture(path, CHUNKS)
+    port = ReplayPort(path, speed=0)
+    replayed = []
+    while port.is_open:
+        chunk = port.read(max(1, port.in_waiting))  # As SerialHandler._read_loop reads
+        if chunk:
+            replayed.append(chunk)
+    assert replayed == CHUNKS
+    assert [chunk for _, chunk in read_capture(path)] == CHUNKS
+
+
+def test_handler_replay_keeps_chunk_boundaries(tmp_path):
+    path = tmp_path / "session.ccap"
+    write_capture(path, CHUNKS)
+    handler = SerialHandler(auto_reconnect=False)
+    fed = []
+    feed = handler.feed
+    handler.feed = lambda chunk, *args: (fed.append(bytes(chunk)), feed(chunk, *args))
+    assert handler.replay(path, speed=0)
+    assert handler.serial_port.finished.wait(5)
+    handler.read_thread.join(5)
+    assert fed == CHUNKS